@@ -2,8 +2,7 @@ import tarski.fstrips as fs
 from tarski.io import fstrips as iofs
 from tarski.syntax import land
 from typing import List, Set, Any, Optional
-from nl2flow.compile.basic_compilations.utils import get_type_of_constant, add_memory_item_to_constant_map
-from nl2flow.compile.basic_compilations.utils import unpack_list_of_signature_items
+from nl2flow.compile.basic_compilations.utils import add_memory_item_to_constant_map
 from nl2flow.compile.basic_compilations.compile_constraints import compile_constraints
 from nl2flow.debug.schemas import SolutionQuality
 from nl2flow.compile.schemas import GoalItem, GoalItems, MemoryItem, Constraint, Step, Parameter
@@ -20,25 +19,16 @@ from nl2flow.compile.options import (
 
 
 def get_orphaned_items(compilation: Any, goal_items: List[str]) -> List[str]:
-    list_of_neighs = list()
+    signature_index = compilation.signature_index
+    list_of_neighs = {item.item_id for item in compilation.flow_definition.memory_items}
     list_of_orphans = list()
 
-    for item in compilation.flow_definition.memory_items:
-        list_of_neighs.append(item.item_id)
-
-    for operator in compilation.flow_definition.operators:
-        input_names = unpack_list_of_signature_items(operator.inputs)
-        list_of_neighs.extend(input_names)
-
-        output = operator.outputs
-        if isinstance(output, List):
-            output = output[0]
-
-        output_names = unpack_list_of_signature_items(output.outcomes)
-        list_of_neighs.extend(output_names)
-
     for item in goal_items:
-        if item not in list_of_neighs:
+        if (
+            item not in list_of_neighs
+            and item not in signature_index.consumers
+            and item not in signature_index.producers
+        ):
             list_of_orphans.append(item)
 
     return list_of_orphans
@@ -97,10 +87,8 @@ def compile_goal_item(compilation: Any, goal_item: GoalItem, goal_predicates: Se
     else:
         list_of_constants = list()
         if goal_item.goal_name in compilation.type_map:
-            for item in compilation.constant_map:
-                type_of_item = get_type_of_constant(compilation, item)
-
-                if type_of_item == goal_item.goal_name and "new_object" not in item:
+            for item in compilation.constant_index.get_constants_of_type(goal_item.goal_name):
+                if "new_object" not in item:
                     list_of_constants.append(item)
         else:
             list_of_constants = [goal_item.goal_name]
@@ -1,7 +1,7 @@
 import tarski.fstrips as fs
 from tarski.io import fstrips as iofs
 from tarski.syntax import land, neg
-from typing import Set, Any, Optional
+from typing import Set, Iterable, Any, Optional
 
 from nl2flow.debug.schemas import SolutionQuality
 from nl2flow.compile.schemas import FlowDefinition, MemoryItem
@@ -16,13 +16,10 @@ from nl2flow.compile.options import (
 )
 
 
-def compile_declared_mappings(compilation: Any, **kwargs: Any) -> None:
-    flow_definition: FlowDefinition = compilation.flow_definition
+def compile_identity_mappings(compilation: Any, constants: Optional[Iterable[str]] = None, **kwargs: Any) -> None:
     mapping_options: Set[MappingOptions] = set(kwargs["mapping_options"])
-    variable_life_cycle: Set[LifeCycleOptions] = set(kwargs["variable_life_cycle"])
-    debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
 
-    for constant in compilation.constant_map:
+    for constant in compilation.constant_index.datum_constants if constants is None else constants:
         if is_this_a_datum(compilation, constant) and MappingOptions.prohibit_direct not in mapping_options:
             compilation.init.add(
                 compilation.mapped_to(
@@ -31,40 +28,54 @@ def compile_declared_mappings(compilation: Any, **kwargs: Any) -> None:
                 )
             )
 
-    if len(flow_definition.list_of_mappings) > 0:
-        for mappable_item in flow_definition.list_of_mappings:
-            for item in [mappable_item.source_name, mappable_item.target_name]:
-                if item not in compilation.constant_map:
-                    add_memory_item_to_constant_map(
-                        compilation,
-                        memory_item=MemoryItem(
-                            item_id=item, item_type=TypeOptions.ROOT.value, item_state=MemoryState.UNKNOWN.value
-                        ),
-                    )
 
-            source = compilation.constant_map[mappable_item.source_name]
-            target = compilation.constant_map[mappable_item.target_name]
+def compile_mapping_facts(compilation: Any, **kwargs: Any) -> None:
+    flow_definition: FlowDefinition = compilation.flow_definition
+    mapping_options: Set[MappingOptions] = set(kwargs["mapping_options"])
+
+    for mappable_item in flow_definition.list_of_mappings:
+        for item in [mappable_item.source_name, mappable_item.target_name]:
+            if item not in compilation.constant_map:
+                add_memory_item_to_constant_map(
+                    compilation,
+                    memory_item=MemoryItem(
+                        item_id=item, item_type=TypeOptions.ROOT.value, item_state=MemoryState.UNKNOWN.value
+                    ),
+                )
+
+        source = compilation.constant_map[mappable_item.source_name]
+        target = compilation.constant_map[mappable_item.target_name]
 
+        if not mappable_item.probability:
+            compilation.init.add(compilation.not_mappable(source, target))
+        else:
+            compilation.init.add(compilation.is_mappable(source, target))
+            compilation.init.set(
+                compilation.map_affinity(source, target),
+                int((2 - mappable_item.probability) * CostOptions.VERY_LOW.value),
+            )
+
+        if MappingOptions.transitive in mapping_options:
             if not mappable_item.probability:
-                compilation.init.add(compilation.not_mappable(source, target))
+                compilation.init.add(compilation.not_mappable(target, source))
+
             else:
-                compilation.init.add(compilation.is_mappable(source, target))
+                compilation.init.add(compilation.is_mappable(target, source))
                 compilation.init.set(
-                    compilation.map_affinity(source, target),
+                    compilation.map_affinity(target, source),
                     int((2 - mappable_item.probability) * CostOptions.VERY_LOW.value),
                 )
 
-            if MappingOptions.transitive in mapping_options:
-                if not mappable_item.probability:
-                    compilation.init.add(compilation.not_mappable(target, source))
 
-                else:
-                    compilation.init.add(compilation.is_mappable(target, source))
-                    compilation.init.set(
-                        compilation.map_affinity(target, source),
-                        int((2 - mappable_item.probability) * CostOptions.VERY_LOW.value),
-                    )
+def compile_declared_mappings(compilation: Any, **kwargs: Any) -> None:
+    flow_definition: FlowDefinition = compilation.flow_definition
+    variable_life_cycle: Set[LifeCycleOptions] = set(kwargs["variable_life_cycle"])
+    debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
+
+    compile_identity_mappings(compilation, **kwargs)
+    compile_mapping_facts(compilation, **kwargs)
 
+    if len(flow_definition.list_of_mappings) > 0 or compilation.reusable_domain:
         x = compilation.lang.variable("x", compilation.type_map[TypeOptions.ROOT.value])
         y = compilation.lang.variable("y", compilation.type_map[TypeOptions.ROOT.value])
 
@@ -34,6 +34,7 @@ def compile_operators(compilation: Any, **kwargs: Any) -> None:
 
     for operator in list_of_actions:
         compilation.constant_map[operator.name] = compilation.lang.constant(operator.name, TypeOptions.OPERATOR.value)
+        compilation.constant_index.add(operator.name, TypeOptions.OPERATOR.value)
 
     for operator in list_of_actions:
         parameter_list: List[Any] = list()
@@ -1,7 +1,7 @@
 import tarski.fstrips as fs
 from tarski.io import fstrips as iofs
 from tarski.syntax import land, Atom
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from nl2flow.compile.schemas import Step, Constraint
 from nl2flow.compile.basic_compilations.compile_history import get_predicate_from_constraint, get_predicate_from_step
@@ -9,43 +9,51 @@ from nl2flow.compile.options import RestrictedOperations, BasicOperations, CostO
 from nl2flow.debug.schemas import SolutionQuality
 
 
-def compile_reference(compilation: Any, **kwargs: Any) -> None:
-    debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
+def get_reference_predicates(compilation: Any, plan: List[Union[Step, Constraint]], **kwargs: Any) -> List[Any]:
+    step_predicates = list()
+    mapped_items: Dict[str, str] = dict()
 
-    cached_predicates = list()
-    token_predicates = list()
-    mapped_items = dict()
+    for index, item in enumerate(plan):
+        if isinstance(item, Step):
+            indices_of_interest = []
 
-    for index in range(len(compilation.flow_definition.reference.plan) + 1):
-        if index < len(compilation.flow_definition.reference.plan):
-            item = compilation.flow_definition.reference.plan[index]
+            for i, r in enumerate(plan):
+                if isinstance(r, Step) and r.name == item.name:
+                    indices_of_interest.append(i)
 
-            if isinstance(item, Step):
-                indices_of_interest = []
+            index_of_operation = indices_of_interest.index(index)
 
-                for i, r in enumerate(compilation.flow_definition.reference.plan):
-                    if isinstance(r, Step) and r.name == item.name:
-                        indices_of_interest.append(i)
+            if item.name == BasicOperations.MAPPER.value:
+                source, target = [p if isinstance(p, str) else p.item_id for p in item.parameters[:2]]
+                mapped_items[target] = source
 
-                index_of_operation = indices_of_interest.index(index)
+            step_predicate = get_predicate_from_step(
+                compilation, item, index_of_operation, mapped_items=mapped_items, **kwargs
+            )
 
-                if item.name == BasicOperations.MAPPER.value:
-                    mapped_items[item.parameters[1].item_id] = item.parameters[0].item_id
+        elif isinstance(item, Constraint):
+            step_predicate = get_predicate_from_constraint(compilation, item)
 
-                step_predicate = get_predicate_from_step(
-                    compilation, item, index_of_operation, mapped_items=mapped_items, **kwargs
-                )
+        else:
+            raise ValueError(f"Invalid reference object: {item}")
 
-            elif isinstance(item, Constraint):
-                step_predicate = get_predicate_from_constraint(compilation, item)
+        step_predicates.append(step_predicate)
 
-            else:
-                raise ValueError(f"Invalid reference object: {item}")
+    return step_predicates
 
-            if step_predicate:
-                cached_predicates.append(step_predicate)
 
+def compile_reference(compilation: Any, **kwargs: Any) -> None:
+    debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
+
+    plan = compilation.flow_definition.reference.plan
+    cached_predicates = [p for p in get_reference_predicates(compilation, plan, **kwargs) if p]
+    token_predicates = list()
+
+    for index in range(len(plan) + 1):
         token_predicate_name = f"token_{index}"
+        if getattr(compilation, token_predicate_name, None) is None:
+            setattr(compilation, token_predicate_name, compilation.lang.predicate(token_predicate_name))
+
         token_predicate = getattr(compilation, token_predicate_name)()
         token_predicates.append(token_predicate)
 
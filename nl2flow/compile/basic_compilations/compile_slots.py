@@ -1,7 +1,7 @@
 import tarski.fstrips as fs
 from tarski.io import fstrips as iofs
 from tarski.syntax import land, neg
-from typing import List, Set, Dict, Any, Optional
+from typing import List, Set, Dict, Iterable, Any, Optional, Tuple
 
 from nl2flow.debug.schemas import SolutionQuality
 from nl2flow.compile.basic_compilations.utils import (
@@ -53,14 +53,15 @@ def get_not_slotfillable_types(compilation: Any) -> List[str]:
 
 def compile_new_object_maps(
     compilation: Any,
+    constants: Optional[Iterable[str]] = None,
     **kwargs: Any,
 ) -> None:
     num_lookahead: int = kwargs.get("lookahead", LOOKAHEAD)
 
-    not_slotfillable_types = get_not_slotfillable_types(compilation)
-    not_slots = get_not_slots(compilation)
+    not_slotfillable_types = set(get_not_slotfillable_types(compilation))
+    not_slots = set(get_not_slots(compilation))
 
-    for constant in compilation.constant_map:
+    for constant in compilation.constant_map if constants is None else constants:
         type_of_datum = get_type_of_constant(compilation, constant)
         if constant in not_slots or type_of_datum in not_slotfillable_types:
             new_object_names = generate_new_objects(type_of_datum, num_lookahead)
@@ -86,26 +87,38 @@ def get_slots_as_not_last_resort(compilation: Any) -> List[str]:
     )
 
 
-def get_goodness_map(compilation: Any, no_edit: bool = False) -> Dict[str, float]:
-    not_slotfillable_types = get_not_slotfillable_types(compilation)
+def get_goodness_map(
+    compilation: Any, no_edit: bool = False, constants: Optional[Iterable[str]] = None
+) -> Dict[str, float]:
+    not_slotfillable_types = set(get_not_slotfillable_types(compilation))
     goodness_map = dict()
 
-    for constant in compilation.constant_map:
+    # The first slot property that applies to a constant decides its goodness, either
+    # by name or by type if it propagates its desirability, so index both up front.
+    goodness_by_type: Dict[str, Tuple[int, float]] = dict()
+    goodness_by_name: Dict[str, Tuple[int, float]] = dict()
+
+    for index, slot in enumerate(compilation.flow_definition.slot_properties):
+        if slot.propagate_desirability:
+            goodness_by_type.setdefault(
+                get_type_of_constant(compilation, slot.slot_name), (index, slot.slot_desirability)
+            )
+
+        goodness_by_name.setdefault(slot.slot_name, (index, slot.slot_desirability))
+
+    for constant in compilation.constant_index.datum_constants if constants is None else constants:
         if is_this_a_datum(compilation, constant):
             type_of_datum = get_type_of_constant(compilation, constant)
             if type_of_datum in not_slotfillable_types and not no_edit:
                 compilation.init.add(compilation.not_slotfillable(compilation.constant_map[constant]))
 
-            slot_goodness = SLOT_GOODNESS
-            for slot in compilation.flow_definition.slot_properties:
-                if type_of_datum == get_type_of_constant(compilation, slot.slot_name) and slot.propagate_desirability:
-                    slot_goodness = slot.slot_desirability
-                    break
-
-                if slot.slot_name == constant:
-                    slot_goodness = slot.slot_desirability
-                    break
+            matching_slots = [
+                goodness
+                for goodness in (goodness_by_type.get(type_of_datum), goodness_by_name.get(constant))
+                if goodness is not None
+            ]
 
+            slot_goodness = min(matching_slots)[1] if matching_slots else SLOT_GOODNESS
             goodness_map[constant] = slot_goodness
 
             if not no_edit:
@@ -222,15 +235,15 @@ def compile_last_resort_slots(compilation: Any, **kwargs: Any) -> None:
     variable_life_cycle: Set[LifeCycleOptions] = set(kwargs["variable_life_cycle"])
     debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
 
-    not_slots = get_not_slots(compilation)
+    not_slots = set(get_not_slots(compilation))
     source_map = get_item_source_map(compilation)
     requirement_map = get_item_requirement_map(compilation)
     agent_to_slot_map = get_agent_to_slot_map(compilation)
     goodness_map = get_goodness_map(compilation, no_edit=True)
-    not_slots_as_last_resort = get_slots_as_not_last_resort(compilation)
+    not_slots_as_last_resort = set(get_slots_as_not_last_resort(compilation))
 
-    for constant in compilation.constant_map:
-        if constant not in not_slots and is_this_a_datum(compilation, constant):
+    for constant in compilation.constant_index.datum_constants:
+        if constant not in not_slots:
             precondition_list = [
                 neg(
                     compilation.known(
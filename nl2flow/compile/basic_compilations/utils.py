@@ -1,6 +1,16 @@
-from typing import List, Set, Dict, Union, Any
+from __future__ import annotations
+from collections import ChainMap
+from typing import List, Set, Dict, Union, Any, MutableMapping, Optional
 from nl2flow.compile.options import TypeOptions, MAX_RETRY, LOOKAHEAD
-from nl2flow.compile.schemas import MemoryItem, TypeItem, SlotProperty, Parameter, SignatureItem
+from nl2flow.compile.schemas import (
+    MemoryItem,
+    TypeItem,
+    SlotProperty,
+    Parameter,
+    SignatureItem,
+    OperatorDefinition,
+    Outcome,
+)
 
 
 def unpack_list_of_signature_items(signature_items: List[SignatureItem]) -> List[str]:
@@ -17,50 +27,30 @@ def unpack_list_of_signature_items(signature_items: List[SignatureItem]) -> List
     return items
 
 
-def get_agent_to_slot_map(compilation: Any) -> Dict[str, List[str]]:
-    agent_to_slot_map: Dict[str, List[str]] = dict()
+def get_outcome_of_operator(operator: OperatorDefinition) -> Outcome:
+    return operator.outputs[0] if isinstance(operator.outputs, List) else operator.outputs
 
-    for operator in compilation.flow_definition.operators:
-        agent_to_slot_map[operator.name] = unpack_list_of_signature_items(operator.inputs)
 
-    return agent_to_slot_map
+def get_agent_to_slot_map(compilation: Any) -> Dict[str, List[str]]:
+    inputs: Dict[str, List[str]] = compilation.signature_index.inputs
+    return {operator_name: list(items) for operator_name, items in inputs.items()}
 
 
 def get_item_requirement_map(compilation: Any) -> Dict[str, Set[str]]:
-    requirement_map: Dict[str, Set[str]] = dict()
-    agent_to_slot_map = get_agent_to_slot_map(compilation)
-
-    for constant in compilation.constant_map:
-        requirement_map[constant] = set()
-
-        for operator in compilation.flow_definition.operators:
-            if constant in agent_to_slot_map[operator.name]:
-                requirement_map[constant].add(operator.name)
-
-    return requirement_map
+    consumers = compilation.signature_index.consumers
+    return {constant: set(consumers.get(constant, set())) for constant in compilation.constant_map}
 
 
 def get_item_source_map(compilation: Any) -> Dict[str, Set[str]]:
-    source_map: Dict[str, Set[str]] = dict()
-
-    for constant in compilation.constant_map:
-        source_map[constant] = set()
-
-        for operator in compilation.flow_definition.operators:
-            outputs = operator.outputs[0]
-            params = unpack_list_of_signature_items(outputs.outcomes)
-
-            if constant in params:
-                source_map[constant].add(operator.name)
-
-    return source_map
+    producers = compilation.signature_index.producers
+    return {constant: set(producers.get(constant, set())) for constant in compilation.constant_map}
 
 
 def get_type_of_constant(compilation: Any, constant: str) -> str:
-    for item in compilation.constant_map:
-        if item == constant:
-            constant_type: str = compilation.constant_map[item].sort.name
-            return constant_type
+    constant_type = compilation.constant_index.get_type(constant)
+
+    if constant_type is not None:
+        return str(constant_type)
 
     raise ValueError(f"Unknown constant: {constant}")
 
@@ -138,6 +128,7 @@ def add_memory_item_to_constant_map(compilation: Any, memory_item: Parameter) ->
 
     if memory_item.item_id not in compilation.constant_map:
         compilation.constant_map[memory_item.item_id] = compilation.lang.constant(memory_item.item_id, type_name)
+        compilation.constant_index.add(memory_item.item_id, type_name)
 
 
 def add_to_condition_list_pre_check(compilation: Any, parameter: Union[str, Parameter]) -> None:
@@ -148,3 +139,67 @@ def add_to_condition_list_pre_check(compilation: Any, parameter: Union[str, Para
         add_memory_item_to_constant_map(compilation, parameter)
     else:
         raise TypeError(f"This is not a valid parameter: {parameter}")
+
+
+class ConstantIndex:
+    """
+    Indexes the constants of a compilation by name and by type, and keeps track of which
+    of them are data rather than reserved constants (operators, states, and so on), in the
+    order that they were added to the constant map. An index can be stacked on the index
+    of another compilation, as the problem compilations do with that of their domain.
+    """
+
+    def __init__(self, parent: Optional[ConstantIndex] = None) -> None:
+        self.parent = parent
+        self.types: MutableMapping[str, str] = ChainMap(dict(), parent.types) if parent else dict()
+        self._constants_of_type: Dict[str, List[str]] = dict()
+        self._datum_constants: List[str] = list()
+
+    def add(self, constant: str, type_name: str) -> None:
+        if constant in self.types:
+            return
+
+        self.types[constant] = type_name
+        self._constants_of_type.setdefault(type_name, list()).append(constant)
+
+        if is_this_a_datum_type(type_name):
+            self._datum_constants.append(constant)
+
+    def get_type(self, constant: str) -> Optional[str]:
+        return self.types.get(constant, None)
+
+    def is_datum(self, constant: str) -> bool:
+        type_name = self.get_type(constant)
+        return type_name is not None and is_this_a_datum_type(type_name)
+
+    def get_constants_of_type(self, type_name: str) -> List[str]:
+        constants = self.parent.get_constants_of_type(type_name) if self.parent else list()
+        return constants + self._constants_of_type.get(type_name, list())
+
+    @property
+    def datum_constants(self) -> List[str]:
+        constants = self.parent.datum_constants if self.parent else list()
+        return constants + self._datum_constants
+
+
+class SignatureIndex:
+    """
+    Unpacks the inputs and outputs of the operators of a compilation once, and indexes
+    the operators by the items that they consume and produce, for the compile passes to share.
+    """
+
+    def __init__(self, operators: List[OperatorDefinition]) -> None:
+        self.inputs: Dict[str, List[str]] = dict()
+        self.outputs: Dict[str, List[str]] = dict()
+        self.consumers: Dict[str, Set[str]] = dict()
+        self.producers: Dict[str, Set[str]] = dict()
+
+        for operator in operators:
+            self.inputs[operator.name] = unpack_list_of_signature_items(operator.inputs)
+            self.outputs[operator.name] = unpack_list_of_signature_items(get_outcome_of_operator(operator).outcomes)
+
+            for item in self.inputs[operator.name]:
+                self.consumers.setdefault(item, set()).add(operator.name)
+
+            for item in self.outputs[operator.name]:
+                self.producers.setdefault(item, set()).add(operator.name)
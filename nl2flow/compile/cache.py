@@ -0,0 +1,195 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from threading import RLock
+from pydantic import BaseModel
+from nl2flow.compile.schemas import FlowDefinition, PDDL
+from nl2flow.compile.utils import Transform, TransformRegistry, get_content_hash
+from nl2flow.utility.file_utility import open_atomic
+
+import json
+import os
+import time
+
+CACHE_SIZE: int = 128
+CACHE_FILE_SUFFIX: str = ".json"
+
+
+class CompileCacheStats(BaseModel):
+    hits: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class CompileCacheEntry(BaseModel):
+    created: float
+    pddl: PDDL
+    transforms: List[Transform] = []
+
+
+class CompileCache:
+    """
+    Content addressed cache for compiled flows. Entries live in an in-memory
+    LRU tier and, if a cache directory is given, in an on-disk tier that can
+    be shared across processes. Keys are derived from the flow definition and
+    every option that affects the compilation.
+    """
+
+    def __init__(
+        self,
+        max_size: int = CACHE_SIZE,
+        max_age: Optional[float] = None,
+        cache_directory: Optional[str] = None,
+        max_disk_size: Optional[int] = None,
+    ) -> None:
+        assert max_size > 0, "Cache size must be positive."
+
+        self.max_size = max_size
+        self.max_age = max_age
+        self.cache_directory = cache_directory
+        self.max_disk_size = max_disk_size
+
+        self._entries: OrderedDict[str, CompileCacheEntry] = OrderedDict()
+        self._stats = CompileCacheStats()
+        self._lock = RLock()
+
+        if self.cache_directory is not None:
+            os.makedirs(self.cache_directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(flow_definition: FlowDefinition, **kwargs: Any) -> str:
+        return get_content_hash(flow_definition, kwargs)
+
+    @property
+    def stats(self) -> CompileCacheStats:
+        with self._lock:
+            stats: CompileCacheStats = self._stats.model_copy(update={"size": len(self._entries)})
+            return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return self.__get_entry(key, count=False) is not None
+
+    def get(self, key: str) -> Optional[Tuple[PDDL, List[Transform]]]:
+        with self._lock:
+            entry = self.__get_entry(key)
+
+            if entry is None:
+                self._stats.misses += 1
+                return None
+
+            self._stats.hits += 1
+            return entry.pddl.model_copy(), TransformRegistry(entry.transforms)
+
+    def put(self, key: str, pddl: PDDL, transforms: List[Transform]) -> None:
+        entry = CompileCacheEntry(created=time.time(), pddl=pddl, transforms=list(transforms))
+
+        with self._lock:
+            self.__put_in_memory(key, entry)
+
+            if self.cache_directory is not None:
+                with open_atomic(self.__get_file_path(key), "w") as cache_file:
+                    cache_file.write(entry.model_dump_json())
+
+                self.__evict_from_disk()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+            if self.cache_directory is not None:
+                for key in self.__get_disk_keys():
+                    self.__remove_from_disk(key)
+
+    def __is_expired(self, entry: CompileCacheEntry) -> bool:
+        return self.max_age is not None and time.time() - entry.created > self.max_age
+
+    def __get_entry(self, key: str, count: bool = True) -> Optional[CompileCacheEntry]:
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if not self.__is_expired(entry):
+                self._entries.move_to_end(key)
+                self._stats.memory_hits += int(count)
+                return entry
+
+            del self._entries[key]
+            self._stats.evictions += 1
+
+        entry = self.__read_from_disk(key)
+
+        if entry is not None:
+            if not self.__is_expired(entry):
+                self.__put_in_memory(key, entry)
+                self._stats.disk_hits += int(count)
+                return entry
+
+            self.__remove_from_disk(key)
+            self._stats.evictions += 1
+
+        return None
+
+    def __put_in_memory(self, key: str, entry: CompileCacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+    def __get_file_path(self, key: str) -> str:
+        assert self.cache_directory is not None
+        return os.path.join(self.cache_directory, f"{key}{CACHE_FILE_SUFFIX}")
+
+    def __get_disk_keys(self) -> List[str]:
+        assert self.cache_directory is not None
+        return [
+            file_name[: -len(CACHE_FILE_SUFFIX)]
+            for file_name in os.listdir(self.cache_directory)
+            if file_name.endswith(CACHE_FILE_SUFFIX)
+        ]
+
+    def __read_from_disk(self, key: str) -> Optional[CompileCacheEntry]:
+        if self.cache_directory is None:
+            return None
+
+        try:
+            with open(self.__get_file_path(key)) as cache_file:
+                entry: CompileCacheEntry = CompileCacheEntry.model_validate(json.load(cache_file))
+                return entry
+
+        except (OSError, ValueError):
+            return None
+
+    def __remove_from_disk(self, key: str) -> None:
+        try:
+            os.remove(self.__get_file_path(key))
+        except FileNotFoundError:
+            pass
+
+    def __evict_from_disk(self) -> None:
+        modified_times: Dict[str, float] = dict()
+
+        for key in self.__get_disk_keys():
+            try:
+                modified_times[key] = os.path.getmtime(self.__get_file_path(key))
+            except FileNotFoundError:
+                continue
+
+        stale_keys = [
+            key for key, modified in modified_times.items() if self.max_age and time.time() - modified > self.max_age
+        ]
+
+        remaining_keys = sorted(set(modified_times) - set(stale_keys), key=lambda k: modified_times[k])
+        if self.max_disk_size is not None and len(remaining_keys) > self.max_disk_size:
+            stale_keys.extend(remaining_keys[: len(remaining_keys) - self.max_disk_size])
+
+        for key in stale_keys:
+            self.__remove_from_disk(key)
+            self._stats.evictions += 1
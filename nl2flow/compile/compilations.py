@@ -1,17 +1,26 @@
+from __future__ import annotations
 import tarski
 import tarski.fstrips as fs
 from tarski.theories import Theory
 from tarski.io import FstripsWriter
+from tarski.io.common import load_tpl
+from tarski.io.fstrips import print_init, print_objects, print_goal, print_problem_metric
+from tarski.syntax import Constant, Predicate
 from abc import ABC, abstractmethod
-from typing import List, Set, Dict, Any, Tuple, Optional
+from collections import ChainMap, OrderedDict
+from typing import Callable, List, Set, Dict, Any, Tuple, Optional, Union
 from nl2flow.debug.schemas import SolutionQuality
 from nl2flow.compile.schemas import (
     FlowDefinition,
+    ClassicalPlanReference,
     PDDL,
     Transform,
     TypeItem,
     MemoryItem,
+    Constraint,
 )
+from nl2flow.compile.utils import TransformRegistry, get_content_hash
+from nl2flow.compile.profiling import CompileProfiler, PassProfile
 
 from nl2flow.compile.basic_compilations.compile_operators import compile_operators
 from nl2flow.compile.basic_compilations.compile_confirmation import compile_confirmation
@@ -26,6 +35,8 @@ from nl2flow.compile.basic_compilations.compile_slots import (
 from nl2flow.compile.basic_compilations.compile_mappings import (
     compile_typed_mappings,
     compile_declared_mappings,
+    compile_identity_mappings,
+    compile_mapping_facts,
 )
 from nl2flow.compile.basic_compilations.compile_goals import compile_goals
 from nl2flow.compile.basic_compilations.compile_history import compile_history
@@ -36,22 +47,53 @@ from nl2flow.compile.basic_compilations.utils import (
     add_memory_item_to_constant_map,
     add_extra_objects,
     add_retry_states,
+    is_this_a_datum_type,
+    ConstantIndex,
+    SignatureIndex,
 )
 
 from nl2flow.compile.options import (
     NL2FlowOptions,
     SlotOptions,
     MappingOptions,
+    GoalOptions,
+    GoalType,
     TypeOptions,
     MemoryState,
     ConstraintState,
     HasDoneState,
 )
 
+CATALOG_FIELDS = [
+    "type_hierarchy",
+    "operators",
+    "slot_properties",
+    "partial_orders",
+    "manifest_constraints",
+    "starts_with",
+    "ends_with",
+]
+
+REQUEST_FIELDS = [
+    "memory_items",
+    "goal_items",
+    "history",
+    "constraints",
+    "list_of_mappings",
+]
+
 
 class Compilation(ABC):
     def __init__(self, flow_definition: FlowDefinition):
         self.flow_definition = flow_definition
+        self.profiler: Optional[CompileProfiler] = None
+        self.pass_profiles: List[PassProfile] = list()
+
+    def run_pass(self, compile_pass: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        if self.profiler is None:
+            return compile_pass(self, *args, **kwargs)
+
+        return self.profiler.run(self, compile_pass, *args, **kwargs)
 
     @abstractmethod
     def compile(self, **kwargs: Any) -> Tuple[PDDL, List[Transform]]:
@@ -62,7 +104,7 @@ class ClassicPDDL(Compilation):
     def __init__(self, flow_definition: FlowDefinition):
         Compilation.__init__(self, flow_definition)
 
-        self.cached_transforms: List[Transform] = list()
+        self.cached_transforms: TransformRegistry = TransformRegistry()
         self.flow_definition = FlowDefinition.transform(self.flow_definition, self.cached_transforms)
 
         name = self.flow_definition.name
@@ -102,8 +144,37 @@ class ClassicPDDL(Compilation):
 
         self.type_map: Dict[str, Any] = dict()
         self.constant_map: Dict[str, Any] = dict()
+        self.constant_index = ConstantIndex()
+        self.signature_index: Optional[SignatureIndex] = None
+        self.reusable_domain: bool = False
+
+    @classmethod
+    def compile_domain(cls, flow_definition: FlowDefinition, **kwargs: Any) -> CompiledDomain:
+        catalog = FlowDefinition(
+            name=flow_definition.name,
+            **{key: getattr(flow_definition, key) for key in CATALOG_FIELDS},
+        )
+
+        options = CompiledDomain.get_options(**kwargs)
+        compilation = cls(catalog)
+        compilation.reusable_domain = True
+        compilation.profiler = kwargs.get("profiler", None)
+
+        pddl, _ = compilation.compile(**options)
+        return CompiledDomain(
+            key=get_content_hash(catalog, options),
+            domain=pddl.domain,
+            compilation=compilation,
+            options=options,
+        )
 
     def compile(self, **kwargs: Any) -> Tuple[PDDL, List[Transform]]:
+        self.run_passes(**kwargs)
+
+        pddl: PDDL = self.run_pass(ClassicPDDL.write_pddl)
+        return pddl, self.cached_transforms
+
+    def run_passes(self, **kwargs: Any) -> None:
         debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
         optimization_options: Set[NL2FlowOptions] = set(kwargs["optimization_options"])
         slot_options: Set[SlotOptions] = set(kwargs["slot_options"])
@@ -139,16 +210,7 @@ class ClassicPDDL(Compilation):
                 )
 
         if debug_flag:
-            self.ready_for_token = self.lang.predicate("ready_for_token")
-            self.has_asked = self.lang.predicate(
-                "has_asked",
-                self.type_map[TypeOptions.ROOT.value],
-            )
-
-            for index in range(len(self.flow_definition.reference.plan) + 1):
-                token_predicate_name = f"token_{index}"
-                token_predicate = self.lang.predicate(token_predicate_name)
-                setattr(self, token_predicate_name, token_predicate)
+            self.add_debug_predicates()
 
         self.has_done = self.lang.predicate(
             "has_done",
@@ -243,42 +305,318 @@ class ClassicPDDL(Compilation):
                 )
 
         if NL2FlowOptions.allow_retries in optimization_options:
-            add_retry_states(self)
+            self.run_pass(add_retry_states)
+
+        self.run_pass(compile_operators, **kwargs)
+        self.signature_index = SignatureIndex(self.flow_definition.operators)
 
-        compile_operators(self, **kwargs)
-        compile_confirmation(self, **kwargs)
-        add_extra_objects(self, **kwargs)
+        self.run_pass(compile_confirmation, **kwargs)
+        self.run_pass(add_extra_objects, **kwargs)
 
         if len(slot_options) > 1:
-            compile_new_object_maps(self, **kwargs)
-            get_goodness_map(self)
+            self.run_pass(compile_new_object_maps, **kwargs)
+            self.run_pass(get_goodness_map)
 
         if SlotOptions.higher_cost in slot_options:
-            compile_higher_cost_slots(self, **kwargs)
+            self.run_pass(compile_higher_cost_slots, **kwargs)
 
         if SlotOptions.last_resort in slot_options:
-            compile_last_resort_slots(self, **kwargs)
+            self.run_pass(compile_last_resort_slots, **kwargs)
 
         if SlotOptions.all_together in slot_options:
-            compile_all_together(self, **kwargs)
+            self.run_pass(compile_all_together, **kwargs)
 
-        compile_declared_mappings(self, **kwargs)
+        self.run_pass(compile_declared_mappings, **kwargs)
 
         if MappingOptions.ignore_types not in set(kwargs["mapping_options"]):
-            compile_typed_mappings(self, **kwargs)
+            self.run_pass(compile_typed_mappings, **kwargs)
 
-        compile_goals(self, **kwargs)
-        compile_manifest_constraints(self)
-        compile_history(self, **kwargs)
+        self.run_pass(compile_goals, **kwargs)
+        self.run_pass(compile_manifest_constraints)
+        self.run_pass(compile_history, **kwargs)
 
-        if debug_flag:
-            compile_reference(self, **kwargs)
+        if debug_flag and self.flow_definition.reference:
+            self.run_pass(compile_reference, **kwargs)
 
         self.init.set(self.cost(), 0)
         self.problem.init = self.init
 
+    def add_debug_predicates(self) -> None:
+        self.ready_for_token = self.lang.predicate("ready_for_token")
+        self.has_asked = self.lang.predicate(
+            "has_asked",
+            self.type_map[TypeOptions.ROOT.value],
+        )
+
+        if self.flow_definition.reference:
+            for index in range(len(self.flow_definition.reference.plan) + 1):
+                token_predicate_name = f"token_{index}"
+                token_predicate = self.lang.predicate(token_predicate_name)
+                setattr(self, token_predicate_name, token_predicate)
+
+    def write_pddl(self) -> PDDL:
+        constant_objects = list(self.constant_map.values())
+
         writer = FstripsWriter(self.problem)
-        domain = writer.print_domain(constant_objects=list(self.constant_map.values())).replace(" :numeric-fluents", "")
-        problem = writer.print_instance(constant_objects=list(self.constant_map.values()))
+        domain = writer.print_domain(constant_objects=constant_objects).replace(" :numeric-fluents", "")
+        problem = writer.print_instance(constant_objects=constant_objects)
+
+        return PDDL(domain=domain, problem=problem)
+
+
+class CompiledDomain:
+    """
+    The catalog part of a flow (types, operators, slot properties, and orderings) compiled
+    once into a PDDL domain. Requests against the same catalog only need to compile the
+    problem file against it, see ClassicPDDLProblem.
+    """
+
+    def __init__(self, key: str, domain: str, compilation: ClassicPDDL, options: Dict[str, Any]):
+        self.key = key
+        self.domain = domain
+        self.compilation = compilation
+        self.options = options
+        self.init: List[str] = [line.strip() for line in print_init(compilation.problem).split("\n") if line.strip()]
+        self.metric: str = print_problem_metric(compilation.problem)
+
+    @staticmethod
+    def get_options(**kwargs: Any) -> Dict[str, Any]:
+        return {
+            "slot_options": set(kwargs["slot_options"]),
+            "mapping_options": set(kwargs["mapping_options"]),
+            "confirm_options": set(kwargs["confirm_options"]),
+            "variable_life_cycle": set(kwargs["variable_life_cycle"]),
+            "optimization_options": set(kwargs["optimization_options"]),
+            "goal_type": kwargs["goal_type"],
+            "lookahead": kwargs["lookahead"],
+        }
+
+
+class ProblemConstant(Constant):  # type: ignore
+    """A constant that belongs to a single problem and is not registered with the shared domain language."""
+
+    def __init__(self, name: str, sort: Any):
+        self.name = name
+        self._sort = sort
+
+
+class ProblemLanguage:
+    def __init__(self, language: Any):
+        self.language = language
+
+    def constant(self, name: str, sort: Union[str, Any]) -> Constant:
+        sort = self.language.get_sort(sort) if isinstance(sort, str) else sort
+
+        # Numbers are never registered with a language, so they can come from the shared one.
+        if sort.builtin:
+            number: Constant = self.language.constant(name, sort)
+            return number
+
+        return ProblemConstant(name, sort)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.language, name)
+
+
+class ReferenceLanguage(ProblemLanguage):
+    """A problem language that also keeps the predicates that a single reference plan declares."""
+
+    def __init__(self, language: Any):
+        ProblemLanguage.__init__(self, language)
+        self.reference_predicates: Dict[str, Predicate] = dict()
+
+    @property
+    def predicates(self) -> List[Predicate]:
+        return list(self.language.predicates) + list(self.reference_predicates.values())
+
+    def has_predicate(self, name: str) -> bool:
+        return name in self.reference_predicates or bool(self.language.has_predicate(name))
+
+    def predicate(self, name: str, *sorts: Union[str, Any]) -> Predicate:
+        if self.has_predicate(name):
+            raise ValueError(f"Predicate {name} is already declared.")
+
+        predicate = Predicate(
+            name, self.language, *[self.language.get_sort(s) if isinstance(s, str) else s for s in sorts]
+        )
+        self.reference_predicates[name] = predicate
+        return predicate
+
+    def sort(self, name: str, *args: Any) -> Any:
+        raise ValueError(f"A reference plan cannot add type {name} to a flow.")
+
+
+class ClassicPDDLReference(Compilation):
+    """
+    Compiles a reference plan on top of a debug compilation of the rest of the flow, so
+    that many reference plans can be checked against one compilation. The token predicates,
+    actions, goal, and constants that a reference plan adds are kept to itself, and the
+    compilation underneath is never modified.
+    """
+
+    def __init__(self, template: ClassicPDDL, reference: ClassicalPlanReference):
+        Compilation.__init__(self, template.flow_definition)
+
+        self.template = template
+        self.cached_transforms = TransformRegistry(template.cached_transforms)
+        self.flow_definition = template.flow_definition.model_copy(
+            update={"reference": reference.transform(reference, self.cached_transforms)}
+        )
+
+        self.lang = ReferenceLanguage(template.lang)
+        self.constant_map: ChainMap[str, Any] = ChainMap(dict(), template.constant_map)
+        self.constant_index = ConstantIndex(template.constant_index)
+
+        self.problem = fs.Problem(problem_name=template.problem.name, domain_name=template.problem.domain_name)
+        self.problem.language = self.lang
+        self.problem.init = template.problem.init
+        self.problem.goal = template.problem.goal
+        self.problem.actions = OrderedDict(template.problem.actions)
+        self.problem.plan_metric = template.problem.plan_metric
+        self.init = self.problem.init
+
+    def __getattr__(self, name: str) -> Any:
+        template = self.__dict__.get("template")
 
-        return PDDL(domain=domain, problem=problem), self.cached_transforms
+        if template is None:
+            raise AttributeError(name)
+
+        return getattr(template, name)
+
+    def compile(self, **kwargs: Any) -> Tuple[PDDL, List[Transform]]:
+        self.run_pass(compile_reference, **kwargs)
+
+        pddl: PDDL = self.run_pass(ClassicPDDL.write_pddl)
+        return pddl, self.cached_transforms
+
+
+class ClassicPDDLProblem(Compilation):
+    """
+    Compiles only the request part of a flow (memory, goals, history, constraints, and
+    declared mappings) into a problem file for a previously compiled domain. Everything
+    else is looked up from the domain compilation, which is never modified.
+    """
+
+    def __init__(self, flow_definition: FlowDefinition, domain: CompiledDomain):
+        Compilation.__init__(self, flow_definition)
+
+        self.domain = domain
+        self.template = domain.compilation
+        self.cached_transforms = TransformRegistry(self.template.cached_transforms)
+        self.flow_definition = self.template.flow_definition.model_copy(
+            update={
+                key: [item.transform(item, self.cached_transforms) for item in getattr(flow_definition, key)]
+                for key in REQUEST_FIELDS
+            }
+        )
+
+        self.lang = ProblemLanguage(self.template.lang)
+        self.constant_map: ChainMap[str, Any] = ChainMap(dict(), self.template.constant_map)
+        self.constant_index = ConstantIndex(self.template.constant_index)
+        self.type_map = self.template.type_map
+
+        self.problem = fs.create_fstrips_problem(
+            domain_name=self.template.problem.domain_name,
+            problem_name=self.template.problem.name,
+            language=self.template.lang,
+        )
+        self.init = self.problem.init
+
+    def __getattr__(self, name: str) -> Any:
+        template = self.__dict__.get("template")
+
+        if template is None:
+            raise AttributeError(name)
+
+        return getattr(template, name)
+
+    def get_domain_conflicts(self, **kwargs: Any) -> List[str]:
+        debug_flag: Optional[SolutionQuality] = kwargs.get("debug_flag", None)
+        goal_type: GoalOptions = kwargs["goal_type"]
+        slot_options: Set[SlotOptions] = set(kwargs["slot_options"])
+
+        conflicts = list()
+
+        if debug_flag:
+            conflicts.append("debug compilations add reference specific actions")
+
+        if goal_type != GoalOptions.AND_AND and self.flow_definition.goal_items:
+            conflicts.append(f"{goal_type.value} goals add goal specific actions")
+
+        if self.flow_definition.history and self.flow_definition.partial_orders:
+            conflicts.append("partial orders depend on the history")
+
+        for memory_item in self.flow_definition.memory_items:
+            type_name = memory_item.item_type or TypeOptions.ROOT.value
+
+            if type_name not in self.type_map:
+                conflicts.append(f"memory item {memory_item.item_id} introduces new type {type_name}")
+
+            elif memory_item.item_id in self.template.constant_map:
+                if self.template.constant_map[memory_item.item_id].sort.name != type_name:
+                    conflicts.append(f"memory item {memory_item.item_id} changes the type of a catalog item")
+
+            elif SlotOptions.last_resort in slot_options and is_this_a_datum_type(type_name):
+                conflicts.append(f"memory item {memory_item.item_id} needs its own last resort slot filler")
+
+        predicate_names = {predicate.symbol for predicate in self.template.lang.predicates}
+        for goal_items in self.flow_definition.goal_items:
+            goals = goal_items.goals if isinstance(goal_items.goals, List) else [goal_items.goals]
+
+            for goal in goals:
+                if goal.goal_type == GoalType.CONSTRAINT and isinstance(goal.goal_name, Constraint):
+                    if f"status_{goal.goal_name.constraint}" not in predicate_names:
+                        conflicts.append(f"goal {goal.goal_name.constraint} introduces a new constraint")
+
+        return conflicts
+
+    def compile(self, **kwargs: Any) -> Tuple[PDDL, List[Transform]]:
+        slot_options: Set[SlotOptions] = set(kwargs["slot_options"])
+
+        for memory_item in self.flow_definition.memory_items:
+            add_memory_item_to_constant_map(self, memory_item)
+
+            if memory_item.item_state != MemoryState.UNKNOWN:
+                self.init.add(
+                    self.known(
+                        self.constant_map[memory_item.item_id],
+                        self.constant_map[memory_item.item_state.value],
+                    )
+                )
+
+        new_constants = list(self.constant_map.maps[0])
+
+        if len(slot_options) > 1:
+            self.run_pass(compile_new_object_maps, new_constants, **kwargs)
+            self.run_pass(get_goodness_map, constants=new_constants)
+
+        self.run_pass(compile_identity_mappings, new_constants, **kwargs)
+        self.run_pass(compile_mapping_facts, **kwargs)
+        self.run_pass(compile_goals, **kwargs)
+        self.run_pass(compile_history, **kwargs)
+
+        problem: str = self.run_pass(ClassicPDDLProblem.print_problem)
+        return PDDL(domain=self.domain.domain, problem=problem), self.cached_transforms
+
+    def print_problem(self) -> str:
+        init = list(self.domain.init)
+        cached_init = set(init)
+
+        for line in print_init(self.problem).split("\n"):
+            line = line.strip()
+            if line and line not in cached_init:
+                init.append(line)
+
+        return str(
+            load_tpl("fstrips_instance.tpl").format(
+                header_info="",
+                domain_name=self.problem.domain_name,
+                problem_name=self.problem.name,
+                objects=print_objects(self.constant_map.maps[0].values()),
+                init="\n        ".join(init),
+                goal=print_goal(self.problem),
+                constraints="",
+                domain_bounds="",
+                metric=self.domain.metric,
+            )
+        )
@@ -1,8 +1,24 @@
-from typing import Set, List, Union, Any, Tuple, Dict, Optional
-from nl2flow.plan.schemas import PlannerResponse
-from nl2flow.compile.compilations import ClassicPDDL
+from typing import Set, List, Union, Any, Tuple, Dict, Optional, Iterator, Iterable, Deque, Generator, get_args
+from collections import deque
+from contextlib import contextmanager
+from pydantic import BaseModel
+from warnings import warn
+from nl2flow.plan.schemas import Action, PlannerResponse, PlanningBudget, ClassicalPlan, RawPlannerResult, RawPlan
+from nl2flow.plan.simulation import PlanSimulator, get_plan_suffix
+from nl2flow.compile.compilations import Compilation, ClassicPDDL, ClassicPDDLProblem, CompiledDomain, CATALOG_FIELDS
+from nl2flow.compile.incremental import get_section_hashes, get_dirty_sections, diff_pddl
+from nl2flow.compile.cache import CompileCache
+from nl2flow.compile.profiling import CompileProfiler
+from nl2flow.compile.pruning import PruningReport, prune_flow_definition
 from nl2flow.compile.operators import Operator
-from nl2flow.compile.schemas import TypeItem, FlowDefinition, PDDL, ClassicalPlanReference, Transform
+from nl2flow.compile.schemas import (
+    TypeItem,
+    FlowDefinition,
+    PDDL,
+    ClassicalPlanReference,
+    Transform,
+    Step,
+)
 from nl2flow.debug.schemas import SolutionQuality
 from nl2flow.compile.options import (
     CompileOptions,
@@ -16,6 +32,16 @@ from nl2flow.compile.options import (
 )
 
 
+# Items added to a flow go into the first section of the flow definition that holds
+# items of their type.
+FLOW_DEFINITION_FIELDS: Dict[type, str] = dict()
+
+for field_name, field_info in FlowDefinition.model_fields.items():
+    for field_type in get_args(field_info.annotation):
+        if isinstance(field_type, type) and issubclass(field_type, BaseModel):
+            FLOW_DEFINITION_FIELDS.setdefault(field_type, field_name)
+
+
 class Flow:
     def __init__(
         self,
@@ -33,12 +59,89 @@ class Flow:
             SlotOptions.relaxed,
         }
 
-        self._compilation: ClassicPDDL = ClassicPDDL(self.flow_definition)
+        self._compilation: Compilation = ClassicPDDL(self.flow_definition)
+        self._compile_cache: Optional[CompileCache] = None
+        self._uncompiled_hit: Optional[Tuple[Optional[SolutionQuality], Optional[CompiledDomain]]] = None
+        self._compile_profiler: Optional[CompileProfiler] = None
+        self._pruning_report: Optional[PruningReport] = None
+
+        self._check_incremental: bool = False
+        self._section_hashes: Dict[str, str] = dict()
+        self._incremental_domain: Optional[CompiledDomain] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Compilations and compile caches are tied to the process that made them, so a
+        # pickled flow, e.g. one sent to a worker process, starts out uncompiled.
+        state = dict(self.__dict__)
+        state.update(
+            _compilation=None,
+            _compile_cache=None,
+            _uncompiled_hit=None,
+            _section_hashes=dict(),
+            _incremental_domain=None,
+        )
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._compilation = ClassicPDDL(self.flow_definition)
 
     @property
-    def compilation(self) -> ClassicPDDL:
+    def compilation(self) -> Compilation:
         return self._compilation
 
+    def get_compilation(self) -> Compilation:
+        # A compile cache hit leaves no compilation behind, so the flow is compiled
+        # again the first time that the compilation behind a hit is asked for.
+        if self._uncompiled_hit is not None:
+            self.__compile_to_pddl(*self._uncompiled_hit)
+
+        return self._compilation
+
+    @property
+    def compile_cache(self) -> Optional[CompileCache]:
+        return self._compile_cache
+
+    @compile_cache.setter
+    def compile_cache(self, cache: Optional[CompileCache]) -> None:
+        self._compile_cache = cache
+
+    @property
+    def compile_profiler(self) -> Optional[CompileProfiler]:
+        return self._compile_profiler
+
+    @compile_profiler.setter
+    def compile_profiler(self, profiler: Optional[CompileProfiler]) -> None:
+        self._compile_profiler = profiler
+
+    @property
+    def pruning_report(self) -> Optional[PruningReport]:
+        return self._pruning_report
+
+    @property
+    def check_incremental(self) -> bool:
+        return self._check_incremental
+
+    @check_incremental.setter
+    def check_incremental(self, check: bool) -> None:
+        self._check_incremental = check
+
+    @property
+    def dirty_sections(self) -> Set[str]:
+        return get_dirty_sections(self.flow_definition, self._section_hashes)
+
+    @property
+    def compile_options(self) -> Dict[str, Any]:
+        return {
+            "slot_options": self.slot_options,
+            "mapping_options": self.mapping_options,
+            "confirm_options": self.confirm_options,
+            "variable_life_cycle": self.variable_life_cycle,
+            "optimization_options": self.optimization_options,
+            "goal_type": self.goal_type,
+            "lookahead": self.lookahead,
+        }
+
     @property
     def variable_life_cycle(self) -> Set[LifeCycleOptions]:
         return self._variable_life_cycle
@@ -133,40 +236,80 @@ class Flow:
         else:
             raise TypeError(f"Tried to initialize with unknown object: {initialize}")
 
+    @contextmanager
+    def bulk_edit(self) -> Iterator[FlowDefinition]:
+        # Every change to the flow definition validates all of it, so changes made inside
+        # a bulk edit are validated together once, the next time the flow is compiled.
+        with self.flow_definition.deferred_validation() as flow_definition:
+            yield flow_definition
+
     def add(self, new_item: Union[Any, List[Any]]) -> None:
         if not isinstance(new_item, List):
             new_item = [new_item]
 
         for item in new_item:
-            if issubclass(type(item), Operator):
-                item = item.definition
+            item, key_name = self.get_field_name(item)
+            current_item_value = getattr(self.flow_definition, key_name)
 
-            type_of_item = type(item).__name__
-            key_name = next(
-                (field[0] for field in FlowDefinition.model_fields.items() if type_of_item in str(field[1].annotation)),
-                None,
-            )
+            if isinstance(current_item_value, List):
+                current_item_value.append(item)
+                setattr(self.flow_definition, key_name, current_item_value)
 
-            if key_name:
-                current_item_value = getattr(self.flow_definition, key_name)
+                if isinstance(item, TypeItem):
+                    self.add(self.get_child_types(item))
+
+            elif isinstance(item, ClassicalPlanReference):
+                setattr(self.flow_definition, key_name, item)
+
+    def add_many(self, new_items: Iterable[Any]) -> None:
+        # Items are appended in place and each section that changed is assigned back
+        # once, so the flow definition is validated once for all of them at the end.
+        pending_items: Deque[Any] = deque(new_items)
+        changed_keys: Dict[str, None] = dict()
+
+        with self.bulk_edit() as flow_definition:
+            while pending_items:
+                item, key_name = self.get_field_name(pending_items.popleft())
+                current_item_value = getattr(flow_definition, key_name)
 
                 if isinstance(current_item_value, List):
                     current_item_value.append(item)
-                    setattr(self.flow_definition, key_name, current_item_value)
+                    changed_keys.setdefault(key_name)
 
-                    if type_of_item == TypeItem.__name__ and item.children:
-                        children = item.children
+                    if isinstance(item, TypeItem):
+                        pending_items.extendleft(reversed(self.get_child_types(item)))
 
-                        if not isinstance(children, Set):
-                            children = {children}
+                elif isinstance(item, ClassicalPlanReference):
+                    setattr(flow_definition, key_name, item)
 
-                        for child in children:
-                            self.add(TypeItem(name=child, parent=item.name, children=[]))
+            for key_name in changed_keys:
+                setattr(flow_definition, key_name, getattr(flow_definition, key_name))
 
-                elif isinstance(item, ClassicalPlanReference):
-                    setattr(self.flow_definition, key_name, item)
-            else:
-                raise TypeError("Attempted to add unknown type of object to flow.")
+        flow_definition.validate_pending()
+
+    @staticmethod
+    def get_field_name(item: Any) -> Tuple[Any, str]:
+        if issubclass(type(item), Operator):
+            item = item.definition
+
+        key_name = next((FLOW_DEFINITION_FIELDS[t] for t in type(item).__mro__ if t in FLOW_DEFINITION_FIELDS), None)
+
+        if key_name is None:
+            raise TypeError("Attempted to add unknown type of object to flow.")
+
+        return item, key_name
+
+    @staticmethod
+    def get_child_types(item: TypeItem) -> List[TypeItem]:
+        children = item.children
+
+        if not children:
+            return []
+
+        if not isinstance(children, Set):
+            children = {children}
+
+        return [TypeItem(name=child, parent=item.name, children=[]) for child in children]
 
     def set_start(self, operator_name: Optional[str]) -> None:
         self.flow_definition.starts_with = operator_name
@@ -179,20 +322,230 @@ class Flow:
         planner: Any,
         debug_flag: Optional[SolutionQuality] = None,
         compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
+        budget: Optional[PlanningBudget] = None,
+    ) -> PlannerResponse:
+        pddl, transforms = self.compile_to_pddl(debug_flag, compilation_type, domain)
+        parsed_plans: PlannerResponse = planner.plan(
+            pddl=pddl,
+            flow=self,
+            transforms=transforms,
+            domain=domain,
+            budget=budget,
+        )
+        return parsed_plans
+
+    def iter_plans(
+        self,
+        planner: Any,
+        debug_flag: Optional[SolutionQuality] = None,
+        compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
+        budget: Optional[PlanningBudget] = None,
+    ) -> Generator[ClassicalPlan, None, PlannerResponse]:
+        pddl, transforms = self.compile_to_pddl(debug_flag, compilation_type, domain)
+        planner_response: PlannerResponse = yield from planner.iter_plans(
+            pddl=pddl, flow=self, transforms=transforms, domain=domain, budget=budget
+        )
+        return planner_response
+
+    async def plan_it_async(
+        self,
+        planner: Any,
+        debug_flag: Optional[SolutionQuality] = None,
+        compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
+        budget: Optional[PlanningBudget] = None,
     ) -> PlannerResponse:
-        pddl, transforms = self.compile_to_pddl(debug_flag, compilation_type)
-        parsed_plans: PlannerResponse = planner.plan(pddl=pddl, flow=self, transforms=transforms)
+        pddl, transforms = self.compile_to_pddl(debug_flag, compilation_type, domain)
+        parsed_plans: PlannerResponse = await planner.plan_async(
+            pddl=pddl,
+            flow=self,
+            transforms=transforms,
+            domain=domain,
+            budget=budget,
+        )
         return parsed_plans
 
+    def replan(
+        self,
+        planner: Any,
+        previous: ClassicalPlan,
+        executed_prefix: List[Step],
+        debug_flag: Optional[SolutionQuality] = None,
+        compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
+        budget: Optional[PlanningBudget] = None,
+    ) -> PlannerResponse:
+        # The executed steps only go into the history of the flow while it is replanned,
+        # so the flow is left as it was and each call starts from the same history.
+        self.check_plan_prefix(previous, executed_prefix)
+        flow_definition = self.flow_definition
+        self.flow_definition = flow_definition.model_copy(update={"history": list(flow_definition.history)})
+
+        try:
+            self.add(list(executed_prefix))
+            return self.__replan(planner, previous, len(executed_prefix), debug_flag, compilation_type, domain, budget)
+
+        finally:
+            self.flow_definition = flow_definition
+
+    @staticmethod
+    def check_plan_prefix(plan: ClassicalPlan, prefix: List[Step]) -> None:
+        if len(prefix) > len(plan.plan):
+            raise ValueError("Executed steps are longer than the previous plan.")
+
+        for index, (step, item) in enumerate(zip(prefix, plan.plan)):
+            parameters = [p if isinstance(p, str) else p.item_id for p in step.parameters]
+
+            if not isinstance(item, Action) or item.name != step.name or item.inputs != parameters:
+                raise ValueError(f"Executed step {index} ({step.name}) is not step {index} of the previous plan.")
+
+    def __replan(
+        self,
+        planner: Any,
+        previous: ClassicalPlan,
+        num_executed: int,
+        debug_flag: Optional[SolutionQuality],
+        compilation_type: CompileOptions,
+        domain: Optional[CompiledDomain],
+        budget: Optional[PlanningBudget],
+    ) -> PlannerResponse:
+        pddl, transforms = self.compile_to_pddl(debug_flag, compilation_type, domain)
+
+        # Grouped plans do not line up with the raw plans that they came from, so there
+        # is no suffix to check, they are always planned again, and the cost of the whole
+        # previous plan is the only bound there is for them.
+        is_grouped = (
+            SlotOptions.group_slots in self.slot_options
+            or MappingOptions.group_maps in self.mapping_options
+            or ConfirmOptions.group_confirms in self.confirm_options
+        )
+
+        cost_bound = previous.cost
+
+        if not is_grouped:
+            suffix = get_plan_suffix(previous, num_executed)
+            simulator = PlanSimulator(self.get_compilation())
+            simulation_result = simulator.simulate(suffix)
+
+            if simulation_result.is_valid and hasattr(planner, "get_planner_response"):
+                raw_planner_result = RawPlannerResult(
+                    list_of_plans=[RawPlan(actions=suffix, cost=simulation_result.cost)],
+                    error_running_planner=False,
+                    is_no_solution=False,
+                )
+
+                repaired_plans: PlannerResponse = planner.get_planner_response(
+                    raw_planner_result, flow=self, transforms=transforms
+                )
+                return repaired_plans
+
+            suffix_cost = simulator.get_cost(suffix)
+            if suffix_cost is not None:
+                cost_bound = suffix_cost
+
+        # The rest of the previous plan is no longer valid, so look for a new plan that
+        # costs no more than the rest did, and for any plan at all if there is none.
+        budget = budget or PlanningBudget()
+        bounded_budget = budget.model_copy(update={"cost_bound": int(cost_bound) + 1})
+
+        for planning_budget in [bounded_budget, budget]:
+            parsed_plans: PlannerResponse = planner.plan(
+                pddl=pddl,
+                flow=self,
+                transforms=transforms,
+                domain=domain,
+                budget=planning_budget,
+            )
+
+            if parsed_plans.list_of_plans:
+                break
+
+        return parsed_plans
+
+    def compile_domain(self, compilation_type: CompileOptions = CompileOptions.CLASSICAL) -> CompiledDomain:
+        if compilation_type.value != CompileOptions.CLASSICAL.value:
+            raise NotImplementedError
+
+        self.flow_definition.validate_pending()
+        return ClassicPDDL.compile_domain(
+            self.flow_definition,
+            **self.compile_options,
+            profiler=self.compile_profiler,
+        )
+
     def compile_to_pddl(
         self,
         debug_flag: Optional[SolutionQuality] = None,
         compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
     ) -> Tuple[PDDL, List[Transform]]:
         if compilation_type.value != CompileOptions.CLASSICAL.value:
             raise NotImplementedError
 
-        self._compilation = ClassicPDDL(self.flow_definition)
+        self.flow_definition.validate_pending()
+
+        if self.compile_cache is None:
+            return self.__compile_to_pddl(debug_flag, domain)
+
+        cache_key = self.compile_cache.get_key(
+            self.flow_definition,
+            **self.compile_options,
+            debug_flag=debug_flag,
+            compilation_type=compilation_type,
+            domain=domain.key if domain else None,
+        )
+
+        cached_result = self.compile_cache.get(cache_key)
+        if cached_result is not None:
+            self._compilation = ClassicPDDL(self.flow_definition)
+            self._uncompiled_hit = (debug_flag, domain)
+            return cached_result
+
+        pddl, transforms = self.__compile_to_pddl(debug_flag, domain)
+        self.compile_cache.put(cache_key, pddl, transforms)
+
+        return pddl, transforms
+
+    def __compile_to_pddl(
+        self,
+        debug_flag: Optional[SolutionQuality] = None,
+        domain: Optional[CompiledDomain] = None,
+    ) -> Tuple[PDDL, List[Transform]]:
+        self._uncompiled_hit = None
+
+        if domain is not None:
+            if CompiledDomain.get_options(**self.compile_options) != domain.options:
+                raise ValueError("Cached domain was compiled with different compile options.")
+
+            problem_compilation = ClassicPDDLProblem(self.flow_definition, domain)
+            problem_compilation.profiler = self.compile_profiler
+            conflicts = problem_compilation.get_domain_conflicts(**self.compile_options, debug_flag=debug_flag)
+
+            if not conflicts:
+                self._compilation = problem_compilation
+                return problem_compilation.compile(**self.compile_options, debug_flag=debug_flag)
+
+            warn(message=f"Cannot reuse cached domain: {'; '.join(conflicts)}.", category=RuntimeWarning)
+
+        elif (
+            NL2FlowOptions.incremental_compile in self.optimization_options
+            and NL2FlowOptions.relevance_pruning not in self.optimization_options
+        ):
+            incremental_result = self.__compile_incrementally(debug_flag)
+
+            if incremental_result is not None:
+                return incremental_result
+
+        flow_definition = self.flow_definition
+        self._pruning_report = None
+
+        if NL2FlowOptions.relevance_pruning in self.optimization_options:
+            flow_definition, self._pruning_report = prune_flow_definition(flow_definition)
+
+        self._compilation = ClassicPDDL(flow_definition)
+        self._compilation.profiler = self.compile_profiler
         pddl, transforms = self._compilation.compile(
             slot_options=self.slot_options,
             mapping_options=self.mapping_options,
@@ -205,3 +558,45 @@ class Flow:
         )
 
         return pddl, transforms
+
+    def __compile_incrementally(
+        self,
+        debug_flag: Optional[SolutionQuality] = None,
+    ) -> Optional[Tuple[PDDL, List[Transform]]]:
+        dirty_sections = self.dirty_sections
+        self._section_hashes = get_section_hashes(self.flow_definition)
+
+        # The catalog sections are compiled into a domain that is kept across compiles and
+        # only rebuilt when one of them changes, everything else goes into the problem.
+        domain = self._incremental_domain
+        if (
+            domain is None
+            or dirty_sections & set(CATALOG_FIELDS)
+            or CompiledDomain.get_options(**self.compile_options) != domain.options
+        ):
+            domain = self._incremental_domain = self.compile_domain()
+
+        problem_compilation = ClassicPDDLProblem(self.flow_definition, domain)
+        problem_compilation.profiler = self.compile_profiler
+
+        if problem_compilation.get_domain_conflicts(**self.compile_options, debug_flag=debug_flag):
+            return None
+
+        self._compilation = problem_compilation
+        pddl, transforms = problem_compilation.compile(**self.compile_options, debug_flag=debug_flag)
+
+        if self.check_incremental:
+            full_compilation = ClassicPDDL(self.flow_definition)
+
+            full_pddl, _ = full_compilation.compile(
+                **self.compile_options,
+                debug_flag=debug_flag,
+            )
+
+            differences = diff_pddl(pddl, full_pddl)
+            if differences:
+                raise RuntimeError(
+                    "Incremental compilation does not match a full compilation:\n" + "\n".join(differences)
+                )
+
+        return pddl, transforms
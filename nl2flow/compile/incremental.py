@@ -0,0 +1,120 @@
+from typing import Dict, List, Set
+from nl2flow.compile.schemas import FlowDefinition, PDDL
+from nl2flow.compile.utils import get_content_hash
+
+import re
+
+FLOW_SECTIONS = [key for key in FlowDefinition.model_fields if key != "name"]
+
+PDDL_ATOM = re.compile(r"\((?:not|increase) \([^()]*\)[^()]*\)|\([^()]*\)")
+PDDL_ACTION = re.compile(r"\(:action\s+(\S+)(.*?)(?=\(:action|\Z)", re.DOTALL)
+PDDL_ACTION_PARTS = re.compile(
+    r":(parameters|precondition|effect)(.*?)(?=:parameters|:precondition|:effect|\Z)", re.DOTALL
+)
+PDDL_COST = re.compile(r"\(increase \(total-cost \) (?:\([^()]*\)|[^()]*)\)")
+PDDL_OBJECTS = re.compile(r"\(:(?:constants|objects)([^()]*)\)", re.DOTALL)
+UNREACHABLE = "unreachable actions"
+
+
+def get_section_hashes(flow_definition: FlowDefinition) -> Dict[str, str]:
+    return {key: get_content_hash(getattr(flow_definition, key)) for key in FLOW_SECTIONS}
+
+
+def get_dirty_sections(flow_definition: FlowDefinition, section_hashes: Dict[str, str]) -> Set[str]:
+    return {
+        key
+        for key, section_hash in get_section_hashes(flow_definition).items()
+        if section_hashes.get(key) != section_hash
+    }
+
+
+def get_predicate(atom: str) -> str:
+    return atom.strip("()").split()[0] if atom.strip("()") else ""
+
+
+def get_action_parts(body: str) -> Dict[str, List[str]]:
+    # Preconditions, add effects, delete effects and costs are kept apart so that an atom
+    # that moves from one to the other shows up as a difference.
+    parts: Dict[str, List[str]] = {"parameters": [], "precondition": [], "add": [], "delete": [], "cost": []}
+
+    for part, text in PDDL_ACTION_PARTS.findall(body):
+        if part == "parameters":
+            parts[part] = [" ".join(text.split())]
+
+        elif part == "precondition":
+            parts[part] = PDDL_ATOM.findall(text)
+
+        else:
+            parts["cost"] = PDDL_COST.findall(text)
+
+            for atom in PDDL_ATOM.findall(PDDL_COST.sub("", text)):
+                parts["delete" if atom.startswith("(not ") else "add"].append(atom)
+
+    return parts
+
+
+def get_pddl_sections(pddl: PDDL) -> Dict[str, Set[str]]:
+    # Compiling against a domain moves request objects from the constants of the domain
+    # to the objects of the problem and may declare predicates and actions that are never
+    # used, so compilations are compared on what they declare and can do rather than on
+    # their text. Actions that need a fact that can never hold are listed apart as well.
+    sections: Dict[str, Set[str]] = {"objects": set(), "actions": set(), "init": set(), "goal": set()}
+    sections[UNREACHABLE] = set()
+
+    for block in PDDL_OBJECTS.findall(pddl.domain + pddl.problem):
+        for line in block.split("\n"):
+            if " - " in line:
+                names, type_name = line.rsplit(" - ", 1)
+                sections["objects"].update(f"{name} - {type_name.strip()}" for name in names.split())
+
+    init, _, goal = pddl.problem.partition("(:goal")
+    _, _, init = init.partition("(:init")
+
+    sections["init"] = {line.strip() for line in init.split("\n") if line.strip().startswith("(")}
+    sections["goal"] = set(PDDL_ATOM.findall(goal.split("(:metric")[0]))
+
+    actions = {name: get_action_parts(body) for name, body in PDDL_ACTION.findall(pddl.domain)}
+    reachable_predicates = {get_predicate(atom) for atom in sections["init"]} | {
+        get_predicate(atom) for parts in actions.values() for atom in parts["add"]
+    }
+
+    for name, parts in actions.items():
+        sections["actions"].update(f"{name} :{part} {' '.join(sorted(set(atoms)))}" for part, atoms in parts.items())
+
+        if not all(
+            get_predicate(atom) in reachable_predicates for atom in parts["precondition"] if atom[:5] != "(not "
+        ):
+            sections[UNREACHABLE].add(name)
+
+    return sections
+
+
+def get_action_name(action_part: str) -> str:
+    return action_part.split()[0]
+
+
+def diff_pddl(pddl: PDDL, reference: PDDL) -> List[str]:
+    sections = get_pddl_sections(pddl)
+    reference_sections = get_pddl_sections(reference)
+    differences: List[str] = list()
+
+    # A reusable domain declares the mapping actions even for requests without mappings,
+    # where no is_mappable fact ever holds, and a full compilation does not. An action is
+    # only left out when the other compilation does not have it and it can never be used,
+    # so the actions that both compilations have are always compared in full.
+    action_names = {get_action_name(item) for item in sections["actions"]}
+    reference_action_names = {get_action_name(item) for item in reference_sections["actions"]}
+    ignored_actions = (sections.pop(UNREACHABLE) - reference_action_names) | (
+        reference_sections.pop(UNREACHABLE) - action_names
+    )
+
+    for key in sections:
+        items = {item for item in sections[key] if key != "actions" or get_action_name(item) not in ignored_actions}
+        reference_items = {
+            item for item in reference_sections[key] if key != "actions" or get_action_name(item) not in ignored_actions
+        }
+
+        differences.extend(f"{key} + {item}" for item in sorted(items - reference_items))
+        differences.extend(f"{key} - {item}" for item in sorted(reference_items - items))
+
+    return differences
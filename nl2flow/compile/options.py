@@ -9,6 +9,9 @@ SLOT_GOODNESS: float = 0.5
 class NL2FlowOptions(enum.Enum):
     multi_instance = "MULTI_INSTANCE"
     allow_retries = "ALLOW_RETRIES"
+    relevance_pruning = "RELEVANCE_PRUNING"
+    incremental_compile = "INCREMENTAL_COMPILE"
+    deduplicate_plans = "DEDUPLICATE_PLANS"
 
 
 class RestrictedOperations(enum.Enum):
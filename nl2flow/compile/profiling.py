@@ -0,0 +1,127 @@
+from __future__ import annotations
+from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Optional
+from nl2flow.utility.file_utility import open_atomic
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+class CompileCounts(BaseModel):
+    actions: int = 0
+    predicates: int = 0
+    functions: int = 0
+    constants: int = 0
+    init_facts: int = 0
+
+    @classmethod
+    def of(cls, compilation: Any) -> CompileCounts:
+        return cls(
+            actions=len(compilation.problem.actions),
+            predicates=len(compilation.lang.predicates),
+            functions=len(compilation.lang.functions),
+            constants=len(compilation.constant_map),
+            init_facts=sum(len(extension) for extension in compilation.init.predicate_extensions.values())
+            + sum(len(definition.data) for definition in compilation.init.function_extensions.values()),
+        )
+
+    def __sub__(self, other: CompileCounts) -> CompileCounts:
+        return CompileCounts(**{key: getattr(self, key) - getattr(other, key) for key in CompileCounts.model_fields})
+
+
+class PassProfile(BaseModel):
+    name: str
+    compilation: str
+    start: float
+    wall_time: float
+    added: CompileCounts
+    allocated: Optional[int] = None
+    peak_allocated: Optional[int] = None
+
+
+class CompileProfiler:
+    """
+    Records the wall time of each compile pass along with the number of actions, predicates,
+    functions, constants, and initial facts that it added. With track_allocations, it also
+    records the net and peak memory allocated by each pass using tracemalloc, which slows
+    down compilation considerably. Compilations only call into the profiler when one is set,
+    so there is no overhead otherwise. Subclasses can override on_pass to receive profiles
+    as they are recorded.
+    """
+
+    def __init__(self, track_allocations: bool = False) -> None:
+        self.track_allocations = track_allocations
+        self.profiles: List[PassProfile] = list()
+
+    def run(self, compilation: Any, compile_pass: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        counts = CompileCounts.of(compilation)
+        allocated: Optional[int] = None
+        peak_allocated: Optional[int] = None
+        start_tracing = self.track_allocations and not tracemalloc.is_tracing()
+
+        if start_tracing:
+            tracemalloc.start()
+
+        if self.track_allocations:
+            allocated, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        result = compile_pass(compilation, *args, **kwargs)
+        wall_time = time.perf_counter() - start
+
+        if self.track_allocations and allocated is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated, peak_allocated = current - allocated, peak - allocated
+
+        if start_tracing:
+            tracemalloc.stop()
+
+        profile = PassProfile(
+            name=compile_pass.__name__,
+            compilation=type(compilation).__name__,
+            start=start,
+            wall_time=wall_time,
+            added=CompileCounts.of(compilation) - counts,
+            allocated=allocated,
+            peak_allocated=peak_allocated,
+        )
+
+        compilation.pass_profiles.append(profile)
+        self.on_pass(profile)
+
+        return result
+
+    def on_pass(self, profile: PassProfile) -> None:
+        self.profiles.append(profile)
+
+    def get_summary(self) -> Dict[str, float]:
+        summary: Dict[str, float] = dict()
+
+        for profile in self.profiles:
+            summary[profile.name] = summary.get(profile.name, 0.0) + profile.wall_time
+
+        return summary
+
+    def write_trace(self, trace_file: str) -> None:
+        # Trace Event Format, as read by chrome://tracing and Perfetto.
+        pid, tid = os.getpid(), threading.get_ident()
+        trace_events = [
+            {
+                "name": profile.name,
+                "cat": profile.compilation,
+                "ph": "X",
+                "ts": profile.start * 1e6,
+                "dur": profile.wall_time * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": profile.model_dump(exclude={"name", "compilation", "start", "wall_time"}),
+            }
+            for profile in self.profiles
+        ]
+
+        with open_atomic(trace_file, "w") as trace_handle:
+            json.dump({"traceEvents": trace_events}, trace_handle)
@@ -0,0 +1,325 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple, Union
+from pydantic import BaseModel
+from nl2flow.compile.basic_compilations.utils import unpack_list_of_signature_items
+from nl2flow.compile.schemas import (
+    FlowDefinition,
+    OperatorDefinition,
+    Constraint,
+    GoalItem,
+    MappingItem,
+    MemoryItem,
+    PartialOrder,
+    Parameter,
+    SignatureItem,
+    Step,
+)
+from nl2flow.compile.options import GoalType, TypeOptions
+
+
+class PruningReport(BaseModel):
+    operators: List[str] = []
+    memory_items: List[str] = []
+    list_of_mappings: List[MappingItem] = []
+    partial_orders: List[PartialOrder] = []
+    slot_properties: List[str] = []
+    constraints: List[str] = []
+    manifest_constraints: List[str] = []
+
+    @property
+    def is_empty(self) -> bool:
+        return not any(getattr(self, key) for key in PruningReport.model_fields)
+
+
+def get_constraints_of_signatures(signature_items: List[SignatureItem]) -> List[str]:
+    return [constraint.constraint for signature_item in signature_items for constraint in signature_item.constraints]
+
+
+def get_output_constraints(operator: OperatorDefinition) -> List[str]:
+    outputs = operator.outputs if isinstance(operator.outputs, List) else [operator.outputs]
+    constraints = list()
+
+    for output in outputs:
+        constraints.extend([constraint.constraint for constraint in output.constraints])
+        constraints.extend(get_constraints_of_signatures(output.outcomes))
+
+    return constraints
+
+
+def get_output_names(operator: OperatorDefinition) -> List[str]:
+    outputs = operator.outputs if isinstance(operator.outputs, List) else [operator.outputs]
+    return [name for output in outputs for name in unpack_list_of_signature_items(output.outcomes)]
+
+
+def get_declared_objects(flow_definition: FlowDefinition) -> Dict[str, Set[str]]:
+    return FlowDefinition.get_list_of_object_names(flow_definition.model_copy(update={"goal_items": []}))
+
+
+def get_step_parameters(step: Step) -> List[str]:
+    return [p.item_id if isinstance(p, Parameter) else p for p in step.parameters]
+
+
+class RelevanceAnalysis:
+    """
+    Backward relevance analysis over a flow definition. Starting from the goals (and
+    anything the request pins down, such as the history or the start and end of the
+    flow) it follows operator inputs back to the operators that produce them, declared
+    mappings in either direction, objects that a typed mapping can map from, and the
+    operators that set the constraints required along the way.
+    """
+
+    def __init__(self, flow_definition: FlowDefinition):
+        self.flow_definition = flow_definition
+
+        self.operators: Dict[str, OperatorDefinition] = {o.name: o for o in flow_definition.operators}
+        self.object_types: Dict[str, Optional[str]] = {
+            name: next(iter(types), None)
+            for name, types in FlowDefinition.get_list_of_object_names(flow_definition).items()
+        }
+
+        self.type_parents: Dict[str, Optional[str]] = {t.name: t.parent for t in flow_definition.type_hierarchy}
+        self.producers: Dict[str, Set[str]] = dict()
+        self.consumers: Dict[str, Set[str]] = dict()
+        self.constraint_producers: Dict[str, Set[str]] = dict()
+        self.mapping_neighbors: Dict[str, Set[str]] = dict()
+        self.type_groups: Dict[str, Set[str]] = dict()
+        self.objects_of_type: Dict[str, Set[str]] = dict()
+        self.propagated_slots: Dict[str, Set[str]] = dict()
+        self.antecedents: Dict[str, Set[str]] = dict()
+
+        for operator in flow_definition.operators:
+            for name in unpack_list_of_signature_items(operator.inputs):
+                self.consumers.setdefault(name, set()).add(operator.name)
+
+            for name in get_output_names(operator):
+                self.producers.setdefault(name, set()).add(operator.name)
+
+            for constraint in get_output_constraints(operator):
+                self.constraint_producers.setdefault(constraint, set()).add(operator.name)
+
+        for mapping in flow_definition.list_of_mappings:
+            self.mapping_neighbors.setdefault(mapping.source_name, set()).add(mapping.target_name)
+            self.mapping_neighbors.setdefault(mapping.target_name, set()).add(mapping.source_name)
+
+        for name, type_name in self.object_types.items():
+            self.objects_of_type.setdefault(type_name or TypeOptions.ROOT.value, set()).add(name)
+            type_group = self.get_type_group(type_name)
+
+            if type_group is not None:
+                self.type_groups.setdefault(type_group, set()).add(name)
+
+        for slot in flow_definition.slot_properties:
+            if slot.propagate_desirability:
+                type_name = self.object_types.get(slot.slot_name) or TypeOptions.ROOT.value
+                self.propagated_slots.setdefault(type_name, set()).add(slot.slot_name)
+
+        for partial_order in flow_definition.partial_orders:
+            self.antecedents.setdefault(partial_order.consequent, set()).add(partial_order.antecedent)
+
+        self.relevant_operators: Set[str] = set()
+        self.relevant_objects: Set[str] = set()
+        self.relevant_constraints: Set[str] = set()
+        self.__pending: List[Tuple[str, str]] = list()
+
+    def get_type_group(self, type_name: Optional[str]) -> Optional[str]:
+        # Typed mappings range over a type and its subtypes, so objects can map
+        # to each other as long as they share a datum type below the root.
+        if type_name is None or type_name == TypeOptions.ROOT.value:
+            return None
+
+        seen = {type_name}
+        parent = self.type_parents.get(type_name, TypeOptions.ROOT.value)
+
+        while parent and parent != TypeOptions.ROOT.value and parent not in seen:
+            type_name = parent
+            seen.add(type_name)
+            parent = self.type_parents.get(type_name, TypeOptions.ROOT.value)
+
+        return type_name
+
+    def add_goal(self, goal_item: GoalItem) -> None:
+        goal = goal_item.goal_name
+
+        if isinstance(goal, Constraint):
+            self.add("constraint", goal.constraint)
+
+        elif isinstance(goal, Step):
+            self.add("operator", goal.name)
+            for name in get_step_parameters(goal):
+                self.add("object", name)
+
+        elif goal_item.goal_type == GoalType.OPERATOR:
+            self.add("operator", goal)
+
+        else:
+            names = (
+                self.objects_of_type.get(goal, set())
+                if goal in self.objects_of_type or goal in self.type_parents
+                else {goal}
+            )
+
+            for name in names:
+                self.add("object", name)
+
+                if goal_item.goal_type == GoalType.OBJECT_USED:
+                    self.add_consumers(name)
+
+    def get_mapping_neighbors(self, name: str) -> Set[str]:
+        type_group = self.get_type_group(self.object_types.get(name))
+        return self.mapping_neighbors.get(name, set()) | self.type_groups.get(type_group or "", set())
+
+    def add_consumers(self, name: str) -> None:
+        # An object is used by any operator that takes it as an input or, with
+        # multiple instances, takes an object that it can be mapped to.
+        names = {name}
+        pending = [name]
+
+        while pending:
+            for item in self.get_mapping_neighbors(pending.pop()) - names:
+                names.add(item)
+                pending.append(item)
+
+        for item in names:
+            for operator in self.consumers.get(item, set()):
+                self.add("operator", operator)
+
+    def add(self, kind: str, name: Optional[str]) -> None:
+        if name is not None:
+            self.__pending.append((kind, name))
+
+    def run(self) -> RelevanceAnalysis:
+        flow_definition = self.flow_definition
+
+        for goal_items in flow_definition.goal_items:
+            goals = goal_items.goals if isinstance(goal_items.goals, List) else [goal_items.goals]
+            for goal_item in goals:
+                self.add_goal(goal_item)
+
+        steps: List[Union[Step, Constraint]] = list(flow_definition.history)
+        if flow_definition.reference:
+            steps.extend(flow_definition.reference.plan)
+
+        for step in steps:
+            if isinstance(step, Step):
+                self.add("operator", step.name)
+                for name in get_step_parameters(step):
+                    self.add("object", name)
+            else:
+                self.add("constraint", step.constraint)
+
+        self.add("operator", flow_definition.starts_with)
+        self.add("operator", flow_definition.ends_with)
+
+        while self.__pending:
+            kind, name = self.__pending.pop()
+
+            if kind == "operator":
+                self.visit_operator(name)
+            elif kind == "object":
+                self.visit_object(name)
+            else:
+                self.visit_constraint(name)
+
+        return self
+
+    def visit_operator(self, name: str) -> None:
+        if name in self.relevant_operators or name not in self.operators:
+            return
+
+        self.relevant_operators.add(name)
+        operator = self.operators[name]
+
+        for item in unpack_list_of_signature_items(operator.inputs):
+            self.add("object", item)
+
+        for constraint in get_constraints_of_signatures(operator.inputs):
+            self.add("constraint", constraint)
+
+        for antecedent in self.antecedents.get(name, set()):
+            self.add("operator", antecedent)
+
+    def visit_object(self, name: str) -> None:
+        if name in self.relevant_objects:
+            return
+
+        self.relevant_objects.add(name)
+        type_name = self.object_types.get(name) or TypeOptions.ROOT.value
+        related_objects = self.get_mapping_neighbors(name) | self.propagated_slots.get(type_name, set())
+
+        for operator in self.producers.get(name, set()):
+            self.add("operator", operator)
+
+        for item in related_objects:
+            self.add("object", item)
+
+    def visit_constraint(self, constraint: str) -> None:
+        if constraint in self.relevant_constraints:
+            return
+
+        self.relevant_constraints.add(constraint)
+
+        for item in Constraint.get_variable_references_from_constraint(constraint, []):
+            self.add("object", item)
+
+        for operator in self.constraint_producers.get(constraint, set()):
+            self.add("operator", operator)
+
+        for manifest_constraint in self.flow_definition.manifest_constraints:
+            if manifest_constraint.manifest.constraint == constraint:
+                self.add("constraint", manifest_constraint.constraint.constraint)
+
+
+def prune_flow_definition(flow_definition: FlowDefinition) -> Tuple[FlowDefinition, PruningReport]:
+    analysis = RelevanceAnalysis(flow_definition).run()
+
+    operators = analysis.relevant_operators
+    objects = analysis.relevant_objects
+    constraints = analysis.relevant_constraints | {
+        constraint for name in operators for constraint in get_output_constraints(analysis.operators[name])
+    }
+
+    report = PruningReport(
+        operators=[o.name for o in flow_definition.operators if o.name not in operators],
+        memory_items=[m.item_id for m in flow_definition.memory_items if m.item_id not in objects],
+        list_of_mappings=[m for m in flow_definition.list_of_mappings if not {m.source_name, m.target_name} <= objects],
+        partial_orders=[p for p in flow_definition.partial_orders if not {p.antecedent, p.consequent} <= operators],
+        slot_properties=[s.slot_name for s in flow_definition.slot_properties if s.slot_name not in objects],
+        constraints=[c.constraint for c in flow_definition.constraints if c.constraint not in constraints],
+        manifest_constraints=[
+            m.manifest.constraint
+            for m in flow_definition.manifest_constraints
+            if m.manifest.constraint not in constraints
+        ],
+    )
+
+    if report.is_empty:
+        return flow_definition, report
+
+    pruned_flow_definition: FlowDefinition = flow_definition.model_copy(
+        update={
+            "operators": [o for o in flow_definition.operators if o.name in operators],
+            "memory_items": [m for m in flow_definition.memory_items if m.item_id in objects],
+            "list_of_mappings": [
+                m for m in flow_definition.list_of_mappings if {m.source_name, m.target_name} <= objects
+            ],
+            "partial_orders": [p for p in flow_definition.partial_orders if {p.antecedent, p.consequent} <= operators],
+            "slot_properties": [s for s in flow_definition.slot_properties if s.slot_name in objects],
+            "constraints": [c for c in flow_definition.constraints if c.constraint in constraints],
+            "manifest_constraints": [
+                m for m in flow_definition.manifest_constraints if m.manifest.constraint in constraints
+            ],
+        }
+    )
+
+    # Relevant objects that were only declared in the signatures of pruned operators are
+    # carried over as unknown memory items, so that they keep their types and are still
+    # declared before the goals are compiled.
+    declared_objects = get_declared_objects(flow_definition)
+    pruned_declared_objects = get_declared_objects(pruned_flow_definition)
+
+    for name in sorted(objects & set(declared_objects)):
+        if pruned_declared_objects.get(name) != declared_objects[name]:
+            type_name = analysis.object_types.get(name)
+            pruned_flow_definition.memory_items.append(MemoryItem(item_id=name, item_type=type_name))
+
+    return pruned_flow_definition, report
@@ -1,10 +1,11 @@
 from __future__ import annotations
-from typing import Set, List, Dict, Optional, Union, Any
+from typing import Set, List, Dict, Optional, Union, Any, Iterator
+from contextlib import contextmanager
 from collections import Counter
 from re import findall
-from pydantic import BaseModel, field_validator, model_validator, ConfigDict
+from pydantic import BaseModel, PrivateAttr, field_validator, model_validator, ConfigDict
 from pydantic_core.core_schema import FieldValidationInfo
-from nl2flow.compile.utils import string_transform, revert_string_transform, Transform
+from nl2flow.compile.utils import string_transform, revert_string_transform, Transform, TransformRegistry
 from nl2flow.compile.options import (
     TypeOptions,
     CostOptions,
@@ -263,6 +264,9 @@ class FlowDefinition(BaseModel):
     ends_with: Optional[str] = None
     reference: Optional[ClassicalPlanReference] = None
 
+    _defer_validation: bool = PrivateAttr(default=False)
+    _pending_validation: bool = PrivateAttr(default=False)
+
     @classmethod
     def transform(cls, flow: FlowDefinition, transforms: List[Transform]) -> FlowDefinition:
         new_flow = FlowDefinition(
@@ -270,31 +274,70 @@ class FlowDefinition(BaseModel):
             reference=flow.reference.transform(flow.reference, transforms) if flow.reference else None,
         )
 
-        for defn in cls.model_fields.items():
-            if defn[0] not in ["name", "starts_with", "ends_with", "reference"]:
-                setattr(
-                    new_flow,
-                    defn[0],
-                    [item.transform(item, transforms) for item in getattr(flow, defn[0])],
-                )
+        with new_flow.deferred_validation():
+            for defn in cls.model_fields.items():
+                if defn[0] not in ["name", "starts_with", "ends_with", "reference"]:
+                    setattr(
+                        new_flow,
+                        defn[0],
+                        [item.transform(item, transforms) for item in getattr(flow, defn[0])],
+                    )
 
-        new_flow.starts_with = string_transform(flow.starts_with, transforms)
-        new_flow.ends_with = string_transform(flow.ends_with, transforms)
+            new_flow.starts_with = string_transform(flow.starts_with, transforms)
+            new_flow.ends_with = string_transform(flow.ends_with, transforms)
 
+        new_flow.validate_pending()
         return new_flow
 
     @field_validator("starts_with", "ends_with")
     @classmethod
     def unknown_operator(cls, operator_name: str, info: FieldValidationInfo) -> str:
-        reference_flow_model = FlowDefinition.model_validate(info.data)
-        assert operator_name is None or operator_name in map(
-            lambda x: str(x.name), reference_flow_model.operators
-        ), "Operator name not found!"
+        operators: List[OperatorDefinition] = info.data.get("operators", [])
+        assert operator_name is None or operator_name in {
+            str(operator.name) for operator in operators
+        }, "Operator name not found!"
 
         return operator_name
 
     @model_validator(mode="after")
-    def no_duplicate_items(self) -> FlowDefinition:
+    def validate_definition(self) -> FlowDefinition:
+        # All the checks share one index of object names, which is the expensive part
+        # to build. Inside deferred_validation, they are put off until validate_pending.
+        if self._defer_validation:
+            self._pending_validation = True
+            return self
+
+        list_of_object_names = self.get_list_of_object_names(self)
+
+        self.no_duplicate_items()
+        self.hash_conflicts(list_of_object_names)
+        self.object_type_conflict(list_of_object_names)
+        self.mappings_are_among_known_memory_items(list_of_object_names)
+        self.slots_are_among_known_memory_items(list_of_object_names)
+
+        self._pending_validation = False
+        return self
+
+    @property
+    def is_pending_validation(self) -> bool:
+        return self._pending_validation
+
+    @contextmanager
+    def deferred_validation(self) -> Iterator[FlowDefinition]:
+        defer_validation = self._defer_validation
+        self._defer_validation = True
+
+        try:
+            yield self
+        finally:
+            self._defer_validation = defer_validation
+
+    def validate_pending(self) -> None:
+        if self._pending_validation and not self._defer_validation:
+            FlowDefinition.model_validate(dict(self))
+            self._pending_validation = False
+
+    def no_duplicate_items(self) -> None:
         check_list_key = ["operators", "type_hierarchy"]
         for key in check_list_key:
             list_of_items = list(
@@ -307,14 +350,9 @@ class FlowDefinition(BaseModel):
             duplicate_list = self.get_duplicates(list_of_items)
             assert len(duplicate_list) == 0, f"Duplicate names for {key=} {', '.join(duplicate_list)}."
 
-        return self
-
-    @model_validator(mode="after")
-    def hash_conflicts(self) -> FlowDefinition:
-        transforms: List[Transform] = list()
-
-        reference_list_of_objects = self.get_list_of_object_names(self)
-        reference_keys = list(reference_list_of_objects.keys())
+    def hash_conflicts(self, list_of_object_names: Dict[str, Set[str]]) -> None:
+        transforms: List[Transform] = TransformRegistry()
+        reference_keys: Dict[str, None] = dict.fromkeys(list_of_object_names)
 
         check_list_key = {
             "operators": "name",
@@ -324,56 +362,36 @@ class FlowDefinition(BaseModel):
         }
 
         for key in check_list_key:
-            list_of_items = list(
-                map(
-                    lambda x: str(getattr(x, check_list_key[key])),
-                    getattr(self, key),
-                )
-            )
+            for item in getattr(self, key):
+                item_name = str(getattr(item, check_list_key[key]))
 
-            for item in list_of_items:
-                if item and item not in reference_keys:
-                    reference_keys.append(item)
+                if item_name:
+                    reference_keys.setdefault(item_name)
 
-        transformed_keys = [string_transform(item, transforms) for item in reference_keys]
+        transformed_keys: Set[str] = set()
 
         for item in reference_keys:
             transformed_item = string_transform(item, transforms)
 
             if transformed_item is not None:
-                members = [o for o in transformed_keys if transformed_item == o]
-                assert len(members) <= 1, f"Conflicting names for {transformed_item}."
-
-        return self
+                assert transformed_item not in transformed_keys, f"Conflicting names for {transformed_item}."
+                transformed_keys.add(transformed_item)
 
-    @model_validator(mode="after")
-    def object_type_conflict(self) -> FlowDefinition:
-        list_of_object_names = self.get_list_of_object_names(self)
+    @staticmethod
+    def object_type_conflict(list_of_object_names: Dict[str, Set[str]]) -> None:
         for item in list_of_object_names:
             type_set = list_of_object_names[item]
             assert len(type_set) <= 1, f"Object {item} has more than one type: {', '.join(type_set)}."
 
-        return self
-
-    @model_validator(mode="after")
-    def mappings_are_among_known_memory_items(self) -> FlowDefinition:
-        list_of_object_names = self.get_list_of_object_names(self)
-
+    def mappings_are_among_known_memory_items(self, list_of_object_names: Dict[str, Set[str]]) -> None:
         for mapping in self.list_of_mappings:
             for item in [mapping.source_name, mapping.target_name]:
                 assert item in list_of_object_names, f"Mapping request with {item} unknown."
 
-        return self
-
-    @model_validator(mode="after")
-    def slots_are_among_known_memory_items(self) -> FlowDefinition:
-        list_of_object_names = self.get_list_of_object_names(self)
-
+    def slots_are_among_known_memory_items(self, list_of_object_names: Dict[str, Set[str]]) -> None:
         for slot in self.slot_properties:
             assert slot.slot_name in list_of_object_names, f"Slot request with {slot.slot_name} unknown."
 
-        return self
-
     @staticmethod
     def get_duplicates(list_item: List[str]) -> List[str]:
         return [i for i, c in Counter(list_item).items() if c > 1]
@@ -416,6 +434,8 @@ class FlowDefinition(BaseModel):
     @classmethod
     def get_list_of_object_names(cls, flow: FlowDefinition) -> Dict[str, Set[str]]:
         list_of_objects: Dict[str, Set[str]] = dict()
+        type_names = {t.name for t in flow.type_hierarchy}
+
         for item in flow.memory_items:
             cls.update_object_map(list_of_objects, item.item_id, item.item_type)
 
@@ -426,7 +446,7 @@ class FlowDefinition(BaseModel):
                     goal.goal_type != GoalType.OPERATOR
                     and goal.goal_type != GoalType.CONSTRAINT
                     and not isinstance(goal.goal_name, Step)
-                    and goal.goal_name not in [t.name for t in flow.type_hierarchy]
+                    and goal.goal_name not in type_names
                 ):
                     cls.update_object_map(list_of_objects, goal.goal_name, None)
 
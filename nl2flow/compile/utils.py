@@ -1,6 +1,10 @@
-from typing import List, Optional
+from __future__ import annotations
+from typing import List, Dict, Iterable, Optional, SupportsIndex, Any, Tuple
 from pydantic import BaseModel
 
+import enum
+import hashlib
+import json
 import re
 
 
@@ -9,10 +13,112 @@ class Transform(BaseModel):
     target: str
 
 
+class TransformRegistry(List[Transform]):
+    """
+    A list of transforms that also maintains forward (source -> target) and
+    reverse (target -> source) indices, so that lookups do not have to scan
+    the entire list. It can be passed anywhere a List[Transform] is expected.
+    Appends are indexed as they come, and any other change to the list has
+    the indices rebuilt from it.
+    """
+
+    def __init__(self, transforms: Iterable[Transform] = ()) -> None:
+        super().__init__()
+        self._forward: Dict[str, str] = dict()
+        self._reverse: Dict[str, str] = dict()
+        self.extend(transforms)
+
+    @classmethod
+    def of(cls, transforms: Optional[List[Transform]]) -> TransformRegistry:
+        if isinstance(transforms, TransformRegistry):
+            return transforms
+
+        return cls(transforms or [])
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return self.__class__, (list(self),)
+
+    def __reindex(self) -> None:
+        self._forward.clear()
+        self._reverse.clear()
+
+        for transform in self:
+            self.__index(transform)
+
+    def __index(self, transform: Transform) -> None:
+        existing_source = self._reverse.get(transform.target)
+        assert (
+            existing_source is None or existing_source == transform.source
+        ), "There cannot be more than one mapping, something terrible has happened."
+
+        self._reverse[transform.target] = transform.source
+        self._forward.setdefault(transform.source, transform.target)
+
+    def append(self, transform: Transform) -> None:
+        self.__index(transform)
+        super().append(transform)
+
+    def extend(self, transforms: Iterable[Transform]) -> None:
+        for transform in transforms:
+            self.append(transform)
+
+    def insert(self, index: SupportsIndex, transform: Transform) -> None:
+        self.__index(transform)
+        super().insert(index, transform)
+
+    def __iadd__(self, transforms: Iterable[Transform]) -> TransformRegistry:  # type: ignore
+        self.extend(transforms)
+        return self
+
+    def __add__(self, transforms: List[Transform]) -> TransformRegistry:  # type: ignore
+        return TransformRegistry([*self, *transforms])
+
+    def __imul__(self, times: SupportsIndex) -> TransformRegistry:
+        super().__imul__(times)
+        self.__reindex()
+        return self
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        super().__setitem__(index, value)
+        self.__reindex()
+
+    def __delitem__(self, index: Any) -> None:
+        super().__delitem__(index)
+        self.__reindex()
+
+    def pop(self, index: SupportsIndex = -1) -> Transform:
+        transform = super().pop(index)
+        self.__reindex()
+        return transform
+
+    def remove(self, transform: Transform) -> None:
+        super().remove(transform)
+        self.__reindex()
+
+    def clear(self) -> None:
+        super().clear()
+        self.__reindex()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self.__reindex()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self.__reindex()
+
+    def get_target(self, source: str) -> Optional[str]:
+        return self._forward.get(source)
+
+    def get_source(self, target: str) -> Optional[str]:
+        return self._reverse.get(target)
+
+
 def string_transform(item: Optional[str], reference: List[Transform], hashit: bool = False) -> Optional[str]:
     if item is not None:
         if hashit:
-            transform = f"hash_{str(abs(hash(item)))}"
+            # Names have to be the same in every process, which hash() does not guarantee.
+            transform = f"hash_{int.from_bytes(hashlib.sha256(item.encode('utf-8')).digest()[:8], 'big')}"
         else:
             transform = re.sub(r"\s+", "_", item.lower())
 
@@ -29,6 +135,10 @@ def string_transform(item: Optional[str], reference: List[Transform], hashit: bo
 
 
 def revert_string_transform(item: str, reference: List[Transform]) -> Optional[str]:
+    if isinstance(reference, TransformRegistry):
+        og_item = reference.get_source(item)
+        return item if og_item is None else og_item
+
     og_items = list(filter(lambda x: item == x.target, reference))
 
     if not og_items:
@@ -39,3 +149,28 @@ def revert_string_transform(item: str, reference: List[Transform]) -> Optional[s
 
         source: str = og_items[0].source
         return source
+
+
+def canonicalize(item: Any) -> Any:
+    if isinstance(item, BaseModel):
+        return canonicalize(item.model_dump())
+
+    elif isinstance(item, enum.Enum):
+        return canonicalize(item.value)
+
+    elif isinstance(item, Dict):
+        return {str(key): canonicalize(value) for key, value in item.items()}
+
+    elif isinstance(item, (set, frozenset)):
+        return sorted((canonicalize(i) for i in item), key=lambda x: json.dumps(x, sort_keys=True, default=str))
+
+    elif isinstance(item, (list, tuple)):
+        return [canonicalize(i) for i in item]
+
+    else:
+        return item
+
+
+def get_content_hash(*items: Any) -> str:
+    canonical_form = json.dumps([canonicalize(item) for item in items], sort_keys=True, default=str)
+    return hashlib.sha256(canonical_form.encode("utf-8")).hexdigest()
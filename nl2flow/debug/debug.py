@@ -1,17 +1,25 @@
 from abc import ABC, abstractmethod
-from typing import List, Any
-from difflib import Differ
+from typing import Dict, List, Any, Optional, Tuple
+from warnings import warn
+from nl2flow.plan.planner import Planner
 from nl2flow.plan.planners.kstar import Kstar
 from nl2flow.plan.options import TIMEOUT
-from nl2flow.plan.schemas import ClassicalPlan
+from nl2flow.plan.schemas import Action, ClassicalPlan, PlannerResponse
 from nl2flow.compile.flow import Flow
-from nl2flow.compile.schemas import ClassicalPlanReference
+from nl2flow.compile.compilations import ClassicPDDL, ClassicPDDLReference
+from nl2flow.compile.schemas import ClassicalPlanReference, PDDL, Step
+from nl2flow.compile.utils import Transform, get_content_hash
+from nl2flow.debug.diff import collapse_maps, diff_plans
 from nl2flow.debug.schemas import Report, SolutionQuality, StepDiff, DiffAction
+from nl2flow.debug.simulation import ReferenceSimulator
+from nl2flow.plan.simulation import SimulationResult
 from nl2flow.printers.codelike import CodeLikePrint
 from nl2flow.printers.driver import Printer
 
+import asyncio
+import os
+
 PLANNER = Kstar()
-DIFFER = Differ()
 
 
 class Debugger(ABC):
@@ -43,15 +51,56 @@ class Debugger(ABC):
 
 
 class BasicDebugger(Debugger):
+    @classmethod
+    def get_plan_diff(
+        cls, printer: Printer, plan: ClassicalPlan, list_of_tokens: List[str], **kwargs: Any
+    ) -> List[Tuple[StepDiff, str]]:
+        reference = [printer.parse_token(token, **kwargs) or token for token in list_of_tokens]
+        reference_outputs: Optional[List[Optional[List[str]]]] = [
+            printer.parse_outputs(token, **kwargs) for token in list_of_tokens
+        ]
+
+        # Outputs are only compared if the printer tells them for every step of the reference plan.
+        if reference_outputs and any(
+            outputs is None for item, outputs in zip(reference, reference_outputs) if isinstance(item, Step)
+        ):
+            reference_outputs = None
+
+        print_options = {key: value for key, value in kwargs.items() if key not in ["collapse_maps", "line_numbers"]}
+        plan = collapse_maps(plan) if kwargs.get("collapse_maps", False) else plan
+
+        plan_diff = []
+        for diff_type, index in diff_plans(reference, plan.plan, reference_outputs):
+            if diff_type == DiffAction.ADD:
+                item = plan.plan[index]
+                step = Step(name=item.name, parameters=item.inputs) if isinstance(item, Action) else item
+                step_string = printer.pretty_print_plan(
+                    plan.model_copy(update={"plan": [item]}), line_numbers=False, **print_options
+                )
+
+                plan_diff.append((StepDiff(diff_type=diff_type, step=step), f"{diff_type.value} {step_string}"))
+            else:
+                prefix = diff_type.value if diff_type else " "
+                plan_diff.append(
+                    (StepDiff(diff_type=diff_type, step=reference[index]), f"{prefix} {list_of_tokens[index]}")
+                )
+
+        return plan_diff
+
     @classmethod
     def generate_plan_diff(
         cls, printer: Printer, plan: ClassicalPlan, list_of_tokens: List[str], **kwargs: Any
     ) -> List[str]:
-        plan_stringify = printer.pretty_print_plan(plan, line_numbers=False, **kwargs).split("\n")
-        return list(DIFFER.compare(list_of_tokens, plan_stringify))
+        return [diff_str for _, diff_str in cls.get_plan_diff(printer, plan, list_of_tokens, **kwargs)]
 
     @classmethod
     def generate_plan_diff_obj(cls, printer: Printer, diff_str: List[str], **kwargs: Any) -> List[StepDiff]:
+        warn(
+            message="Parsing a diff back from its lines is deprecated, use get_plan_diff instead.",
+            category=DeprecationWarning,
+            stacklevel=2,
+        )
+
         diff_obj = []
         for item in diff_str:
             item = item.strip()
@@ -81,6 +130,7 @@ class BasicDebugger(Debugger):
         debug: SolutionQuality,
         timeout: int = TIMEOUT,
         printer: Printer = CodeLikePrint(),
+        repair: bool = False,
         **kwargs: Any,
     ) -> Report:
         PLANNER.timeout = timeout
@@ -88,7 +138,50 @@ class BasicDebugger(Debugger):
         reference_plan: ClassicalPlanReference = printer.parse_tokens(list_of_tokens, **kwargs)
         self.flow.add(reference_plan)
 
+        # Whether a reference plan is sound or valid is found by simulating it, and the
+        # planner is only called to check that it is optimal or to suggest a repair.
+        if debug != SolutionQuality.OPTIMAL and not repair:
+            compilation = self.compile_debug_model(debug)
+            simulator = ReferenceSimulator(compilation, **self.flow.compile_options, debug_flag=debug)
+            return self.get_simulation_report(debug, simulator.simulate_reference(reference_plan), reference_plan)
+
         planner_response = self.flow.plan_it(PLANNER, debug_flag=debug)
+        return self.get_report(debug, planner_response, reference_plan, list_of_tokens, printer, **kwargs)
+
+    def compile_debug_model(self, debug: SolutionQuality) -> ClassicPDDL:
+        # The flow is compiled without its reference plan, which is simulated against it.
+        self.flow.flow_definition.validate_pending()
+
+        compilation = ClassicPDDL(self.flow.flow_definition.model_copy(update={"reference": None}))
+        compilation.profiler = self.flow.compile_profiler
+        compilation.run_passes(**self.flow.compile_options, debug_flag=debug)
+        return compilation
+
+    @staticmethod
+    def get_simulation_report(
+        debug: SolutionQuality, simulation_result: SimulationResult, reference_plan: ClassicalPlanReference
+    ) -> Report:
+        return Report(
+            report_type=debug.value,
+            planner_response=PlannerResponse(),
+            reference=reference_plan,
+            determination=simulation_result.is_valid
+            if debug == SolutionQuality.VALID
+            else simulation_result.is_executable,
+            failed_step=simulation_result.failed_step,
+            unmet_preconditions=simulation_result.unmet_preconditions,
+        )
+
+    @classmethod
+    def get_report(
+        cls,
+        debug: SolutionQuality,
+        planner_response: PlannerResponse,
+        reference_plan: ClassicalPlanReference,
+        list_of_tokens: List[str],
+        printer: Printer,
+        **kwargs: Any,
+    ) -> Report:
         new_report = Report(
             report_type=debug.value,
             planner_response=planner_response,
@@ -98,9 +191,132 @@ class BasicDebugger(Debugger):
         if len(planner_response.list_of_plans) > 0:
             best_plan = planner_response.list_of_plans[0]
 
-            new_report.plan_diff_str = self.generate_plan_diff(printer, best_plan, list_of_tokens, **kwargs)
-            new_report.plan_diff_obj = self.generate_plan_diff_obj(printer, new_report.plan_diff_str, **kwargs)
+            plan_diff = cls.get_plan_diff(printer, best_plan, list_of_tokens, **kwargs)
+            new_report.plan_diff_obj = [diff_obj for diff_obj, _ in plan_diff]
+            new_report.plan_diff_str = [diff_str for _, diff_str in plan_diff]
 
             new_report.determination = len([d for d in new_report.plan_diff_obj if d.diff_type is not None]) == 0
 
         return new_report
+
+
+class DebugCompilation:
+    def __init__(self, key: str, compilation: ClassicPDDL) -> None:
+        self.key = key
+        self.compilation = compilation
+        self.simulator: Optional[ReferenceSimulator] = None
+
+
+class DebugSession(BasicDebugger):
+    """
+    Debugs many reference plans against the same flow without compiling it for each of
+    them. The flow is compiled once per kind of debugging without a reference, and each
+    reference plan only compiles its own token predicates and actions on top of that, see
+    ClassicPDDLReference. The flow is compiled again if it changes. Reference plans in a
+    batch are planned for concurrently. From within a running event loop, such as in an
+    async web handler, use debug_many_async instead of debug or debug_many.
+
+    Whether a reference plan is sound or valid is found by simulating it, and the planner
+    is only called to check that it is optimal or to suggest a repair, which is what the
+    plan diffs of a report are.
+    """
+
+    def __init__(self, instance: Flow, planner: Optional[Planner] = None, max_concurrency: Optional[int] = None):
+        BasicDebugger.__init__(self, instance)
+        self.planner = planner or Kstar()
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.compilations: Dict[SolutionQuality, DebugCompilation] = dict()
+
+    def get_compilation(self, debug: SolutionQuality) -> DebugCompilation:
+        self.flow.flow_definition.validate_pending()
+
+        flow_definition = self.flow.flow_definition.model_copy(update={"reference": None})
+        key = get_content_hash(flow_definition, self.flow.compile_options)
+
+        if debug not in self.compilations or self.compilations[debug].key != key:
+            self.compilations[debug] = DebugCompilation(key, self.compile_debug_model(debug))
+
+        return self.compilations[debug]
+
+    def compile_reference_plan(
+        self,
+        debug_compilation: DebugCompilation,
+        reference_plan: ClassicalPlanReference,
+        debug: SolutionQuality,
+    ) -> Tuple[PDDL, List[Transform]]:
+        compilation = ClassicPDDLReference(debug_compilation.compilation, reference_plan)
+        compilation.profiler = self.flow.compile_profiler
+        return compilation.compile(**self.flow.compile_options, debug_flag=debug)
+
+    def simulate_reference_plan(
+        self,
+        debug_compilation: DebugCompilation,
+        reference_plan: ClassicalPlanReference,
+        debug: SolutionQuality,
+    ) -> Report:
+        if debug_compilation.simulator is None:
+            debug_compilation.simulator = ReferenceSimulator(
+                debug_compilation.compilation, **self.flow.compile_options, debug_flag=debug
+            )
+
+        simulation_result = debug_compilation.simulator.simulate_reference(reference_plan)
+        return self.get_simulation_report(debug, simulation_result, reference_plan)
+
+    def debug(
+        self,
+        list_of_tokens: List[str],
+        debug: SolutionQuality,
+        timeout: int = TIMEOUT,
+        printer: Printer = CodeLikePrint(),
+        repair: bool = False,
+        **kwargs: Any,
+    ) -> Report:
+        return self.debug_many([list_of_tokens], debug, timeout, printer, repair, **kwargs)[0]
+
+    def debug_many(
+        self,
+        list_of_candidates: List[List[str]],
+        debug: SolutionQuality,
+        timeout: int = TIMEOUT,
+        printer: Printer = CodeLikePrint(),
+        repair: bool = False,
+        **kwargs: Any,
+    ) -> List[Report]:
+        try:
+            asyncio.get_running_loop()
+
+        except RuntimeError:
+            return asyncio.run(self.debug_many_async(list_of_candidates, debug, timeout, printer, repair, **kwargs))
+
+        raise RuntimeError("DebugSession.debug_many cannot be called from a running event loop, use debug_many_async.")
+
+    async def debug_many_async(
+        self,
+        list_of_candidates: List[List[str]],
+        debug: SolutionQuality,
+        timeout: int = TIMEOUT,
+        printer: Printer = CodeLikePrint(),
+        repair: bool = False,
+        **kwargs: Any,
+    ) -> List[Report]:
+        self.planner.timeout = timeout
+        debug_compilation = self.get_compilation(debug)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def debug_candidate(list_of_tokens: List[str]) -> Report:
+            reference_plan: ClassicalPlanReference = printer.parse_tokens(list_of_tokens, **kwargs)
+
+            if debug != SolutionQuality.OPTIMAL and not repair:
+                return self.simulate_reference_plan(debug_compilation, reference_plan, debug)
+
+            pddl, transforms = self.compile_reference_plan(debug_compilation, reference_plan, debug)
+
+            async with semaphore:
+                planner_response: PlannerResponse = await self.planner.plan_async(
+                    pddl=pddl, flow=self.flow, transforms=transforms
+                )
+
+            return self.get_report(debug, planner_response, reference_plan, list_of_tokens, printer, **kwargs)
+
+        reports = await asyncio.gather(*[debug_candidate(list_of_tokens) for list_of_tokens in list_of_candidates])
+        return list(reports)
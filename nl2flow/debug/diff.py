@@ -0,0 +1,207 @@
+from nl2flow.compile.options import BasicOperations
+from nl2flow.compile.schemas import Step, Constraint
+from nl2flow.debug.schemas import DiffAction
+from nl2flow.plan.schemas import Action, ClassicalPlan
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+from re import sub
+
+PlanItem = Union[Step, Constraint, Action, str]
+
+
+def get_item_maps(items: Sequence[PlanItem]) -> List[Tuple[str, str]]:
+    item_maps = []
+
+    for item in items:
+        if isinstance(item, (Step, Action)) and item.name == BasicOperations.MAPPER.value:
+            parameters = get_parameter_names(item)
+
+            if len(parameters) == 2:
+                item_maps.append((parameters[0], parameters[1]))
+
+    return item_maps
+
+
+def get_parameter_names(item: Union[Step, Action]) -> List[str]:
+    if isinstance(item, Action):
+        return item.inputs
+
+    return [p if isinstance(p, str) else p.item_id for p in item.parameters]
+
+
+def get_equivalence_classes(item_maps: List[Tuple[str, str]]) -> Dict[str, str]:
+    parents: Dict[str, str] = dict()
+
+    def find(name: str) -> str:
+        while parents.get(name, name) != name:
+            name = parents[name]
+
+        return name
+
+    for source, target in item_maps:
+        source_root, target_root = find(source), find(target)
+
+        if source_root != target_root:
+            # The smaller name is kept as root so that the classes do not depend on the order of maps.
+            source_root, target_root = sorted([source_root, target_root])
+            parents[target_root] = source_root
+
+    return {name: find(name) for name in parents}
+
+
+def replace_references(constraint: str, names: Dict[str, str]) -> str:
+    return sub(
+        r"\$([a-zA-Z\d_]*)",
+        lambda reference: f"${names.get(reference.group(1), reference.group(1))}",
+        constraint,
+    )
+
+
+def get_step_key(item: PlanItem, equivalence_classes: Dict[str, str], outputs: Optional[List[str]] = None) -> Hashable:
+    if isinstance(item, Constraint):
+        constraint = replace_references(" ".join(item.constraint.split()), equivalence_classes)
+
+        return BasicOperations.CONSTRAINT.value, constraint, item.truth_value is not False
+
+    if isinstance(item, (Step, Action)):
+        parameters = get_parameter_names(item)
+
+        if item.name != BasicOperations.MAPPER.value:
+            parameters = [equivalence_classes.get(p, p) for p in parameters]
+
+        if outputs is None:
+            return item.name, tuple(parameters)
+
+        return item.name, tuple(parameters), tuple(equivalence_classes.get(o, o) for o in outputs)
+
+    return item
+
+
+def collapse_maps(plan: ClassicalPlan) -> ClassicalPlan:
+    current_maps: Dict[str, str] = dict()
+    collapsed_plan = []
+
+    for item in plan.plan:
+        if isinstance(item, Action):
+            if item.name == BasicOperations.MAPPER.value:
+                current_maps[item.inputs[1]] = item.inputs[0]
+                continue
+
+            item = item.model_copy(update={"inputs": [current_maps.get(i, i) for i in item.inputs]})
+
+        elif isinstance(item, Constraint):
+            item = item.model_copy(update={"constraint": replace_references(item.constraint, current_maps)})
+
+        collapsed_plan.append(item)
+
+    new_plan: ClassicalPlan = plan.model_copy(update={"plan": collapsed_plan})
+    return new_plan
+
+
+def get_shortest_edit(source: Sequence[Hashable], target: Sequence[Hashable]) -> List[Tuple[Optional[DiffAction], int]]:
+    """
+    Myers' O(ND) difference algorithm over two sequences of keys. Returns the edit script
+    as a list of (diff type, index) where the index is into the target for additions and
+    into the source otherwise. Deletions come before additions within a block of changes.
+    """
+    prefix = 0
+    while prefix < min(len(source), len(target)) and source[prefix] == target[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (
+        suffix < min(len(source), len(target)) - prefix
+        and source[len(source) - suffix - 1] == target[len(target) - suffix - 1]
+    ):
+        suffix += 1
+
+    n, m = len(source) - prefix - suffix, len(target) - prefix - suffix
+    offset = n + m + 1
+
+    furthest = [0] * (2 * offset + 1)
+    trace: List[List[int]] = list()
+
+    for d in range(n + m + 1):
+        # Only the diagonals that the next round reads from are kept for backtracking.
+        trace.append(furthest[offset - d - 1 : offset + d + 2])
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and furthest[offset + k - 1] < furthest[offset + k + 1]):
+                x = furthest[offset + k + 1]
+            else:
+                x = furthest[offset + k - 1] + 1
+
+            y = x - k
+            while x < n and y < m and source[prefix + x] == target[prefix + y]:
+                x, y = x + 1, y + 1
+
+            furthest[offset + k] = x
+
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+
+        break
+
+    edits: List[Tuple[Optional[DiffAction], int]] = list()
+    x, y = n, m
+
+    for d in reversed(range(len(trace))):
+        diagonals = trace[d]
+        k = x - y
+
+        if k == -d or (k != d and diagonals[k - 1 + d + 1] < diagonals[k + 1 + d + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+
+        previous_x = diagonals[previous_k + d + 1]
+        previous_y = previous_x - previous_k
+
+        while x > previous_x and y > previous_y:
+            x, y = x - 1, y - 1
+            edits.append((None, prefix + x))
+
+        if d > 0:
+            if x == previous_x:
+                edits.append((DiffAction.ADD, prefix + previous_y))
+            else:
+                edits.append((DiffAction.DELETE, prefix + previous_x))
+
+        x, y = previous_x, previous_y
+
+    return (
+        [(None, index) for index in range(prefix)]
+        + edits[::-1]
+        + [(None, len(source) - suffix + index) for index in range(suffix)]
+    )
+
+
+def diff_plans(
+    reference: Sequence[PlanItem],
+    plan: Sequence[PlanItem],
+    reference_outputs: Optional[Sequence[Optional[List[str]]]] = None,
+) -> List[Tuple[Optional[DiffAction], int]]:
+    """
+    Diffs a reference plan against a plan by structure rather than by text. Steps are equal
+    if they have the same name and parameters, where items connected by a map are taken to
+    be the same item, and constraints are equal if they have the same truth value and the
+    same expression over such items. Items that are not parsed stay as they are and only
+    equal themselves. If the outputs of the reference steps are given, steps also have to
+    produce the same items to be equal.
+    """
+    equivalence_classes = get_equivalence_classes(get_item_maps(reference) + get_item_maps(plan))
+
+    if reference_outputs is None:
+        reference_keys = [get_step_key(item, equivalence_classes) for item in reference]
+        plan_keys = [get_step_key(item, equivalence_classes) for item in plan]
+
+    else:
+        reference_keys = [
+            get_step_key(item, equivalence_classes, outputs) for item, outputs in zip(reference, reference_outputs)
+        ]
+        plan_keys = [
+            get_step_key(item, equivalence_classes, item.outputs if isinstance(item, Action) else None) for item in plan
+        ]
+
+    return get_shortest_edit(reference_keys, plan_keys)
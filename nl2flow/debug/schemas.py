@@ -28,3 +28,5 @@ class Report(BaseModel):
     reference: Optional[ClassicalPlanReference] = None
     plan_diff_obj: List[StepDiff] = []
     plan_diff_str: List[str] = []
+    failed_step: Optional[int] = None
+    unmet_preconditions: List[str] = []
@@ -0,0 +1,230 @@
+from copy import deepcopy
+from itertools import product
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+from tarski.fstrips import AddEffect
+from tarski.search.operations import is_applicable
+from tarski.syntax import Atom, CompoundFormula, Connective, Variable, create_substitution
+from tarski.syntax.transform.action_grounding import ground_schema_into_plain_operator
+from nl2flow.compile.basic_compilations.compile_reference import get_reference_predicates
+from nl2flow.compile.compilations import ClassicPDDL
+from nl2flow.compile.options import BasicOperations, MemoryState, RestrictedOperations
+from nl2flow.compile.schemas import ClassicalPlanReference, Constraint, Parameter, Step
+from nl2flow.plan.simulation import PlanSimulator, SimulationResult
+
+
+class ReferenceSimulator(PlanSimulator):
+    """
+    Executes reference plans, as parsed from tokens, against a debug compilation without
+    calling the planner. Each step is grounded into an action of the same name that makes
+    its token predicate true, or that acts on the same items for basic operations. Enablers,
+    which do not show up in plans, are applied along the way when a step or the goal needs them.
+    """
+
+    def __init__(self, compilation: ClassicPDDL, **kwargs: Any):
+        PlanSimulator.__init__(self, compilation)
+
+        self.compilation = compilation
+        self.kwargs = kwargs
+        self.schemas = sorted(compilation.problem.actions.values(), key=lambda action: str(action.name))
+        self.enablers = [action for action in self.schemas if RestrictedOperations.is_restricted(action.name)]
+        self.enabled_predicates = {
+            effect.atom.predicate.symbol
+            for enabler in self.enablers
+            for effect in enabler.effects
+            if isinstance(effect, AddEffect)
+        }
+
+    def get_schemas(self, item: Union[Step, Constraint]) -> List[Any]:
+        if isinstance(item, Constraint):
+            return [s for s in self.schemas if s.name.startswith(f"{BasicOperations.CONSTRAINT.value}_")]
+
+        if BasicOperations.is_basic(item.name):
+            return [s for s in self.schemas if s.name == item.name or s.name.startswith(f"{item.name}-")]
+
+        return [s for s in self.schemas if s.name == item.name]
+
+    def get_basic_target(self, step: Step) -> Optional[Any]:
+        names = [p.item_id if isinstance(p, Parameter) else p for p in step.parameters]
+        constants = [self.compilation.constant_map.get(name) for name in names]
+
+        if any(constant is None for constant in constants):
+            return None
+
+        if step.name == BasicOperations.SLOT_FILLER.value and len(constants) == 1:
+            return self.compilation.has_asked(*constants)
+
+        if step.name == BasicOperations.CONFIRM.value and len(constants) == 1:
+            return self.compilation.known(*constants, self.compilation.constant_map[MemoryState.KNOWN.value])
+
+        if step.name == BasicOperations.MAPPER.value and len(constants) == 2:
+            return self.compilation.mapped_to(*constants)
+
+        return None
+
+    def get_targets(self, plan: List[Union[Step, Constraint]]) -> List[Optional[Any]]:
+        # The token predicates of a reference plan refer to mapped items by what they were
+        # mapped from, so the steps that act on items themselves are matched on the items.
+        basic_targets = {
+            index: self.get_basic_target(item)
+            for index, item in enumerate(plan)
+            if isinstance(item, Step) and BasicOperations.is_basic(item.name)
+        }
+
+        targets = get_reference_predicates(self.compilation, plan, **self.kwargs)
+        return [basic_targets[index] if index in basic_targets else target for index, target in enumerate(targets)]
+
+    @staticmethod
+    def get_conditions(formula: Any) -> List[Atom]:
+        if isinstance(formula, Atom):
+            return [formula]
+
+        if isinstance(formula, CompoundFormula) and formula.connective == Connective.And:
+            return [c for f in formula.subformulas for c in ReferenceSimulator.get_conditions(f)]
+
+        return []
+
+    @staticmethod
+    def get_matches(state: Any, condition: Atom, binding: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        extension = state.predicate_extensions.get(condition.predicate.signature, set())
+
+        for fact in sorted(extension, key=lambda f: [str(r.expr.symbol) for r in f]):
+            match = dict(binding)
+
+            for term, reference in zip(condition.subterms, fact):
+                if isinstance(term, Variable):
+                    term = match.setdefault(term.symbol, reference.expr)
+
+                if term.symbol != reference.expr.symbol:
+                    break
+            else:
+                yield match
+
+    def bind(self, conditions: List[Atom], state: Any, binding: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if not conditions:
+            yield binding
+            return
+
+        condition, *rest = conditions
+        matches = list(self.get_matches(state, condition, binding))
+
+        # A condition that holds under no binding leaves its parameters to be enumerated,
+        # so that the groundings of the action still show what it is missing.
+        for match in matches or [binding]:
+            yield from self.bind(rest, state, match)
+
+    def get_groundings(self, action: Any, atom: Any, state: Any, enabled_predicates: Set[str]) -> Iterator[Any]:
+        """
+        Grounds an action so that one of its add effects is the given atom. Parameters that
+        the effect does not bind are bound from the conditions of the action that have to hold
+        in the state, that is those on predicates that no enabler makes true, and the sorts of
+        the parameters are only enumerated for what is left.
+        """
+        seen: Set[Tuple[str, ...]] = set()
+
+        for effect in action.effects:
+            if not isinstance(effect, AddEffect) or effect.atom.predicate.symbol != atom.predicate.symbol:
+                continue
+
+            binding: Dict[str, Any] = dict()
+
+            for term, constant in zip(effect.atom.subterms, atom.subterms):
+                if isinstance(term, Variable):
+                    term = binding.setdefault(term.symbol, constant)
+
+                if term.symbol != constant.symbol:
+                    break
+            else:
+                conditions = [
+                    condition
+                    for condition in self.get_conditions(action.precondition)
+                    if condition.predicate.symbol not in enabled_predicates
+                    and any(isinstance(t, Variable) and t.symbol not in binding for t in condition.subterms)
+                ]
+
+                for condition_binding in self.bind(conditions, state, binding):
+                    free = [p for p in action.parameters if p.symbol not in condition_binding]
+                    domains = [sorted(p.sort.domain(), key=lambda c: str(c.symbol)) for p in free]
+
+                    for values in product(*domains):
+                        condition_binding.update(zip([p.symbol for p in free], values))
+                        constants = [condition_binding[p.symbol] for p in action.parameters]
+                        key = tuple(str(c.symbol) for c in constants)
+
+                        if key not in seen:
+                            seen.add(key)
+                            yield create_substitution(action.parameters, constants)
+
+    def enable(self, state: Any, conditions: List[Any]) -> Tuple[Any, float]:
+        cost = 0.0
+
+        for condition in conditions:
+            if not isinstance(condition, Atom):
+                continue
+
+            for enabler in self.enablers:
+                substitution = next(
+                    (
+                        s
+                        for s in self.get_groundings(enabler, condition, state, set())
+                        if is_applicable(state, ground_schema_into_plain_operator(enabler, s))
+                    ),
+                    None,
+                )
+
+                if substitution is not None:
+                    state, enabler_cost = self.apply(state, enabler, substitution)
+                    cost += enabler_cost
+                    break
+
+        return state, cost
+
+    def execute(self, state: Any, item: Union[Step, Constraint], target: Any) -> Tuple[Any, float, List[Any]]:
+        unmet_preconditions: Optional[List[Any]] = None
+
+        for action in self.get_schemas(item):
+            for substitution in self.get_groundings(action, target, state, self.enabled_predicates):
+                operator = ground_schema_into_plain_operator(action, substitution)
+                enabled_state, cost = self.enable(state, self.get_unmet_conditions(state, operator.precondition))
+                unmet_conditions = self.get_unmet_conditions(enabled_state, operator.precondition)
+
+                if not unmet_conditions:
+                    next_state, action_cost = self.apply(enabled_state, action, substitution)
+                    return next_state, cost + action_cost, []
+
+                if unmet_preconditions is None or len(unmet_conditions) < len(unmet_preconditions):
+                    unmet_preconditions = unmet_conditions
+
+        return None, 0.0, unmet_preconditions or []
+
+    def simulate_reference(self, reference: ClassicalPlanReference) -> SimulationResult:
+        result = SimulationResult()
+        state = deepcopy(self.init)
+
+        plan = reference.transform(reference, self.compilation.cached_transforms).plan
+        ready_for_token = self.compilation.ready_for_token
+
+        for index, (item, target) in enumerate(zip(plan, self.get_targets(plan))):
+            # Each step of a reference plan is let through by a token, as in the planner.
+            if ready_for_token is not None:
+                state.add(ready_for_token)
+
+            next_state, cost, unmet_conditions = (
+                self.execute(state, item, target) if target is not None else (None, 0.0, [])
+            )
+
+            if next_state is None:
+                result.is_executable = False
+                result.failed_step = index
+                result.unmet_preconditions = [str(condition) for condition in unmet_conditions]
+                return result
+
+            state = next_state
+            result.cost += cost
+
+        if self.goal is None:
+            result.reaches_goal = True
+        else:
+            state, _ = self.enable(state, self.get_unmet_conditions(state, self.goal))
+            result.reaches_goal = not self.get_unmet_conditions(state, self.goal)
+
+        return result
@@ -0,0 +1,142 @@
+from __future__ import annotations
+from nl2flow.compile.flow import Flow
+from nl2flow.plan.schemas import PlannerResponse, PlanningBudget
+from nl2flow.plan.options import BATCH_CHUNK_SIZE, BATCH_PENDING_CHUNKS_PER_WORKER
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from pydantic import BaseModel
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+
+class BatchResult(BaseModel):
+    index: int
+    planner_response: Optional[PlannerResponse] = None
+    error: Optional[str] = None
+
+    @property
+    def is_error(self) -> bool:
+        return self.error is not None
+
+
+@contextmanager
+def scratch_directory() -> Iterator[str]:
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as working_directory:
+        os.chdir(working_directory)
+
+        try:
+            yield working_directory
+        finally:
+            os.chdir(current_directory)
+
+
+def plan_chunk(
+    flows: List[Flow], planner: Any, budget: Optional[PlanningBudget]
+) -> List[Tuple[Optional[PlannerResponse], Optional[str]]]:
+    results: List[Tuple[Optional[PlannerResponse], Optional[str]]] = list()
+
+    # The planner writes its intermediate files to the working directory, which
+    # the workers share with the parent, so each chunk runs from its own.
+    with scratch_directory():
+        for flow in flows:
+            # noinspection PyBroadException
+            try:
+                results.append((flow.plan_it(planner, budget=budget), None))
+            except Exception as error:
+                results.append((None, repr(error)))
+
+    return results
+
+
+def get_chunks(flows: Iterable[Flow], chunk_size: int) -> Iterator[List[Flow]]:
+    iterator = iter(flows)
+    chunk = list(islice(iterator, chunk_size))
+
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+
+def iter_plan_many(
+    flows: Iterable[Flow],
+    planner: Any,
+    workers: Optional[int] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    budget: Optional[PlanningBudget] = None,
+) -> Iterator[BatchResult]:
+    """
+    Compiles and plans flows in a pool of worker processes and yields their results
+    in the order of the flows. Flows are submitted in chunks, with only a few chunks
+    per worker in flight at a time, so that flows can be generated lazily and memory
+    stays bounded. The planner is sent to the workers along with the flows, so it has
+    to be picklable: planners that hold processes of their own, such as KstarPool, are
+    not. A flow that fails to plan gets a result with the error in place of a response.
+    """
+    assert chunk_size > 0, "Chunk size must be positive."
+
+    try:
+        pickle.dumps(planner)
+    except Exception as error:
+        raise TypeError(f"Planner cannot be sent to worker processes: {error!r}") from error
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = workers * BATCH_PENDING_CHUNKS_PER_WORKER
+
+    chunks = get_chunks(flows, chunk_size)
+    pending: Deque[Tuple[int, int, Future[Any]]] = deque()
+    next_index = 0
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+
+        def submit_chunks() -> None:
+            nonlocal next_index
+
+            while len(pending) < max_pending:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+
+                future: Future[Any]
+
+                try:
+                    future = executor.submit(plan_chunk, chunk, planner, budget)
+                except Exception as error:
+                    future = Future()
+                    future.set_exception(error)
+
+                pending.append((next_index, len(chunk), future))
+                next_index += len(chunk)
+
+        submit_chunks()
+
+        while pending:
+            start_index, size, future = pending.popleft()
+
+            # noinspection PyBroadException
+            try:
+                results = future.result()
+            except Exception as error:
+                results = [(None, repr(error))] * size
+
+            submit_chunks()
+
+            for index, (planner_response, error_message) in enumerate(results, start=start_index):
+                yield BatchResult(index=index, planner_response=planner_response, error=error_message)
+
+
+def plan_many(
+    flows: Iterable[Flow],
+    planner: Any,
+    workers: Optional[int] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    budget: Optional[PlanningBudget] = None,
+) -> List[BatchResult]:
+    return list(iter_plan_many(flows, planner, workers=workers, chunk_size=chunk_size, budget=budget))
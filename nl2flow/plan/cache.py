@@ -0,0 +1,94 @@
+from __future__ import annotations
+from typing import Any, Iterator, Optional
+from contextlib import contextmanager
+from pydantic import BaseModel
+from nl2flow.plan.schemas import RawPlannerResult
+from nl2flow.compile.utils import get_content_hash
+
+import sqlite3
+import time
+
+PLAN_CACHE_SIZE: int = 1024
+PLAN_CACHE_TIMEOUT: float = 30.0
+
+
+class PlanCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+
+class PlanCache:
+    """
+    On-disk store of raw planner results in a sqlite file, so that it can be shared by
+    every process on a machine. Entries are evicted in least recently used order once
+    the store grows beyond its maximum size.
+    """
+
+    def __init__(self, file_path: str, max_size: int = PLAN_CACHE_SIZE) -> None:
+        assert max_size > 0, "Cache size must be positive."
+
+        self.file_path = file_path
+        self.max_size = max_size
+        self._stats = PlanCacheStats()
+
+        with self.__connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS raw_plans (key TEXT PRIMARY KEY, result TEXT NOT NULL, last_used REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS raw_plans_last_used ON raw_plans (last_used)")
+
+    @staticmethod
+    def get_key(*items: Any) -> str:
+        return get_content_hash(*items)
+
+    @property
+    def stats(self) -> PlanCacheStats:
+        stats: PlanCacheStats = self._stats.model_copy()
+        return stats
+
+    @contextmanager
+    def __connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.file_path, timeout=PLAN_CACHE_TIMEOUT, isolation_level=None)
+
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def __len__(self) -> int:
+        with self.__connect() as connection:
+            count: int = connection.execute("SELECT COUNT(*) FROM raw_plans").fetchone()[0]
+            return count
+
+    def get(self, key: str) -> Optional[RawPlannerResult]:
+        with self.__connect() as connection:
+            row = connection.execute("SELECT result FROM raw_plans WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                self._stats.misses += 1
+                return None
+
+            connection.execute("UPDATE raw_plans SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        self._stats.hits += 1
+        raw_planner_result: RawPlannerResult = RawPlannerResult.model_validate_json(row[0])
+        return raw_planner_result
+
+    def put(self, key: str, raw_planner_result: RawPlannerResult) -> None:
+        with self.__connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO raw_plans (key, result, last_used) VALUES (?, ?, ?)",
+                (key, raw_planner_result.model_dump_json(), time.time()),
+            )
+            connection.execute(
+                "DELETE FROM raw_plans WHERE key IN "
+                "(SELECT key FROM raw_plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            )
+            connection.execute("COMMIT")
+
+    def clear(self) -> None:
+        with self.__connect() as connection:
+            connection.execute("DELETE FROM raw_plans")
@@ -1,3 +1,10 @@
 TIMEOUT = 1800
 NUM_PLANS = 10
 QUALITY_BOUND = 1.0
+
+POOL_SIZE = 2
+MAX_JOBS_PER_WORKER = 100
+TIMEOUT_GRACE = 5
+
+BATCH_CHUNK_SIZE = 8
+BATCH_PENDING_CHUNKS_PER_WORKER = 2
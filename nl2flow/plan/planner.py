@@ -1,18 +1,39 @@
 from nl2flow.compile.flow import Flow
-from nl2flow.compile.utils import Transform, revert_string_transform
-from nl2flow.plan.schemas import RawPlan, PlannerResponse, ClassicalPlan as Plan
+from nl2flow.compile.utils import TransformRegistry
+from nl2flow.plan.schemas import RawPlan, RawPlannerResult, PlannerResponse, PlannerStats, ClassicalPlan as Plan
 from nl2flow.plan.options import TIMEOUT
-from nl2flow.plan.utils import parse_action, group_items
+from nl2flow.plan.utils import ParseContext, parse_action, group_items, deduplicate_plans
 from nl2flow.compile.schemas import PDDL
 from nl2flow.compile.options import (
     SlotOptions,
     MappingOptions,
     ConfirmOptions,
+    NL2FlowOptions,
 )
 
 from abc import ABC, abstractmethod
-from typing import Any, List, Set
+from typing import Any, Dict, Generator, List, Optional, Pattern, Set
 from copy import deepcopy
+from functools import partial
+
+import asyncio
+import re
+
+# Fast Downward logs stats once per phase, except for the search counts which
+# are logged per search step as well, so the last match of each pattern wins.
+PLANNER_STATS_PATTERNS: Dict[str, Pattern[str]] = {
+    "translator_time": re.compile(r"^Done! \[[\d.]+s CPU, ([\d.e+-]+)s wall-clock\]", re.MULTILINE),
+    "translator_peak_memory": re.compile(r"^Translator peak memory: (\d+) KB", re.MULTILINE),
+    "num_variables": re.compile(r"^Translator variables: (\d+)", re.MULTILINE),
+    "num_facts": re.compile(r"^Translator facts: (\d+)", re.MULTILINE),
+    "num_operators": re.compile(r"^Translator operators: (\d+)", re.MULTILINE),
+    "search_time": re.compile(r"\] Search time: ([\d.e+-]+)s"),
+    "search_peak_memory": re.compile(r"^Peak memory: (\d+) KB", re.MULTILINE),
+    "expansions": re.compile(r"\] Expanded (\d+) state"),
+    "evaluations": re.compile(r"\] Evaluated (\d+) state"),
+    "generated": re.compile(r"\] Generated (\d+) state"),
+    "num_plans_found": re.compile(r"\] Found plans: (\d+)"),
+}
 
 
 class Planner(ABC):
@@ -31,6 +52,20 @@ class Planner(ABC):
     def plan(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
         pass
 
+    def iter_plans(self, pddl: PDDL, **kwargs: Any) -> Generator[Plan, None, PlannerResponse]:
+        # Planners that cannot stream plans yield them once planning is done. As with plan(),
+        # errors are not raised but reported in the planner response that the generator returns.
+        planner_response = self.plan(pddl, **kwargs)
+        yield from planner_response.list_of_plans
+        return planner_response
+
+    async def plan_async(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
+        # Planners that cannot run as an asyncio subprocess plan in the default executor,
+        # so cancelling the call stops waiting for the planner but does not stop it.
+        loop = asyncio.get_running_loop()
+        planner_response: PlannerResponse = await loop.run_in_executor(None, partial(self.plan, pddl, **kwargs))
+        return planner_response
+
     @classmethod
     def post_process(cls, planner_response: PlannerResponse, **kwargs: Any) -> PlannerResponse:
         flow_object: Flow = kwargs["flow"]
@@ -54,6 +89,9 @@ class Planner(ABC):
             new_plan.length = len(new_plan.plan)
             planner_response.list_of_plans[index] = new_plan
 
+        if NL2FlowOptions.deduplicate_plans in flow_object.optimization_options:
+            planner_response.list_of_plans = deduplicate_plans(planner_response.list_of_plans)
+
         return planner_response
 
 
@@ -63,7 +101,8 @@ class FDDerivedPlanner(ABC):
         list_of_plans = list()
 
         flow_object: Flow = kwargs["flow"]
-        transforms: List[Transform] = kwargs.get("transforms", [])
+        transforms = TransformRegistry.of(kwargs.get("transforms", []))
+        context = ParseContext(flow_object, transforms)
 
         for plan in raw_plans:
             new_plan = Plan(cost=plan.cost, reference=plan.actions)
@@ -71,17 +110,13 @@ class FDDerivedPlanner(ABC):
 
             for action in actions:
                 action_split = action.split()
-                action_name = revert_string_transform(action_split[0], transforms)
-
-                if action_name is not None:
-                    new_action = parse_action(
-                        action_name=action_name,
-                        parameters=action_split[1:],
-                        flow_object=flow_object,
-                        transforms=transforms,
-                    )
-                else:
-                    raise ValueError("Could not parse action name.")
+                new_action = parse_action(
+                    action_name=context.revert(action_split[0]),
+                    parameters=action_split[1:],
+                    flow_object=flow_object,
+                    transforms=transforms,
+                    context=context,
+                )
 
                 if new_action:
                     new_plan.plan.append(new_action)
@@ -90,3 +125,39 @@ class FDDerivedPlanner(ABC):
             list_of_plans.append(new_plan)
 
         return list_of_plans
+
+    @classmethod
+    def parse_stats(cls, planner_output: Optional[str]) -> Optional[PlannerStats]:
+        if not planner_output:
+            return None
+
+        stats: Dict[str, str] = dict()
+
+        for key, pattern in PLANNER_STATS_PATTERNS.items():
+            matches = pattern.findall(planner_output)
+
+            if matches:
+                stats[key] = matches[-1]
+
+        planner_stats: PlannerStats = PlannerStats.model_validate(stats)
+        return planner_stats
+
+    @classmethod
+    def get_planner_response(cls, raw_planner_result: RawPlannerResult, **kwargs: Any) -> PlannerResponse:
+        planner_response = PlannerResponse.initialize_from_raw_plans(raw_planner_result)
+        planner_response.stats = cls.parse_stats(raw_planner_result.planner_output)
+
+        # noinspection PyBroadException
+        try:
+            planner_response.list_of_plans = cls.parse(raw_planner_result.list_of_plans, **kwargs)
+            planner_response.is_parse_error = (
+                len(planner_response.list_of_plans) == 0 and planner_response.is_no_solution is False
+            )
+
+            planner_response = Planner.post_process(planner_response, **kwargs)
+            return planner_response
+
+        except Exception as error:
+            planner_response.is_parse_error = True
+            planner_response.stderr = error
+            return planner_response
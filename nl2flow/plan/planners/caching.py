@@ -0,0 +1,129 @@
+from nl2flow.plan.schemas import RawPlannerResult, PlannerResponse, PlanningBudget
+from nl2flow.plan.planner import Planner, FDDerivedPlanner
+from nl2flow.plan.cache import PlanCache
+from nl2flow.compile.schemas import PDDL
+from nl2flow.compile.compilations import CompiledDomain
+from nl2flow.plan.simulation import SExpression, parse_s_expression, parse_typed_list
+from functools import partial
+from typing import Any, Optional
+
+import asyncio
+import json
+
+UNORDERED_SECTIONS = {":requirements", ":predicates", ":functions", ":init", "and", "or"}
+TYPED_SECTIONS = {":types", ":constants", ":objects"}
+
+
+def get_canonical_form(expression: SExpression) -> SExpression:
+    # The PDDL writer lists sets, such as requirements and initial atoms, in an order
+    # that changes between processes, so these are put in order before hashing.
+    if isinstance(expression, str):
+        return expression
+
+    items = [get_canonical_form(item) for item in expression]
+    head = items[0] if items else None
+
+    if head in UNORDERED_SECTIONS:
+        return [head, *sorted(items[1:], key=json.dumps)]
+
+    if head in TYPED_SECTIONS:
+        typed_items = parse_typed_list(items[1:])
+        return [head, *sorted([name, *types] for name, types in typed_items.items())]
+
+    if head == "define":
+        actions = [item for item in items if isinstance(item, list) and item and item[0] == ":action"]
+        return [item for item in items if item not in actions] + sorted(actions, key=json.dumps)
+
+    return items
+
+
+def get_canonical_pddl(text: str) -> str:
+    return json.dumps(get_canonical_form(parse_s_expression(text)))
+
+
+class CachingPlanner(Planner, FDDerivedPlanner):
+    """
+    Wraps an FD derived planner (one that exposes raw_plan) with a PlanCache. On a hit the
+    wrapped planner is skipped and the cached raw plans go straight to the parser. Keys are
+    made from a canonical form of the PDDL, so that they are the same in every process. Only
+    results that the planner produced without errors or timeouts, and that either have
+    plans or show that there are none, are cached.
+    """
+
+    def __init__(self, planner: Planner, cache: PlanCache) -> None:
+        if not hasattr(planner, "raw_plan"):
+            raise TypeError("CachingPlanner can only wrap planners that produce raw plans.")
+
+        Planner.__init__(self)
+        self.planner = planner
+        self.cache = cache
+
+    @property
+    def timeout(self) -> int:
+        return self.planner.timeout
+
+    @timeout.setter
+    def timeout(self, set_timeout: int) -> None:
+        self.planner.timeout = set_timeout
+
+    def get_key(self, pddl: PDDL, budget: Optional[PlanningBudget] = None) -> str:
+        budget = budget or PlanningBudget()
+        return self.cache.get_key(
+            get_canonical_pddl(pddl.domain),
+            get_canonical_pddl(pddl.problem),
+            budget.get_timeout(self.timeout),
+            budget.quality_bound,
+            budget.num_plans,
+            budget.cost_bound,
+        )
+
+    def store(self, key: str, raw_planner_result: RawPlannerResult) -> None:
+        if raw_planner_result.error_running_planner or raw_planner_result.is_timeout:
+            return
+
+        # A run that ends with neither plans nor a proof that there are none may have crashed.
+        if raw_planner_result.list_of_plans or raw_planner_result.is_no_solution:
+            self.cache.put(key, raw_planner_result)
+
+    def raw_plan(
+        self, pddl: PDDL, domain: Optional[CompiledDomain] = None, budget: Optional[PlanningBudget] = None
+    ) -> RawPlannerResult:
+        key = self.get_key(pddl, budget)
+        cached_result = self.cache.get(key)
+
+        if cached_result is not None:
+            return cached_result
+
+        raw_planner_result: RawPlannerResult = self.planner.raw_plan(pddl, domain, budget)  # type: ignore
+        self.store(key, raw_planner_result)
+        return raw_planner_result
+
+    async def raw_plan_async(
+        self, pddl: PDDL, domain: Optional[CompiledDomain] = None, budget: Optional[PlanningBudget] = None
+    ) -> RawPlannerResult:
+        key = self.get_key(pddl, budget)
+        cached_result = self.cache.get(key)
+
+        if cached_result is not None:
+            return cached_result
+
+        raw_planner_result: RawPlannerResult
+        if hasattr(self.planner, "raw_plan_async"):
+            raw_planner_result = await self.planner.raw_plan_async(pddl, domain, budget)
+        else:
+            loop = asyncio.get_running_loop()
+            raw_planner_result = await loop.run_in_executor(
+                None,
+                partial(self.planner.raw_plan, pddl, domain, budget),  # type: ignore
+            )
+
+        self.store(key, raw_planner_result)
+        return raw_planner_result
+
+    def plan(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
+        raw_planner_result = self.raw_plan(pddl, kwargs.get("domain", None), kwargs.get("budget", None))
+        return self.get_planner_response(raw_planner_result, **kwargs)
+
+    async def plan_async(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
+        raw_planner_result = await self.raw_plan_async(pddl, kwargs.get("domain", None), kwargs.get("budget", None))
+        return self.get_planner_response(raw_planner_result, **kwargs)
@@ -1,77 +1,294 @@
-from nl2flow.plan.schemas import RawPlannerResult, PlannerResponse
-from nl2flow.plan.options import QUALITY_BOUND, NUM_PLANS
+from nl2flow.plan.schemas import RawPlannerResult, PlannerResponse, PlanningBudget, ClassicalPlan
+from nl2flow.plan.options import TIMEOUT_GRACE
 from nl2flow.compile.schemas import PDDL
-from typing import Any
+from nl2flow.compile.compilations import CompiledDomain
+from typing import Any, Dict, Generator, List, Optional, Set, Tuple
 from pathlib import Path
-from kstar_planner import planners
-
 from nl2flow.utility.file_utility import open_atomic
+from nl2flow.plan.planners.kstar_runner import run_kstar
 from nl2flow.plan.planner import Planner, FDDerivedPlanner
 
+import asyncio
+import json
+import math
+import os
+import shutil
+import signal
+import subprocess
+import sys
 import tempfile
+import time
+import weakref
 
 
 class Kstar(Planner, FDDerivedPlanner):
-    def __call_to_planner(self, pddl: PDDL) -> RawPlannerResult:
-        with tempfile.NamedTemporaryFile() as domain_temp, tempfile.NamedTemporaryFile() as problem_temp:
+    def __init__(self) -> None:
+        Planner.__init__(self)
+        self._domain_directory: Optional[str] = None
+        self._domain_files: Dict[str, Path] = dict()
+
+    def __get_domain_file(self, domain: CompiledDomain) -> Path:
+        if domain.key not in self._domain_files:
+            if self._domain_directory is None:
+                self._domain_directory = tempfile.mkdtemp(prefix="nl2flow-domains-")
+                weakref.finalize(self, shutil.rmtree, self._domain_directory, ignore_errors=True)
+
+            domain_file = Path(self._domain_directory) / f"{domain.key}.pddl"
+
+            with open_atomic(domain_file, "w") as domain_handle:
+                domain_handle.write(domain.domain)
+
+            self._domain_files[domain.key] = domain_file
+
+        return self._domain_files[domain.key]
+
+    def __write_pddl(
+        self, pddl: PDDL, domain: Optional[CompiledDomain], domain_temp: Any, problem_temp: Any
+    ) -> Tuple[Path, Path]:
+        if domain is not None and pddl.domain == domain.domain:
+            domain_file = self.__get_domain_file(domain)
+        else:
             domain_file = Path(tempfile.gettempdir()) / domain_temp.name
-            problem_file = Path(tempfile.gettempdir()) / problem_temp.name
 
             with open_atomic(domain_file, "w") as domain_handle:
                 domain_handle.write(pddl.domain)
 
-            with open_atomic(problem_file, "w") as problem_handle:
-                problem_handle.write(pddl.problem)
+        problem_file = Path(tempfile.gettempdir()) / problem_temp.name
 
-            planner_result = planners.plan_unordered_topq(
+        with open_atomic(problem_file, "w") as problem_handle:
+            problem_handle.write(pddl.problem)
+
+        return domain_file, problem_file
+
+    def __call_to_planner(
+        self, pddl: PDDL, domain: Optional[CompiledDomain], budget: PlanningBudget
+    ) -> RawPlannerResult:
+        with tempfile.NamedTemporaryFile() as domain_temp, tempfile.NamedTemporaryFile() as problem_temp:
+            domain_file, problem_file = self.__write_pddl(pddl, domain, domain_temp, problem_temp)
+
+            planner_result = run_kstar(
                 domain_file=domain_file,
                 problem_file=problem_file,
-                timeout=self.timeout,
-                quality_bound=QUALITY_BOUND,
-                number_of_plans_bound=NUM_PLANS,
+                timeout=budget.get_timeout(self.timeout),
+                quality_bound=budget.quality_bound,
+                number_of_plans=budget.num_plans,
+                cost_bound=budget.cost_bound,
+            )
+            return self.get_raw_planner_result(planner_result)
+
+    async def __call_to_planner_async(
+        self, pddl: PDDL, domain: Optional[CompiledDomain], budget: PlanningBudget
+    ) -> RawPlannerResult:
+        with tempfile.NamedTemporaryFile() as domain_temp, tempfile.NamedTemporaryFile() as problem_temp:
+            domain_file, problem_file = self.__write_pddl(pddl, domain, domain_temp, problem_temp)
+
+            # The planner writes its intermediate files to the working directory,
+            # so concurrent calls each need one of their own.
+            with tempfile.TemporaryDirectory() as working_directory:
+                return await self.__run_planner_process(domain_file, problem_file, working_directory, budget)
+
+    async def __run_planner_process(
+        self, domain_file: Path, problem_file: Path, working_directory: str, budget: PlanningBudget
+    ) -> RawPlannerResult:
+        timeout = budget.get_timeout(self.timeout)
+        process = await asyncio.create_subprocess_exec(
+            *self.__get_runner_command(domain_file, problem_file, budget),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=working_directory,
+            start_new_session=True,
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout + TIMEOUT_GRACE)
+
+        except asyncio.TimeoutError as error:
+            await kill_process_group(process)
+            raise TimeoutError(f"Planner did not respond within {timeout} seconds.") from error
+
+        except asyncio.CancelledError:
+            await kill_process_group(process)
+            raise
+
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode())
+
+        return self.get_raw_planner_result(json.loads(stdout))
+
+    def __get_runner_command(self, domain_file: Path, problem_file: Path, budget: PlanningBudget) -> List[str]:
+        return [
+            sys.executable,
+            "-m",
+            "nl2flow.plan.planners.kstar_runner",
+            str(domain_file),
+            str(problem_file),
+            str(budget.get_timeout(self.timeout)),
+            str(budget.quality_bound),
+            str(budget.num_plans),
+            str(budget.cost_bound),
+        ]
+
+    def __run_planner_stage(
+        self, domain_file: Path, problem_file: Path, budget: PlanningBudget, deadline: float
+    ) -> RawPlannerResult:
+        timeout = math.ceil(deadline - time.monotonic())
+
+        if timeout <= 0:
+            raise TimeoutError("Planner ran out of time before the search started.")
+
+        budget = budget.model_copy(update={"timeout": timeout})
+
+        with tempfile.TemporaryDirectory() as working_directory:
+            process = subprocess.Popen(
+                self.__get_runner_command(domain_file, problem_file, budget),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=working_directory,
+                start_new_session=True,
             )
-            result = RawPlannerResult(list_of_plans=planner_result.get("plans", []))
-            result.error_running_planner = False
-            result.is_no_solution = planner_result.get("unsolvable", None)
-            result.is_timeout = planner_result.get("timeout_triggered", None)
-            result.planner_output = planner_result.get("planner_output")
-            result.planner_error = planner_result.get("planner_error")
-            return result
-
-    def raw_plan(self, pddl: PDDL) -> RawPlannerResult:
+
+            try:
+                stdout, stderr = process.communicate(timeout=timeout + TIMEOUT_GRACE)
+
+            except subprocess.TimeoutExpired as error:
+                raise TimeoutError(f"Planner did not respond within {timeout} seconds.") from error
+
+            finally:
+                stop_process_group(process)
+
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode())
+
+        return self.get_raw_planner_result(json.loads(stdout))
+
+    def iter_plans(self, pddl: PDDL, **kwargs: Any) -> Generator[ClassicalPlan, None, PlannerResponse]:
+        # The best plan comes from a single plan search. The search for the rest of the
+        # top-k plans only starts once the caller asks for more than that, on whatever
+        # is left of the time budget.
+        domain: Optional[CompiledDomain] = kwargs.get("domain", None)
+        budget: PlanningBudget = kwargs.get("budget", None) or PlanningBudget()
+        deadline = time.monotonic() + budget.get_timeout(self.timeout)
+        budgets = [PlanningBudget(num_plans=1, quality_bound=1.0)]
+
+        if budget.num_plans > 1:
+            budgets.append(budget)
+
+        seen_plans: Set[Tuple[str, ...]] = set()
+        list_of_plans: List[ClassicalPlan] = list()
+        planner_response = PlannerResponse()
+
+        with tempfile.NamedTemporaryFile() as domain_temp, tempfile.NamedTemporaryFile() as problem_temp:
+            domain_file, problem_file = self.__write_pddl(pddl, domain, domain_temp, problem_temp)
+
+            for stage_budget in budgets:
+                # noinspection PyBroadException
+                try:
+                    raw_planner_result = self.__run_planner_stage(domain_file, problem_file, stage_budget, deadline)
+
+                except Exception as error:
+                    raw_planner_result = self.get_raw_planner_error(error)
+
+                raw_planner_result.list_of_plans = [
+                    plan for plan in raw_planner_result.list_of_plans if tuple(plan.actions) not in seen_plans
+                ]
+
+                seen_plans.update(tuple(plan.actions) for plan in raw_planner_result.list_of_plans)
+                planner_response = self.get_planner_response(raw_planner_result, **kwargs)
+                stage_plans = sorted(planner_response.list_of_plans, key=lambda plan: plan.cost)
+                list_of_plans.extend(stage_plans)
+
+                yield from stage_plans
+
+                if not seen_plans:
+                    break
+
+        # The last stage only knows about the plans that the earlier ones had not found.
+        planner_response.list_of_plans = list_of_plans
+        planner_response.is_parse_error = planner_response.is_parse_error and not list_of_plans
+        return planner_response
+
+    @staticmethod
+    def get_raw_planner_result(planner_result: Dict[str, Any]) -> RawPlannerResult:
+        result = RawPlannerResult(list_of_plans=planner_result.get("plans", []))
+        result.error_running_planner = False
+        result.is_no_solution = planner_result.get("unsolvable", None)
+        result.is_timeout = planner_result.get("timeout_triggered", None)
+        result.planner_output = planner_result.get("planner_output")
+        result.planner_error = planner_result.get("planner_error")
+        return result
+
+    def raw_plan(
+        self, pddl: PDDL, domain: Optional[CompiledDomain] = None, budget: Optional[PlanningBudget] = None
+    ) -> RawPlannerResult:
         # noinspection PyBroadException
         try:
-            raw_planner_result = self.__call_to_planner(pddl)
+            raw_planner_result = self.__call_to_planner(pddl, domain, budget or PlanningBudget())
             return raw_planner_result
 
-        except TimeoutError as error:
-            return RawPlannerResult(
-                is_timeout=True,
-                stderr=error,
-            )
+        except Exception as error:
+            return self.get_raw_planner_error(error)
+
+    async def raw_plan_async(
+        self, pddl: PDDL, domain: Optional[CompiledDomain] = None, budget: Optional[PlanningBudget] = None
+    ) -> RawPlannerResult:
+        # noinspection PyBroadException
+        try:
+            raw_planner_result = await self.__call_to_planner_async(pddl, domain, budget or PlanningBudget())
+            return raw_planner_result
 
         except Exception as error:
+            return self.get_raw_planner_error(error)
+
+    @staticmethod
+    def get_raw_planner_error(error: Exception) -> RawPlannerResult:
+        if isinstance(error, TimeoutError):
             return RawPlannerResult(
-                error_running_planner=True,
-                is_timeout=False,
+                is_timeout=True,
                 stderr=error,
             )
 
+        return RawPlannerResult(
+            error_running_planner=True,
+            is_timeout=False,
+            stderr=error,
+        )
+
     def plan(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
-        raw_planner_result = self.raw_plan(pddl)
-        planner_response = PlannerResponse.initialize_from_raw_plans(raw_planner_result)
+        raw_planner_result = self.raw_plan(pddl, kwargs.get("domain", None), kwargs.get("budget", None))
+        return self.get_planner_response(raw_planner_result, **kwargs)
 
-        # noinspection PyBroadException
+    async def plan_async(self, pddl: PDDL, **kwargs: Any) -> PlannerResponse:
+        raw_planner_result = await self.raw_plan_async(pddl, kwargs.get("domain", None), kwargs.get("budget", None))
+        return self.get_planner_response(raw_planner_result, **kwargs)
+
+
+def stop_process_group(process: subprocess.Popen) -> None:  # type: ignore
+    if process.poll() is None:
         try:
-            planner_response.list_of_plans = self.parse(raw_planner_result.list_of_plans, **kwargs)
-            planner_response.is_parse_error = (
-                len(planner_response.list_of_plans) == 0 and planner_response.is_no_solution is False
-            )
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
 
-            planner_response = self.post_process(planner_response, **kwargs)
-            return planner_response
+        except ProcessLookupError:
+            pass
 
-        except Exception as error:
-            planner_response.is_parse_error = True
-            planner_response.stderr = error
-            return planner_response
+    process.wait()
+
+    for stream in [process.stdout, process.stderr]:
+        if stream is not None:
+            stream.close()
+
+
+async def kill_process_group(process: Any) -> None:
+    if process.returncode is None:
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+
+        except ProcessLookupError:
+            pass
+
+    await process.wait()
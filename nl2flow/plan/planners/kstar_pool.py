@@ -0,0 +1,268 @@
+from __future__ import annotations
+from nl2flow.plan.schemas import RawPlannerResult, PlanningBudget
+from nl2flow.plan.options import TIMEOUT, POOL_SIZE, MAX_JOBS_PER_WORKER, TIMEOUT_GRACE
+from nl2flow.plan.planners.kstar import Kstar
+from nl2flow.plan.planners.kstar_runner import run_kstar
+from nl2flow.compile.schemas import PDDL
+from nl2flow.compile.compilations import CompiledDomain
+from nl2flow.utility.file_utility import open_atomic
+from multiprocessing.connection import Connection
+from queue import Queue
+from threading import Lock
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import weakref
+
+SHARED_MEMORY_DIRECTORY = "/dev/shm"
+
+
+def get_scratch_root() -> str:
+    if os.path.isdir(SHARED_MEMORY_DIRECTORY) and os.access(SHARED_MEMORY_DIRECTORY, os.W_OK):
+        return SHARED_MEMORY_DIRECTORY
+
+    return tempfile.gettempdir()
+
+
+def run_worker(connection: Connection, scratch_directory: str) -> None:
+    # Lead a new process group so that the planner processes spawned
+    # by this worker can be killed along with it on a timeout.
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    # The planner writes its intermediate files to the working directory,
+    # so each worker runs from its own scratch directory.
+    os.chdir(scratch_directory)
+    tempfile.tempdir = scratch_directory
+    domain_file = Path(scratch_directory) / "domain.pddl"
+    problem_file = Path(scratch_directory) / "problem.pddl"
+    current_domain: Optional[str] = None
+
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+
+        if job is None:
+            break
+
+        domain, problem, timeout, quality_bound, number_of_plans, cost_bound = job
+
+        # noinspection PyBroadException
+        try:
+            if domain != current_domain:
+                with open_atomic(domain_file, "w") as domain_handle:
+                    domain_handle.write(domain)
+
+                current_domain = domain
+
+            with open_atomic(problem_file, "w") as problem_handle:
+                problem_handle.write(problem)
+
+            planner_result = run_kstar(
+                domain_file=domain_file,
+                problem_file=problem_file,
+                timeout=timeout,
+                quality_bound=quality_bound,
+                number_of_plans=number_of_plans,
+                cost_bound=cost_bound,
+            )
+            connection.send((planner_result, None))
+
+        except Exception as error:
+            current_domain = None
+            connection.send((dict(), repr(error)))
+
+
+class KstarWorker:
+    def __init__(self, context: Any, scratch_root: str) -> None:
+        self.jobs: int = 0
+        self.scratch_directory = tempfile.mkdtemp(prefix="nl2flow-kstar-", dir=scratch_root)
+        self.connection, worker_connection = context.Pipe()
+
+        self.process = context.Process(
+            target=run_worker,
+            args=(worker_connection, self.scratch_directory),
+            daemon=True,
+        )
+
+        self.process.start()
+        worker_connection.close()
+
+    def run(self, pddl: PDDL, timeout: int, budget: PlanningBudget) -> Dict[str, Any]:
+        self.jobs += 1
+        self.connection.send(
+            (pddl.domain, pddl.problem, timeout, budget.quality_bound, budget.num_plans, budget.cost_bound)
+        )
+
+        if not self.connection.poll(timeout + TIMEOUT_GRACE):
+            raise TimeoutError(f"Planner worker did not respond within {timeout} seconds.")
+
+        planner_result, error = self.connection.recv()
+        if error is not None:
+            raise RuntimeError(error)
+
+        result: Dict[str, Any] = planner_result
+        return result
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill and self.process.is_alive():
+            try:
+                self.connection.send(None)
+                self.process.join(timeout=TIMEOUT_GRACE)
+            except OSError:
+                pass
+
+        if self.process.is_alive() and self.process.pid is not None:
+            try:
+                if hasattr(os, "killpg") and os.getpgid(self.process.pid) == self.process.pid:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    self.process.kill()
+
+            except ProcessLookupError:
+                pass
+
+            self.process.join()
+
+        self.connection.close()
+        shutil.rmtree(self.scratch_directory, ignore_errors=True)
+
+
+class KstarPool(Kstar):
+    """
+    Kstar planner that dispatches plan calls to a pool of warm worker processes. Each
+    worker keeps a scratch directory (on tmpfs where available) for its domain, problem,
+    and result files, and only rewrites the domain file when the domain changes. Workers
+    are recycled after a given number of jobs, when they crash, or when they time out.
+    Async plan calls are inherited from Kstar and run in a planner subprocess of their own.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        timeout: int = TIMEOUT,
+        max_jobs_per_worker: int = MAX_JOBS_PER_WORKER,
+        scratch_directory: Optional[str] = None,
+    ) -> None:
+        Kstar.__init__(self)
+        assert pool_size > 0, "Pool size must be positive."
+
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.scratch_directory = scratch_directory or get_scratch_root()
+
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = Lock()
+        self._closed: bool = False
+        self._workers: List[KstarWorker] = list()
+        self._idle_workers: Queue[KstarWorker] = Queue()
+
+        for _ in range(pool_size):
+            self._idle_workers.put(self.__start_worker())
+
+        self._finalizer = weakref.finalize(self, KstarPool.stop_workers, self._workers)
+
+    def __enter__(self) -> KstarPool:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def worker_pids(self) -> List[Optional[int]]:
+        with self._lock:
+            return [worker.process.pid for worker in self._workers]
+
+    @staticmethod
+    def stop_workers(workers: List[KstarWorker]) -> None:
+        while workers:
+            workers.pop().stop()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+
+        self._finalizer()
+
+    def __start_worker(self) -> KstarWorker:
+        worker = KstarWorker(self._context, self.scratch_directory)
+
+        with self._lock:
+            self._workers.append(worker)
+
+        return worker
+
+    def __replace_worker(self, worker: KstarWorker, kill: bool = False) -> KstarWorker:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+
+        worker.stop(kill=kill)
+        return self.__start_worker()
+
+    def __release_worker(self, worker: KstarWorker, kill: bool = False) -> None:
+        if not kill and worker.jobs < self.max_jobs_per_worker:
+            self._idle_workers.put(worker)
+            return
+
+        # A worker goes back to the pool even if its replacement fails to start, so that
+        # the pool does not shrink and callers do not wait for an idle worker for good.
+        # A stopped worker that goes back fails its next run and is replaced then.
+        idle_worker = worker
+
+        try:
+            idle_worker = self.__replace_worker(worker, kill=kill)
+        finally:
+            self._idle_workers.put(idle_worker)
+
+    def raw_plan(
+        self, pddl: PDDL, domain: Optional[CompiledDomain] = None, budget: Optional[PlanningBudget] = None
+    ) -> RawPlannerResult:
+        if self._closed:
+            return RawPlannerResult(
+                error_running_planner=True,
+                is_timeout=False,
+                stderr=RuntimeError("Planner pool has been closed."),
+            )
+
+        budget = budget or PlanningBudget()
+        worker = self._idle_workers.get()
+        kill = False
+
+        # noinspection PyBroadException
+        try:
+            planner_result = worker.run(pddl, budget.get_timeout(self.timeout), budget)
+            return self.get_raw_planner_result(planner_result)
+
+        except TimeoutError as error:
+            kill = True
+            return RawPlannerResult(
+                is_timeout=True,
+                stderr=error,
+            )
+
+        except (EOFError, OSError) as error:
+            kill = True
+            return RawPlannerResult(
+                error_running_planner=True,
+                is_timeout=False,
+                stderr=error,
+            )
+
+        except Exception as error:
+            return RawPlannerResult(
+                error_running_planner=True,
+                is_timeout=False,
+                stderr=error,
+            )
+
+        finally:
+            self.__release_worker(worker, kill=kill)
@@ -0,0 +1,110 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from kstar_planner import planners
+from kstar_planner.driver import limits
+
+import json
+import sys
+
+SYMMETRIES = (
+    "sym=structural_symmetries(time_bound=0,search_symmetries=oss,"
+    "stabilize_initial_state=false,keep_operator_symmetries=true)"
+)
+
+PRUNING = (
+    "pruning=limited_pruning(pruning=atom_centric_stubborn_sets("
+    "use_sibling_shortcut=true, atom_selection_strategy=quick_skip))"
+)
+
+
+def get_time_limit(timeout: int) -> List[str]:
+    return ["--overall-time-limit", f"{timeout}s"] if timeout and limits.can_set_time_limit() else []
+
+
+def get_cost_bound(cost_bound: Optional[int]) -> str:
+    # The planner only keeps plans that cost strictly less than the bound.
+    return "" if cost_bound is None else f", bound={cost_bound}"
+
+
+def plan_single_optimal(
+    domain_file: Path, problem_file: Path, timeout: int, cost_bound: Optional[int] = None
+) -> Dict[str, Any]:
+    # With a single optimal plan to find there are no orderings of that
+    # plan to enumerate, so the search stops at the first plan it finds.
+    time_limit = get_time_limit(timeout)
+    search = (
+        f"kstar(lmcut(transform=undo_to_origin()), q=1.0, k=1, max_time={timeout}, find_unordered_plans=false, "
+        f"dump_plan_files=false, json_file_to_dump=PLANS_JSON_NAME, symmetries=sym, {PRUNING}"
+        f"{get_cost_bound(cost_bound)})"
+    )
+
+    planner_result: Dict[str, Any] = planners.run_planner(
+        time_limit
+        + [str(domain_file.absolute()), str(problem_file.absolute())]
+        + ["--symmetries", SYMMETRIES, "--search", search]
+    )
+    return planner_result
+
+
+def plan_unordered_topq_bounded(
+    domain_file: Path, problem_file: Path, timeout: int, quality_bound: float, number_of_plans: int, cost_bound: int
+) -> Dict[str, Any]:
+    # The same search as planners.plan_unordered_topq, which does not take a cost bound.
+    time_limit = get_time_limit(timeout)
+    search = (
+        f"kstar(lmcut(transform=undo_to_origin()), q={quality_bound}, k={number_of_plans}, max_time={timeout}, "
+        f"find_unordered_plans=true, dump_plan_files=false, json_file_to_dump=PLANS_JSON_NAME, symmetries=sym, "
+        f"{PRUNING}{get_cost_bound(cost_bound)})"
+    )
+
+    planner_result: Dict[str, Any] = planners.run_planner(
+        time_limit
+        + [str(domain_file.absolute()), str(problem_file.absolute())]
+        + ["--symmetries", SYMMETRIES, "--search", search]
+    )
+    return planner_result
+
+
+def run_kstar(
+    domain_file: Path,
+    problem_file: Path,
+    timeout: int,
+    quality_bound: float,
+    number_of_plans: int,
+    cost_bound: Optional[int] = None,
+) -> Dict[str, Any]:
+    if number_of_plans == 1 and quality_bound == 1.0:
+        return plan_single_optimal(domain_file, problem_file, timeout, cost_bound)
+
+    if cost_bound is not None:
+        return plan_unordered_topq_bounded(
+            domain_file, problem_file, timeout, quality_bound, number_of_plans, cost_bound
+        )
+
+    planner_result: Dict[str, Any] = planners.plan_unordered_topq(
+        domain_file=domain_file,
+        problem_file=problem_file,
+        timeout=timeout,
+        quality_bound=quality_bound,
+        number_of_plans_bound=number_of_plans,
+    )
+    return planner_result
+
+
+def main(arguments: List[str]) -> None:
+    domain_file, problem_file, timeout, quality_bound, number_of_plans, cost_bound = arguments
+
+    planner_result = run_kstar(
+        domain_file=Path(domain_file),
+        problem_file=Path(problem_file),
+        timeout=int(timeout),
+        quality_bound=float(quality_bound),
+        number_of_plans=int(number_of_plans),
+        cost_bound=None if cost_bound == str(None) else int(cost_bound),
+    )
+
+    json.dump(planner_result, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from pydantic import BaseModel
-from typing import List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Union
 from nl2flow.compile.schemas import Constraint
+from nl2flow.plan.options import NUM_PLANS, QUALITY_BOUND
 
 
 class Action(BaseModel):
@@ -17,6 +18,17 @@ class ClassicalPlan(BaseModel):
     metadata: Optional[Any] = None
     reference: List[str]
     plan: List[Union[Action, Constraint]] = []
+    multiplicity: int = 1
+
+
+class PlanningBudget(BaseModel):
+    num_plans: int = NUM_PLANS
+    quality_bound: float = QUALITY_BOUND
+    timeout: Optional[int] = None
+    cost_bound: Optional[int] = None
+
+    def get_timeout(self, default: int) -> int:
+        return default if self.timeout is None else self.timeout
 
 
 class RawPlannerResult(BaseModel):
@@ -29,9 +41,64 @@ class RawPlannerResult(BaseModel):
     planner_error: Optional[str] = None
 
 
+class PlannerStats(BaseModel):
+    translator_time: Optional[float] = None
+    translator_peak_memory: Optional[int] = None
+    num_variables: Optional[int] = None
+    num_facts: Optional[int] = None
+    num_operators: Optional[int] = None
+    search_time: Optional[float] = None
+    search_peak_memory: Optional[int] = None
+    expansions: Optional[int] = None
+    evaluations: Optional[int] = None
+    generated: Optional[int] = None
+    num_plans_found: Optional[int] = None
+
+
+class AggregatePlannerStats(BaseModel):
+    """
+    Running totals and maxima of planner stats across planner calls. The mean of a stat
+    is taken over the calls that reported it, so that calls that failed before search
+    do not drag down search times.
+    """
+
+    count: int = 0
+    total: PlannerStats = PlannerStats()
+    maximum: PlannerStats = PlannerStats()
+    counts: Dict[str, int] = dict()
+
+    def add(self, stats: Optional[PlannerStats]) -> None:
+        self.count += 1
+
+        if stats is None:
+            return
+
+        for key, value in stats.model_dump(exclude_none=True).items():
+            total = getattr(self.total, key)
+            maximum = getattr(self.maximum, key)
+
+            setattr(self.total, key, value if total is None else total + value)
+            setattr(self.maximum, key, value if maximum is None else max(maximum, value))
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    @property
+    def mean(self) -> Dict[str, float]:
+        return {key: getattr(self.total, key) / count for key, count in self.counts.items()}
+
+    @classmethod
+    def of(cls, list_of_stats: List[Optional[PlannerStats]]) -> AggregatePlannerStats:
+        aggregate_stats = cls()
+
+        for stats in list_of_stats:
+            aggregate_stats.add(stats)
+
+        return aggregate_stats
+
+
 class PlannerResponse(RawPlannerResult):
     list_of_plans: List[ClassicalPlan] = []
     is_parse_error: Optional[bool] = None
+    stats: Optional[PlannerStats] = None
 
     @classmethod
     def initialize_from_raw_plans(cls, raw_planner_result: RawPlannerResult) -> PlannerResponse:
@@ -0,0 +1,403 @@
+from __future__ import annotations
+from copy import deepcopy
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+from pydantic import BaseModel
+from tarski.evaluators.simple import evaluate
+from tarski.model import ExtensionalFunctionDefinition
+from tarski.fstrips.representation import substitute_expression
+from tarski.search.operations import is_applicable, progress
+from tarski.syntax import CompoundFormula, Connective, create_substitution
+from tarski.syntax.transform.action_grounding import ground_schema_into_plain_operator
+from nl2flow.compile.compilations import Compilation, ClassicPDDLProblem
+from nl2flow.compile.options import RestrictedOperations
+from nl2flow.plan.schemas import ClassicalPlan
+from operator import add, eq, ge, gt, le, lt, sub
+
+import re
+
+
+class SimulationResult(BaseModel):
+    is_executable: bool = True
+    reaches_goal: bool = False
+    cost: float = 0.0
+    failed_step: Optional[int] = None
+    unmet_preconditions: List[str] = []
+
+    @property
+    def is_valid(self) -> bool:
+        return self.is_executable and self.reaches_goal
+
+
+def get_plan_suffix(plan: ClassicalPlan, num_steps: int) -> List[str]:
+    # Raw actions that do not show up as steps of the plan, such as the enablers of
+    # operators, go with the step that comes after them.
+    if num_steps <= 0:
+        return list(plan.reference)
+
+    for index, raw_action in enumerate(plan.reference):
+        if not RestrictedOperations.is_restricted(raw_action):
+            num_steps -= 1
+
+            if num_steps == 0:
+                return plan.reference[index + 1 :]
+
+    return []
+
+
+class PlanSimulator:
+    """
+    Executes raw plans, as they come out of the planner, against the actions and initial
+    state of a compilation without calling the planner. Problem compilations are run on
+    the actions and initial state of their domain, together with their own initial state.
+    """
+
+    def __init__(self, compilation: Compilation):
+        template: Any = compilation.template if isinstance(compilation, ClassicPDDLProblem) else compilation
+
+        # The planner reports actions and objects in lower case.
+        self.actions: Dict[str, Any] = {name.lower(): action for name, action in template.problem.actions.items()}
+        self.constants: Dict[str, Any] = {name.lower(): constant for name, constant in compilation.constant_map.items()}
+        self.goal = compilation.problem.goal
+        self.init = deepcopy(template.init)
+
+        if compilation is not template:
+            for signature, extension in compilation.init.predicate_extensions.items():
+                self.init.predicate_extensions.setdefault(signature, set()).update(extension)
+
+            for signature, definition in compilation.init.function_extensions.items():
+                self.init.function_extensions.setdefault(signature, ExtensionalFunctionDefinition()).data.update(
+                    definition.data
+                )
+
+    def ground(self, raw_action: str) -> Any:
+        name, *parameters = raw_action.split()
+
+        if name not in self.actions or any(parameter not in self.constants for parameter in parameters):
+            return None
+
+        action = self.actions[name]
+        substitution = create_substitution(action.parameters, [self.constants[p] for p in parameters])
+        return action, substitution
+
+    def apply(self, state: Any, action: Any, substitution: Any) -> Tuple[Any, float]:
+        operator = ground_schema_into_plain_operator(action, substitution)
+        cost = evaluate(substitute_expression(action.cost.addend, substitution), state)
+        return progress(state, operator), float(getattr(cost, "symbol", cost))
+
+    @staticmethod
+    def get_unmet_conditions(state: Any, formula: Any) -> List[Any]:
+        if isinstance(formula, CompoundFormula) and formula.connective == Connective.And:
+            conditions = list(formula.subformulas)
+        else:
+            conditions = [formula]
+
+        return [condition for condition in conditions if not evaluate(condition, state)]
+
+    def get_cost(self, raw_actions: List[str]) -> Optional[float]:
+        # No action changes the fluents that action costs are made of, so the costs can be
+        # read off the initial state even for actions that could not be executed there.
+        cost = 0.0
+
+        for raw_action in raw_actions:
+            grounding = self.ground(raw_action)
+
+            if grounding is None:
+                return None
+
+            action, substitution = grounding
+            action_cost = evaluate(substitute_expression(action.cost.addend, substitution), self.init)
+            cost += float(getattr(action_cost, "symbol", action_cost))
+
+        return cost
+
+    def simulate(self, raw_actions: List[str]) -> SimulationResult:
+        result = SimulationResult()
+        state = self.init
+
+        for index, raw_action in enumerate(raw_actions):
+            grounding = self.ground(raw_action)
+
+            if grounding is not None:
+                action, substitution = grounding
+                operator = ground_schema_into_plain_operator(action, substitution)
+
+            if grounding is None or not is_applicable(state, operator):
+                result.is_executable = False
+                result.failed_step = index
+
+                if grounding is not None:
+                    result.unmet_preconditions = [
+                        str(condition) for condition in self.get_unmet_conditions(state, operator.precondition)
+                    ]
+
+                return result
+
+            state, cost = self.apply(state, action, substitution)
+            result.cost += cost
+
+        result.reaches_goal = bool(evaluate(self.goal, state))
+        return result
+
+
+SExpression = Union[str, List[Any]]
+
+PDDL_TOKEN = re.compile(r"\(|\)|[^\s()]+")
+PDDL_COMMENT = re.compile(r";[^\n]*")
+PLAN_ACTION = re.compile(r"\(([^()]*)\)")
+TOTAL_COST = ("total-cost",)
+COMPARISONS: Dict[str, Callable[[float, float], bool]] = {"=": eq, "<": lt, "<=": le, ">": gt, ">=": ge}
+NUMERIC_EFFECTS: Dict[str, Callable[[float, float], float]] = {
+    "increase": add,
+    "decrease": sub,
+    "assign": lambda _, value: value,
+}
+
+
+def parse_s_expression(text: str) -> SExpression:
+    stack: List[List[Any]] = [[]]
+
+    for token in PDDL_TOKEN.findall(PDDL_COMMENT.sub("", text).lower()):
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) < 2:
+                raise ValueError("Unbalanced parentheses in PDDL.")
+
+            expression = stack.pop()
+            stack[-1].append(expression)
+        else:
+            stack[-1].append(token)
+
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError("Expected a single PDDL expression.")
+
+    s_expression: SExpression = stack[0][0]
+    return s_expression
+
+
+def parse_typed_list(items: List[Any]) -> Dict[str, List[str]]:
+    typed_items: Dict[str, List[str]] = dict()
+    names: List[str] = list()
+    index = 0
+
+    while index < len(items):
+        if items[index] == "-":
+            type_name = items[index + 1]
+            type_names = type_name[1:] if isinstance(type_name, List) else [type_name]
+
+            typed_items.update({name: type_names for name in names})
+            names = list()
+            index += 2
+        else:
+            names.append(items[index])
+            index += 1
+
+    typed_items.update({name: ["object"] for name in names})
+    return typed_items
+
+
+def get_plan_actions(pddl_plan: str) -> List[str]:
+    return [" ".join(action.split()) for action in PLAN_ACTION.findall(PDDL_COMMENT.sub("", pddl_plan).lower())]
+
+
+class PDDLPlanSimulator:
+    """
+    Executes plans against a PDDL domain and problem, for the STRIPS fragment with typing,
+    negative and disjunctive conditions, equality, conditional effects, and action costs
+    that compiled flows use. Plans can be raw plans or in the format of plan files.
+    """
+
+    def __init__(self, pddl_domain: str, pddl_problem: str):
+        self.parents: Dict[str, List[str]] = dict()
+        self.objects: Dict[str, List[str]] = dict()
+        self.actions: Dict[str, Dict[str, Any]] = dict()
+        self.atoms: Set[Tuple[str, ...]] = set()
+        self.fluents: Dict[Tuple[str, ...], float] = dict()
+        self.goal: SExpression = []
+
+        for section in self.get_sections(pddl_domain, "domain") + self.get_sections(pddl_problem, "problem"):
+            self.add_section(section)
+
+    @staticmethod
+    def get_sections(pddl: str, kind: str) -> List[Any]:
+        s_expression = parse_s_expression(pddl)
+
+        if not isinstance(s_expression, List) or s_expression[:1] != ["define"] or len(s_expression) < 2:
+            raise ValueError(f"Could not parse PDDL {kind}.")
+
+        sections: List[Any] = [section for section in s_expression[2:] if isinstance(section, List) and section]
+        return sections
+
+    def add_section(self, section: List[Any]) -> None:
+        key = section[0]
+
+        if key == ":types":
+            self.parents.update(parse_typed_list(section[1:]))
+
+        elif key in [":constants", ":objects"]:
+            self.objects.update(parse_typed_list(section[1:]))
+
+        elif key == ":action":
+            action: Dict[str, Any] = dict(zip(section[2::2], section[3::2]))
+            self.actions[section[1]] = {
+                "parameters": list(parse_typed_list(action.get(":parameters", [])).items()),
+                "precondition": action.get(":precondition", []),
+                "effect": action.get(":effect", []),
+            }
+
+        elif key == ":init":
+            for fact in section[1:]:
+                if fact[0] == "=":
+                    self.fluents[tuple(fact[1])] = float(fact[2])
+                else:
+                    self.atoms.add(tuple(fact))
+
+        elif key == ":goal":
+            self.goal = section[1]
+
+    def is_of_type(self, name: str, type_name: str) -> bool:
+        pending = list(self.objects.get(name, []))
+        seen: Set[str] = set()
+
+        while pending:
+            current = pending.pop()
+
+            if current == type_name or type_name == "object":
+                return True
+
+            if current not in seen:
+                seen.add(current)
+                pending.extend(self.parents.get(current, []))
+
+        return False
+
+    def ground(self, raw_action: str) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+        name, *arguments = raw_action.lower().split()
+        action = self.actions.get(name)
+
+        if action is None or len(arguments) != len(action["parameters"]):
+            return None
+
+        binding: Dict[str, str] = dict()
+
+        for (parameter, type_names), argument in zip(action["parameters"], arguments):
+            if argument not in self.objects or not any(self.is_of_type(argument, t) for t in type_names):
+                return None
+
+            binding[parameter] = argument
+
+        return action, binding
+
+    @staticmethod
+    def get_atom(expression: SExpression, binding: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(binding.get(term, term) for term in expression)
+
+    def get_value(self, term: SExpression, fluents: Dict[Tuple[str, ...], float], binding: Dict[str, str]) -> float:
+        if isinstance(term, str):
+            return float(term)
+
+        atom = self.get_atom(term, binding)
+
+        if atom not in fluents:
+            raise ValueError(f"Undefined value of ({' '.join(atom)}).")
+
+        return fluents[atom]
+
+    def holds(self, formula: SExpression, state: Tuple[Set[Any], Dict[Any, float]], binding: Dict[str, str]) -> bool:
+        atoms, fluents = state
+
+        if not formula:
+            return True
+
+        key = formula[0]
+
+        if key == "and":
+            return all(self.holds(f, state, binding) for f in formula[1:])
+
+        if key == "or":
+            return any(self.holds(f, state, binding) for f in formula[1:])
+
+        if key == "not":
+            return not self.holds(formula[1], state, binding)
+
+        if key == "imply":
+            return not self.holds(formula[1], state, binding) or self.holds(formula[2], state, binding)
+
+        if key == "=" and all(isinstance(term, str) for term in formula[1:]):
+            return binding.get(formula[1], formula[1]) == binding.get(formula[2], formula[2])
+
+        if key in COMPARISONS:
+            return COMPARISONS[key](
+                self.get_value(formula[1], fluents, binding), self.get_value(formula[2], fluents, binding)
+            )
+
+        if key in ["exists", "forall"]:
+            raise ValueError(f"Unsupported PDDL condition: {key}.")
+
+        return self.get_atom(formula, binding) in atoms
+
+    def get_effects(
+        self, effect: SExpression, state: Tuple[Set[Any], Dict[Any, float]], binding: Dict[str, str]
+    ) -> Iterator[Tuple[str, Any, Any]]:
+        if not effect:
+            return
+
+        key = effect[0]
+
+        if key == "and":
+            for sub_effect in effect[1:]:
+                yield from self.get_effects(sub_effect, state, binding)
+
+        elif key == "when":
+            if self.holds(effect[1], state, binding):
+                yield from self.get_effects(effect[2], state, binding)
+
+        elif key == "not":
+            yield "delete", self.get_atom(effect[1], binding), None
+
+        elif key in NUMERIC_EFFECTS:
+            yield key, self.get_atom(effect[1], binding), self.get_value(effect[2], state[1], binding)
+
+        elif key == "forall":
+            raise ValueError("Unsupported PDDL effect: forall.")
+
+        else:
+            yield "add", self.get_atom(effect, binding), None
+
+    def simulate(self, raw_actions: List[str]) -> SimulationResult:
+        result = SimulationResult()
+        atoms, fluents = set(self.atoms), dict(self.fluents)
+
+        for index, raw_action in enumerate(raw_actions):
+            grounding = self.ground(raw_action)
+
+            try:
+                if grounding is None or not self.holds(grounding[0]["precondition"], (atoms, fluents), grounding[1]):
+                    raise ValueError(f"Action {raw_action} is not applicable.")
+
+                effects = list(self.get_effects(grounding[0]["effect"], (atoms, fluents), grounding[1]))
+
+            except ValueError:
+                result.is_executable = False
+                result.failed_step = index
+                return result
+
+            # Delete effects are applied before add effects.
+            atoms.difference_update(atom for kind, atom, _ in effects if kind == "delete")
+            atoms.update(atom for kind, atom, _ in effects if kind == "add")
+
+            for kind, atom, value in effects:
+                if kind in NUMERIC_EFFECTS:
+                    new_value = NUMERIC_EFFECTS[kind](fluents.get(atom, 0.0), value)
+
+                    if atom == TOTAL_COST:
+                        result.cost += new_value - fluents.get(atom, 0.0)
+
+                    fluents[atom] = new_value
+
+        try:
+            result.reaches_goal = self.holds(self.goal, (atoms, fluents), dict())
+        except ValueError:
+            result.reaches_goal = False
+
+        return result
@@ -1,6 +1,6 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 from nl2flow.compile.flow import Flow
-from nl2flow.compile.utils import Transform, revert_string_transform, string_transform
+from nl2flow.compile.utils import Transform, TransformRegistry, revert_string_transform, string_transform
 from nl2flow.compile.basic_compilations.utils import unpack_list_of_signature_items
 from nl2flow.plan.schemas import ClassicalPlan, Action
 from nl2flow.compile.options import (
@@ -19,6 +19,10 @@ from nl2flow.compile.schemas import (
     Step,
 )
 
+import re
+
+RETRY_STATE = re.compile(r"^try_level_\d+$")
+
 
 def group_items(plan: ClassicalPlan, option: Union[SlotOptions, MappingOptions, ConfirmOptions]) -> ClassicalPlan:
     if option == SlotOptions.group_slots:
@@ -86,9 +90,57 @@ def find_goal(name: str, flow_object: Flow) -> Optional[GoalItem]:
     return next(filter(lambda goal_item: getattr(goal_item, "goal_name") == name, all_goals), None)
 
 
+class ParseContext:
+    """
+    Lookups that parsing an action needs, built once per planner response and shared by
+    all of its plans: operators by name, their unpacked inputs and outputs (unpacked on
+    first use, since plans only touch a few operators of a catalog), the reverse string
+    transforms, and the transformed names of constraint states.
+    """
+
+    def __init__(self, flow_object: Flow, transforms: List[Transform]):
+        self.flow_object = flow_object
+        self.transforms = TransformRegistry.of(transforms)
+        self.operators: Dict[str, OperatorDefinition] = dict()
+        self.signatures: Dict[str, Tuple[List[str], List[str]]] = dict()
+
+        for operator in flow_object.flow_definition.operators:
+            self.operators.setdefault(operator.name, operator)
+
+        self.constraint_states: Dict[Optional[str], bool] = dict()
+        for v in ConstraintState:
+            self.constraint_states[string_transform(str(v.value), self.transforms)] = v.value
+
+    def revert(self, item: str) -> str:
+        # Names that no transform made are their own source.
+        source = revert_string_transform(item, self.transforms)
+        return item if source is None else source
+
+    def get_signature(self, operator_name: str) -> Tuple[OperatorDefinition, List[str], List[str]]:
+        operator = self.operators[operator_name]
+
+        if operator_name not in self.signatures:
+            if not isinstance(operator.outputs, Outcome):
+                raise NotImplementedError("Only working on classical operators at the moment.")
+
+            self.signatures[operator_name] = (
+                unpack_list_of_signature_items(operator.inputs),
+                unpack_list_of_signature_items(operator.outputs.outcomes),
+            )
+
+        inputs, outputs = self.signatures[operator_name]
+        return operator, inputs, outputs
+
+
 def parse_action(
-    action_name: str, parameters: List[str], flow_object: Flow, transforms: List[Transform]
+    action_name: str,
+    parameters: List[str],
+    flow_object: Flow,
+    transforms: List[Transform],
+    context: Optional[ParseContext] = None,
 ) -> Optional[Union[Action, Constraint]]:
+    context = context or ParseContext(flow_object, transforms)
+
     if RestrictedOperations.is_restricted(action_name):
         return None
 
@@ -99,12 +151,12 @@ def parse_action(
         if temp[1:] and not parameters:
             parameters = temp[1:]
 
-        new_action.inputs = [revert_string_transform(param, transforms) for param in parameters]
+        new_action.inputs = [context.revert(param) for param in parameters]
         return new_action
 
     elif action_name.startswith(BasicOperations.CONFIRM.value):
         new_action = Action(name=BasicOperations.CONFIRM.value)
-        new_action.inputs = [revert_string_transform(param, transforms) for param in parameters]
+        new_action.inputs = [context.revert(param) for param in parameters]
         return new_action
 
     elif action_name.startswith(BasicOperations.MAPPER.value):
@@ -114,38 +166,109 @@ def parse_action(
         if temp[1:] and not parameters:
             parameters = temp[1:]
 
-        new_action.inputs = [revert_string_transform(param, transforms) for param in parameters]
+        new_action.inputs = [context.revert(param) for param in parameters]
         return new_action
 
     elif action_name.startswith(BasicOperations.CONSTRAINT.value):
         new_action_name = action_name.replace(f"{BasicOperations.CONSTRAINT.value}_", "", 1)
         action_split_for_id = new_action_name.split("_to_")
 
-        constraint = revert_string_transform(action_split_for_id[0], transforms)
+        constraint = context.revert(action_split_for_id[0])
         assert constraint, ValueError(f"Failed to parse constraint id from {action_name}")
 
         action_split_for_truth_value = action_split_for_id[1].split("_with_")
-
-        truth_value = None
-        for v in ConstraintState:
-            if string_transform(str(v.value), transforms) == action_split_for_truth_value[0]:
-                truth_value = v.value
+        truth_value = context.constraint_states.get(action_split_for_truth_value[0])
 
         return Constraint(constraint=constraint, truth_value=truth_value)
 
     else:
-        operator: OperatorDefinition = next(
-            filter(lambda x: x.name == action_name, flow_object.flow_definition.operators)
-        )
+        operator, inputs, outputs = context.get_signature(action_name)
         new_action = Action(
             name=operator.name,
-            parameters=[revert_string_transform(p, transforms) for p in parameters],
-            inputs=unpack_list_of_signature_items(operator.inputs),
+            parameters=[context.revert(p) for p in parameters],
+            inputs=list(inputs),
+            outputs=list(outputs),
         )
 
-        if isinstance(operator.outputs, Outcome):
-            new_action.outputs = unpack_list_of_signature_items(operator.outputs.outcomes)
-        else:
-            raise NotImplementedError("Only working on classical operators at the moment.")
-
         return new_action
+
+
+def get_step_key(step: Union[Action, Constraint], ignore_map_sources: bool = False) -> str:
+    if isinstance(step, Constraint):
+        return f"{BasicOperations.CONSTRAINT.value}({step.constraint}, {step.truth_value})"
+
+    inputs = step.inputs[1::2] if ignore_map_sources and step.name == BasicOperations.MAPPER.value else step.inputs
+    return f"{step.name}({', '.join(step.parameters)}; {', '.join(inputs)})"
+
+
+def get_step_items(step: Union[Action, Constraint], ignore_map_sources: bool = False) -> Optional[Set[str]]:
+    # Constraints can be set by any operator, so they are ordered against every other step.
+    if isinstance(step, Constraint):
+        return None
+
+    inputs = step.inputs[1::2] if ignore_map_sources and step.name == BasicOperations.MAPPER.value else step.inputs
+    return {item for item in [*step.parameters, *inputs, *step.outputs] if not RETRY_STATE.match(item)}
+
+
+def get_canonical_form(plan: ClassicalPlan, ignore_map_sources: bool = False) -> Tuple[str, ...]:
+    """
+    Plans that only differ in the order of independent steps, i.e. steps that do not
+    share an item and are not retries of the same operator, are linearizations of the
+    same partial order. Its canonical form is the linearization that always takes the
+    smallest step whose dependencies are already placed.
+    """
+    keys = [get_step_key(step, ignore_map_sources) for step in plan.plan]
+    items = [get_step_items(step, ignore_map_sources) for step in plan.plan]
+    basic_operations = {item.value for item in BasicOperations}
+
+    def are_dependent(i: int, j: int) -> bool:
+        items_i, items_j = items[i], items[j]
+
+        if items_i is None or items_j is None:
+            return True
+
+        if plan.plan[i].name == plan.plan[j].name and plan.plan[i].name not in basic_operations:
+            return True
+
+        return not items_i.isdisjoint(items_j)
+
+    predecessors = [{i for i in range(j) if are_dependent(i, j)} for j in range(len(keys))]
+    placed: Set[int] = set()
+    canonical_form: List[str] = list()
+
+    while len(placed) < len(keys):
+        next_step = min(
+            (j for j in range(len(keys)) if j not in placed and predecessors[j] <= placed),
+            key=lambda j: (keys[j], j),
+        )
+
+        placed.add(next_step)
+        canonical_form.append(keys[next_step])
+
+    return tuple(canonical_form)
+
+
+def deduplicate_plans(list_of_plans: List[ClassicalPlan], ignore_map_sources: bool = True) -> List[ClassicalPlan]:
+    # Equivalent plans are collapsed into the cheapest one among them, which takes the place
+    # of the first one and counts how many plans it stands for.
+    signatures: Dict[Tuple[str, ...], int] = dict()
+    deduplicated_plans: List[ClassicalPlan] = list()
+
+    for plan in list_of_plans:
+        signature = get_canonical_form(plan, ignore_map_sources)
+        index = signatures.get(signature)
+
+        if index is None:
+            signatures[signature] = len(deduplicated_plans)
+            deduplicated_plans.append(plan)
+            continue
+
+        representative = deduplicated_plans[index]
+        multiplicity = representative.multiplicity + plan.multiplicity
+
+        if plan.cost < representative.cost:
+            representative = plan
+
+        deduplicated_plans[index] = representative.model_copy(update={"multiplicity": multiplicity})
+
+    return deduplicated_plans
@@ -2,7 +2,7 @@ from nl2flow.printers.driver import Printer
 from nl2flow.plan.schemas import Action, ClassicalPlan as Plan
 from nl2flow.compile.schemas import Step, Constraint
 from nl2flow.compile.options import BasicOperations
-from typing import List, Union, Tuple, Any
+from typing import List, Optional, Union, Tuple, Any
 from re import match
 from warnings import warn
 
@@ -72,6 +72,14 @@ class CodeLikePrint(Printer):
 
         return "\n".join(pretty)
 
+    @classmethod
+    def parse_outputs(cls, token: str, **kwargs: Any) -> Optional[List[str]]:
+        if not kwargs.get("show_output", True):
+            return None
+
+        match_object = match(pattern=r"\s*(\[[0-9]+]\s+)?(?P<outputs>[^=()]*) = ", string=token)
+        return [] if match_object is None else [o.strip() for o in match_object.group("outputs").split(",")]
+
     @classmethod
     def parse_token(cls, token: str, **kwargs: Any) -> Union[Step, Constraint, None]:
         try:
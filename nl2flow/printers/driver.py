@@ -1,7 +1,7 @@
 from nl2flow.plan.schemas import PlannerResponse, ClassicalPlan as Plan
 from nl2flow.compile.schemas import ClassicalPlanReference, Step, Constraint
 from abc import ABC, abstractmethod
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 
 
 class Printer(ABC):
@@ -10,6 +10,12 @@ class Printer(ABC):
     def parse_token(cls, token: str, **kwargs: Any) -> Union[Step, Constraint, None]:
         pass
 
+    @classmethod
+    def parse_outputs(cls, token: str, **kwargs: Any) -> Optional[List[str]]:
+        # Printers that do not tell the outputs of a step apart return None, and
+        # reference plans are then diffed without outputs.
+        return None
+
     @classmethod
     def parse_tokens(cls, list_of_tokens: List[str], **kwargs: Any) -> ClassicalPlanReference:
         parsed_plan = ClassicalPlanReference()
@@ -1,3 +1,4 @@
+from typing import List
 from nl2flow.compile.flow import Flow
 from nl2flow.compile.operators import ClassicalOperator as Operator
 from nl2flow.compile.schemas import SignatureItem, Parameter, Constraint
@@ -6,6 +7,8 @@ from nl2flow.services.schemas.sketch_schemas import Catalog, Signature
 
 
 def basic_catalog_compilation(flow: Flow, catalog: Catalog) -> None:
+    new_agents: List[Operator] = list()
+
     for agent in catalog.agents:
         new_agent = Operator(agent.id)
         new_agent.max_try = 1
@@ -33,4 +36,6 @@ def basic_catalog_compilation(flow: Flow, catalog: Catalog) -> None:
                 else:
                     new_agent.add_output(new_signature_item)
 
-        flow.add(new_agent)
+        new_agents.append(new_agent)
+
+    flow.add_many(new_agents)
@@ -0,0 +1,134 @@
+from nl2flow.compile.basic_compilations.compile_reference import compile_reference
+from nl2flow.compile.basic_compilations.utils import add_memory_item_to_constant_map
+from nl2flow.compile.compilations import ClassicPDDL
+from nl2flow.compile.options import MemoryState
+from nl2flow.compile.schemas import GoalItems, GoalItem, MemoryItem
+from nl2flow.debug.debug import BasicDebugger, DebugSession
+from nl2flow.debug.schemas import Report, SolutionQuality
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from copy import deepcopy
+from typing import Any, List
+
+import asyncio
+import pytest
+import re
+
+
+class TestDebugSession(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(
+            [
+                GoalItems(goals=GoalItem(goal_name="Fix Errors")),
+                MemoryItem(item_id="database link", item_state=MemoryState.KNOWN),
+            ]
+        )
+
+        self.session = DebugSession(self.flow)
+        self.candidates = [
+            ["list of errors = Find Errors(database link)", "Fix Errors(list of errors)"],
+            ["list of errors = Find Errors(database link)"],
+            ["ask(list of errors)", "Fix Errors(list of errors)"],
+            ["Fix Errors(list of errors)"],
+        ]
+
+    def test_same_reports(self) -> None:
+        for debug in SolutionQuality:
+            reports = self.session.debug_many(self.candidates, debug)
+            assert len(reports) == len(self.candidates)
+
+            for candidate, report in zip(self.candidates, reports):
+                reference_report = BasicDebugger(deepcopy(self.flow)).debug(candidate, debug, repair=True)
+
+                assert report.determination == reference_report.determination
+                assert report.reference == reference_report.reference
+
+        assert self.flow.flow_definition.reference is None
+
+    def test_same_repairs(self) -> None:
+        for debug in SolutionQuality:
+            reports = self.session.debug_many(self.candidates, debug, repair=True)
+            assert len(reports) == len(self.candidates)
+
+            for candidate, report in zip(self.candidates, reports):
+                reference_report = BasicDebugger(deepcopy(self.flow)).debug(candidate, debug, repair=True)
+
+                assert report.determination == reference_report.determination
+                assert report.plan_diff_str == reference_report.plan_diff_str
+                assert report.reference == reference_report.reference
+
+        assert self.flow.flow_definition.reference is None
+
+    def test_same_problem(self) -> None:
+        reference_plan = CodeLikePrint.parse_tokens(self.candidates[0])
+        debug_compilation = self.session.get_compilation(SolutionQuality.OPTIMAL)
+
+        pddl, _ = self.session.compile_reference_plan(debug_compilation, reference_plan, SolutionQuality.OPTIMAL)
+        assert "tokenize_1" in pddl.domain
+
+        self.flow.add(reference_plan)
+        reference_pddl, _ = self.flow.compile_to_pddl(debug_flag=SolutionQuality.OPTIMAL)
+        assert pddl.problem == reference_pddl.problem
+
+        # The reference plan is taken back out of the compilation once written.
+        pddl, _ = self.session.compile_reference_plan(
+            debug_compilation, reference_plan.model_copy(update={"plan": []}), SolutionQuality.OPTIMAL
+        )
+        assert "tokenize_1" not in pddl.domain
+
+    def test_compilation_unchanged(self, mocker: MockerFixture) -> None:
+        def compile_with_constant(compilation: Any, **kwargs: Any) -> None:
+            add_memory_item_to_constant_map(compilation, MemoryItem(item_id="new_item"))
+            compile_reference(compilation, **kwargs)
+
+        mocker.patch("nl2flow.compile.compilations.compile_reference", compile_with_constant)
+
+        reference_plan = CodeLikePrint.parse_tokens(self.candidates[0])
+        debug_compilation = self.session.get_compilation(SolutionQuality.OPTIMAL)
+        compilation = debug_compilation.compilation
+
+        constants = list(compilation.constant_map)
+        datum_constants = compilation.constant_index.datum_constants
+        predicates = [predicate.symbol for predicate in compilation.lang.predicates]
+        actions = list(compilation.problem.actions)
+        goal = compilation.problem.goal
+        num_transforms = len(compilation.cached_transforms)
+
+        for _ in range(2):
+            pddl, _ = self.session.compile_reference_plan(debug_compilation, reference_plan, SolutionQuality.OPTIMAL)
+            assert re.search(r"\(:constants[^)]* new_item ", pddl.domain)
+            assert "(token_1 )" in pddl.domain
+
+            assert list(compilation.constant_map) == constants
+            assert compilation.constant_index.datum_constants == datum_constants
+            assert [predicate.symbol for predicate in compilation.lang.predicates] == predicates
+            assert list(compilation.problem.actions) == actions
+            assert compilation.problem.goal is goal
+            assert len(compilation.cached_transforms) == num_transforms
+
+    def test_running_event_loop(self) -> None:
+        async def debug_in_loop() -> List[Report]:
+            with pytest.raises(RuntimeError, match="debug_many_async"):
+                self.session.debug(self.candidates[0], SolutionQuality.VALID)
+
+            return await self.session.debug_many_async(self.candidates, SolutionQuality.VALID)
+
+        reports = asyncio.run(debug_in_loop())
+        assert [report.determination for report in reports] == [
+            report.determination for report in self.session.debug_many(self.candidates, SolutionQuality.VALID)
+        ]
+
+    def test_compile_once(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(ClassicPDDL, "run_passes")
+
+        self.session.debug_many(self.candidates[:2], SolutionQuality.VALID)
+        self.session.debug(self.candidates[2], SolutionQuality.VALID)
+        assert spy.call_count == 1
+
+        self.flow.add(MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN))
+        report = self.session.debug(self.candidates[3], SolutionQuality.VALID)
+
+        assert spy.call_count == 2
+        assert report.determination, "Reference plan is valid once the list of errors is known"
@@ -101,7 +101,7 @@ class TestBasic:
         incomplete_unsound_tokens.remove("assert $a > 10")
         incomplete_unsound_tokens.remove("y = agent_b(a)")
 
-        report = self.debugger.debug(incomplete_unsound_tokens, debug=SolutionQuality.SOUND)
+        report = self.debugger.debug(incomplete_unsound_tokens, debug=SolutionQuality.SOUND, repair=True)
         diff_string = "\n".join(report.plan_diff_str)
         print(f"\n\n{diff_string}")
 
@@ -117,7 +117,7 @@ class TestBasic:
         assert len([d for d in report.plan_diff_obj if d.diff_type is not None]) == 0, "No edits"
         assert report.determination, "Reference plan is sound"
 
-        report = self.debugger.debug(incomplete_sound_tokens, debug=SolutionQuality.VALID)
+        report = self.debugger.debug(incomplete_sound_tokens, debug=SolutionQuality.VALID, repair=True)
 
         diff_string = "\n".join(report.plan_diff_str)
         print(f"\n\n{diff_string}")
@@ -215,7 +215,7 @@ class TestBasic:
             "agent_d(y)",
         ]
 
-        report = self.debugger.debug(messed_up_tokens, debug=SolutionQuality.SOUND)
+        report = self.debugger.debug(messed_up_tokens, debug=SolutionQuality.SOUND, repair=True)
 
         diff_string = "\n".join(report.plan_diff_str)
         print(f"\n\n{diff_string}")
@@ -0,0 +1,159 @@
+from nl2flow.compile.schemas import Constraint, Step
+from nl2flow.debug.debug import BasicDebugger
+from nl2flow.debug.diff import PlanItem, diff_plans, get_shortest_edit
+from nl2flow.debug.schemas import DiffAction
+from nl2flow.plan.schemas import Action, ClassicalPlan
+from nl2flow.printers.codelike import CodeLikePrint
+from difflib import Differ
+from typing import Any, List
+
+import pytest
+import random
+import time
+
+
+def get_edits(source: List[str], target: List[str]) -> List[str]:
+    edits = list()
+
+    for diff_type, index in get_shortest_edit(source, target):
+        if diff_type == DiffAction.ADD:
+            edits.append(f"+ {target[index]}")
+        else:
+            edits.append(f"{diff_type.value if diff_type else ' '} {source[index]}")
+
+    return edits
+
+
+def get_long_plan(length: int) -> ClassicalPlan:
+    return ClassicalPlan(
+        reference=[],
+        plan=[Action(name=f"agent_{i}", inputs=[f"item_{i}"], outputs=[f"item_{i + 1}"]) for i in range(length)],
+    )
+
+
+class CollapsedPrint(CodeLikePrint):
+    @classmethod
+    def pretty_print_plan(cls, plan: ClassicalPlan, **kwargs: Any) -> str:
+        return CodeLikePrint.pretty_print_plan(plan, **kwargs, collapse_maps=True)
+
+
+class TestPlanDiff:
+    def test_shortest_edit(self) -> None:
+        assert get_edits(list("abcabba"), list("cbabac")) == [
+            "- a",
+            "- b",
+            "  c",
+            "+ b",
+            "  a",
+            "  b",
+            "- b",
+            "  a",
+            "+ c",
+        ]
+
+        assert get_edits([], list("ab")) == ["+ a", "+ b"]
+        assert get_edits(list("ab"), []) == ["- a", "- b"]
+        assert get_edits([], []) == []
+
+    def test_no_more_edits_than_differ(self) -> None:
+        random.seed(0)
+
+        for _ in range(100):
+            source = random.choices("abcd", k=random.randint(0, 10))
+            target = random.choices("abcd", k=random.randint(0, 10))
+
+            edits = get_edits(source, target)
+            differ_edits = [line for line in Differ().compare(source, target) if line[0] in "+-"]
+
+            assert len([e for e in edits if e[0] in "+-"]) <= len(differ_edits)
+            assert [e[2:] for e in edits if e[0] != "+"] == source
+            assert [e[2:] for e in edits if e[0] != "-"] == target
+
+    def test_map_aware(self) -> None:
+        plan: List[PlanItem] = [
+            Action(name="agent_a", outputs=["a_1"]),
+            Action(name="map", inputs=["a_1", "a"]),
+            Action(name="confirm", inputs=["a"]),
+            Constraint(constraint="$a > 10", truth_value=True),
+            Action(name="agent_b", inputs=["a"], outputs=["y"]),
+        ]
+
+        reference: List[PlanItem] = [
+            Step(name="agent_a"),
+            Step(name="confirm", parameters=["a_1"]),
+            Constraint(constraint="$a_1  > 10", truth_value=True),
+            Step(name="agent_b", parameters=["a_1"]),
+        ]
+
+        assert diff_plans(reference, plan) == [(None, 0), (DiffAction.ADD, 1), (None, 1), (None, 2), (None, 3)]
+
+        reference[2] = Constraint(constraint="$a_1 > 10", truth_value=False)
+        assert (DiffAction.DELETE, 2) in diff_plans(reference, plan)
+
+    def test_collapsed_maps(self) -> None:
+        plan = ClassicalPlan(
+            reference=[],
+            plan=[
+                Action(name="agent_a", outputs=["a_1"]),
+                Action(name="map", inputs=["a_1", "a"]),
+                Action(name="agent_b", inputs=["a"], outputs=["y"]),
+            ],
+        )
+
+        tokens = ["a_1 = agent_a()", "y = agent_b(a_1)"]
+
+        plan_diff = BasicDebugger.generate_plan_diff(CodeLikePrint(), plan, tokens, collapse_maps=True)
+        assert plan_diff == ["  a_1 = agent_a()", "  y = agent_b(a_1)"]
+
+        plan_diff = BasicDebugger.generate_plan_diff(CodeLikePrint(), plan, tokens)
+        assert plan_diff == ["  a_1 = agent_a()", "+ map(a_1, a)", "  y = agent_b(a_1)"]
+
+    def test_outputs(self) -> None:
+        plan = ClassicalPlan(
+            reference=[],
+            plan=[
+                Action(name="agent_a", outputs=["a"]),
+                Action(name="map", inputs=["a", "b"]),
+                Action(name="agent_b", inputs=["b"], outputs=["y"]),
+            ],
+        )
+
+        # The map prints nothing once collapsed, so each added step is printed on its own.
+        plan_diff = BasicDebugger.generate_plan_diff(
+            CollapsedPrint(), plan, ["agent_a()", "a = agent_b(a)"], show_output=True
+        )
+        assert plan_diff == ["- agent_a()", "- a = agent_b(a)", "+ a = agent_a()", "+ ", "+ y = agent_b(b)"]
+
+        plan_diff = BasicDebugger.generate_plan_diff(
+            CollapsedPrint(), plan, ["agent_a()", "agent_b(a)"], show_output=False
+        )
+        assert plan_diff == ["  agent_a()", "+ ", "  agent_b(a)"]
+
+    def test_diff_obj_from_lines(self) -> None:
+        plan = get_long_plan(3)
+        tokens = ["item_1 = agent_0(item_0)", "item_2 = agent_1(other_item)"]
+        plan_diff = BasicDebugger.get_plan_diff(CodeLikePrint(), plan, tokens)
+
+        with pytest.deprecated_call():
+            diff_obj = BasicDebugger.generate_plan_diff_obj(CodeLikePrint(), [diff_str for _, diff_str in plan_diff])
+
+        assert diff_obj == [diff_obj for diff_obj, _ in plan_diff]
+
+    @pytest.mark.parametrize("length", [100, 300, 1000])
+    def test_benchmark(self, length: int) -> None:
+        plan = get_long_plan(length)
+        tokens = CodeLikePrint.pretty_print_plan(plan, line_numbers=False).split("\n")
+
+        # Every 10th step calls another agent, and the last quarter of the steps is on other items.
+        tokens = [t.replace("agent_", "other_agent_") if i % 10 == 0 else t for i, t in enumerate(tokens)]
+        tokens = tokens[: 3 * length // 4] + [t.replace("item_", "other_item_") for t in tokens[3 * length // 4 :]]
+
+        start_time = time.perf_counter()
+        plan_diff = [diff_obj for diff_obj, _ in BasicDebugger.get_plan_diff(CodeLikePrint(), plan, tokens)]
+        diff_time = time.perf_counter() - start_time
+
+        num_changed = length // 4 + len([i for i in range(0, 3 * length // 4, 10)])
+        assert len([d for d in plan_diff if d.diff_type == DiffAction.DELETE]) == num_changed
+        assert len([d for d in plan_diff if d.diff_type == DiffAction.ADD]) == num_changed
+
+        print(f"\n{length} steps: {diff_time:.3f}s")
@@ -0,0 +1,101 @@
+from nl2flow.debug.debug import BasicDebugger, DebugSession
+from nl2flow.compile.options import HasDoneState
+from nl2flow.debug.schemas import SolutionQuality
+from nl2flow.debug.simulation import ReferenceSimulator
+from nl2flow.plan.planners.kstar import Kstar
+from tests.debugger import test_debugger_from_flow
+from pytest_mock import MockerFixture
+from copy import deepcopy
+
+
+class TestReferenceSimulation:
+    def setup_method(self) -> None:
+        basic_test = test_debugger_from_flow.TestBasic()
+        basic_test.setup_method()
+
+        self.flow = basic_test.flow
+        self.tokens = basic_test.tokens
+        self.session = DebugSession(self.flow, planner=Kstar())
+
+    def test_same_determinations(self) -> None:
+        candidates = [
+            self.tokens,
+            self.tokens[:-1],
+            ["ask(y)", "agent_d(y)"],
+            ["a_1 = agent_aa()", "map(a_1, a)", "agent_d(y)"],
+        ]
+
+        for debug in [SolutionQuality.SOUND, SolutionQuality.VALID]:
+            reports = self.session.debug_many(candidates, debug)
+
+            for candidate, report in zip(candidates, reports):
+                reference_report = BasicDebugger(deepcopy(self.flow)).debug(candidate, debug, repair=True)
+                assert report.determination == reference_report.determination
+
+    def test_failed_step(self) -> None:
+        tokens = [t for t in self.tokens if t not in ["assert $a > 10", "y = agent_b(a)"]]
+        report = self.session.debug(tokens, SolutionQuality.SOUND)
+
+        assert report.determination is False
+        assert report.failed_step == 3
+        assert report.unmet_preconditions == ["known(y,certain)"]
+
+        report = self.session.debug(["a_1 = agent_aa()"], SolutionQuality.SOUND)
+        assert report.determination is False
+        assert report.failed_step == 0
+
+    def test_bound_groundings(self) -> None:
+        debug_compilation = self.session.get_compilation(SolutionQuality.VALID)
+        compilation = debug_compilation.compilation
+
+        simulator = ReferenceSimulator(compilation, **self.flow.compile_options, debug_flag=SolutionQuality.VALID)
+        target = compilation.has_done(
+            compilation.constant_map["agent_d"], compilation.constant_map[HasDoneState.present.value]
+        )
+
+        # The item that agent_d runs on is bound from what is mapped to its input, and the
+        # retry levels from the connections of the operator, rather than from their sorts.
+        groundings = list(
+            simulator.get_groundings(
+                compilation.problem.actions["agent_d"], target, simulator.init, simulator.enabled_predicates
+            )
+        )
+
+        assert [[str(constant.symbol) for constant in grounding.values()] for grounding in groundings] == [
+            ["y", "try_level_0", "try_level_1"]
+        ]
+
+    def test_no_planner_calls(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(self.session.planner, "plan_async")
+
+        report = self.session.debug(self.tokens, SolutionQuality.VALID)
+        assert report.determination, "Reference plan is valid"
+        assert report.failed_step is None
+        assert spy.call_count == 0
+
+        report = self.session.debug(self.tokens, SolutionQuality.VALID, repair=True)
+        assert report.determination, "Reference plan is valid"
+        assert spy.call_count == 1
+
+        self.session.debug(self.tokens, SolutionQuality.OPTIMAL)
+        assert spy.call_count == 2
+
+    def test_basic_debugger(self, mocker: MockerFixture) -> None:
+        debugger = BasicDebugger(deepcopy(self.flow))
+        spy = mocker.spy(debugger.flow, "plan_it")
+
+        tokens = [t for t in self.tokens if t not in ["assert $a > 10", "y = agent_b(a)"]]
+        report = debugger.debug(tokens, SolutionQuality.SOUND)
+
+        assert report.determination is False
+        assert report.failed_step == 3
+        assert spy.call_count == 0
+
+        report = debugger.debug(self.tokens, SolutionQuality.VALID)
+        assert report.determination, "Reference plan is valid"
+        assert spy.call_count == 0
+
+        report = debugger.debug(tokens, SolutionQuality.SOUND, repair=True)
+        assert report.determination is False
+        assert report.plan_diff_str
+        assert spy.call_count == 1
@@ -0,0 +1,94 @@
+from nl2flow.compile.options import MemoryState, SlotOptions
+from nl2flow.compile.schemas import GoalItems, GoalItem, MemoryItem, Step
+from nl2flow.plan.schemas import ClassicalPlan, PlanningBudget
+from nl2flow.plan.simulation import PlanSimulator, get_plan_suffix
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+
+import pytest
+
+
+class TestHistoryRepair(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(
+            [
+                GoalItems(goals=GoalItem(goal_name="Fix Errors")),
+                MemoryItem(item_id="database link", item_state=MemoryState.KNOWN),
+            ]
+        )
+
+        self.previous: ClassicalPlan = self.get_plan().list_of_plans[0]
+        self.executed_prefix = [Step(name="Find Errors", parameters=["database link"])]
+
+    def test_simulate_plan(self) -> None:
+        simulator = PlanSimulator(self.flow.compilation)
+
+        result = simulator.simulate(self.previous.reference)
+        assert result.is_valid
+        assert result.cost == self.previous.cost
+
+        result = simulator.simulate(get_plan_suffix(self.previous, 1))
+        assert not result.is_executable
+        assert result.failed_step == 1
+
+        assert simulator.get_cost(self.previous.reference) == self.previous.cost
+        assert simulator.get_cost(["unknown_action"]) is None
+
+    def test_valid_suffix(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(self.planner, "plan")
+
+        self.flow.add(MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN))
+        planner_response = self.flow.replan(self.planner, self.previous, self.executed_prefix)
+
+        assert spy.call_count == 0
+        assert len(planner_response.list_of_plans) == 1
+        assert planner_response.list_of_plans[0].plan == self.previous.plan[1:]
+
+    def test_repair(self, mocker: MockerFixture) -> None:
+        suffix_cost = PlanSimulator(self.flow.compilation).get_cost(get_plan_suffix(self.previous, 1))
+        assert suffix_cost is not None and suffix_cost < self.previous.cost
+
+        spy = mocker.spy(self.planner, "plan")
+        planner_response = self.flow.replan(self.planner, self.previous, self.executed_prefix)
+
+        # The bound leaves out what the executed steps cost.
+        assert planner_response.list_of_plans, "There should be plans."
+        assert spy.call_args_list[0].kwargs["budget"] == PlanningBudget(cost_bound=int(suffix_cost) + 1)
+
+        # Asking for the list of errors costs more than finding them did, so there is
+        # no repair within the cost of the previous plan.
+        assert spy.call_count == 2
+        assert spy.call_args_list[1].kwargs["budget"] == PlanningBudget()
+
+    def test_grouped_plans(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(self.planner, "plan")
+
+        self.flow.slot_options.add(SlotOptions.group_slots)
+        self.flow.add(MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN))
+        self.flow.replan(self.planner, self.previous, self.executed_prefix)
+
+        assert spy.call_count == 1
+
+    def test_history_is_unchanged(self) -> None:
+        self.flow.add(MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN))
+        history = list(self.flow.flow_definition.history)
+
+        for _ in range(2):
+            planner_response = self.flow.replan(self.planner, self.previous, self.executed_prefix)
+
+            assert planner_response.list_of_plans[0].plan == self.previous.plan[1:]
+            assert self.flow.flow_definition.history == history
+
+    def test_invalid_prefix(self) -> None:
+        history = list(self.flow.flow_definition.history)
+
+        for executed_prefix in [
+            [Step(name="Find Errors", parameters=["list of errors"])],
+            [Step(name="Fix Errors", parameters=["list of errors"])],
+            self.executed_prefix * (len(self.previous.plan) + 1),
+        ]:
+            with pytest.raises(ValueError):
+                self.flow.replan(self.planner, self.previous, executed_prefix)
+
+        assert self.flow.flow_definition.history == history
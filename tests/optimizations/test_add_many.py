@@ -0,0 +1,89 @@
+from nl2flow.compile.flow import Flow, FLOW_DEFINITION_FIELDS
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.options import MemoryState
+from nl2flow.compile.schemas import (
+    ClassicalPlanReference,
+    FlowDefinition,
+    GoalItems,
+    GoalItem,
+    MappingItem,
+    MemoryItem,
+    SignatureItem,
+    Step,
+    TypeItem,
+)
+from tests.testing import BaseTestAgents
+from pydantic import ValidationError
+from pytest_mock import MockerFixture
+from typing import Any, List
+
+import pytest
+
+
+def get_new_items() -> List[Any]:
+    new_items: List[Any] = list()
+
+    for index in range(10):
+        new_agent = Operator(f"Agent {index}")
+        new_agent.add_input(SignatureItem(parameters=[f"item {index}"]))
+        new_agent.add_output(SignatureItem(parameters=[f"item {index + 1}"]))
+        new_items.append(new_agent)
+
+    new_items.extend(
+        [
+            TypeItem(name="Contact", children={"Email", "Phone"}),
+            MemoryItem(item_id="item 0", item_state=MemoryState.KNOWN),
+            MemoryItem(item_id="my email", item_type="Email"),
+            MappingItem(source_name="my email", target_name="item 0"),
+            GoalItems(goals=GoalItem(goal_name="item 10")),
+            Step(name="Agent 0", parameters=["item 0"]),
+            ClassicalPlanReference(plan=[Step(name="Agent 0", parameters=["item 0"])]),
+        ]
+    )
+
+    return new_items
+
+
+class TestAddMany(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+    def test_flow_definition_fields(self) -> None:
+        assert set(FLOW_DEFINITION_FIELDS.values()) == set(FlowDefinition.model_fields) - {
+            "name",
+            "starts_with",
+            "ends_with",
+        }
+
+    def test_same_as_add(self) -> None:
+        self.flow.add_many(get_new_items())
+
+        reference_flow = Flow(name=self.flow.flow_definition.name)
+        reference_flow.add(self.flow.flow_definition.operators[:4])
+        reference_flow.add(get_new_items())
+
+        assert self.flow.flow_definition.model_dump() == reference_flow.flow_definition.model_dump()
+        assert {t.name for t in self.flow.flow_definition.type_hierarchy} == {"Contact", "Email", "Phone"}
+
+    def test_validate_once(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(FlowDefinition, "get_list_of_object_names")
+
+        self.flow.add_many(get_new_items())
+        assert spy.call_count == 1
+        assert not self.flow.flow_definition.is_pending_validation
+
+    def test_defer_in_bulk_edit(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(FlowDefinition, "get_list_of_object_names")
+
+        with self.flow.bulk_edit():
+            self.flow.add_many(get_new_items())
+
+        assert spy.call_count == 0
+        assert self.flow.flow_definition.is_pending_validation
+
+    def test_invalid_items(self) -> None:
+        with pytest.raises(ValidationError, match="Mapping request with db unknown"):
+            self.flow.add_many([MappingItem(source_name="db", target_name="database link")])
+
+        with pytest.raises(TypeError):
+            self.flow.add_many([GoalItem(goal_name="Fix Errors")])
@@ -0,0 +1,114 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.compilations import ClassicPDDLProblem
+from nl2flow.compile.options import MemoryState, GoalType, SlotOptions
+from nl2flow.compile.schemas import (
+    GoalItem,
+    GoalItems,
+    SignatureItem,
+    Parameter,
+    Step,
+    SlotProperty,
+    Constraint,
+    MemoryItem,
+    MappingItem,
+)
+from nl2flow.plan.schemas import PlannerResponse
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from typing import Any, List, Tuple
+
+import pytest
+
+
+def get_plan_signatures(planner_response: PlannerResponse) -> List[Tuple[float, str]]:
+    return sorted((plan.cost, CodeLikePrint.pretty_print_plan(plan)) for plan in planner_response.list_of_plans)
+
+
+class TestCachedDomain(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        email_agent = Operator("Email Agent")
+        email_agent.add_input(
+            SignatureItem(
+                parameters=[
+                    Parameter(item_id="from", item_type="Email ID"),
+                    Parameter(item_id="to", item_type="Email ID"),
+                    "body",
+                ],
+                constraints=[Constraint(constraint="$body > 10")],
+            )
+        )
+
+        self.flow.add([email_agent, SlotProperty(slot_name="from", slot_desirability=0.0)])
+        self.domain = self.flow.compile_domain()
+
+    def check_same_plans(self, new_items: List[Any]) -> None:
+        self.flow.add(new_items)
+
+        full_response = self.flow.plan_it(self.planner)
+        split_response = self.flow.plan_it(self.planner, domain=self.domain)
+
+        assert isinstance(self.flow.compilation, ClassicPDDLProblem)
+        assert split_response.list_of_plans, "There should be plans."
+        assert get_plan_signatures(full_response) == get_plan_signatures(split_response)
+
+    def test_domain_is_reused(self) -> None:
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+
+        pddl, _ = self.flow.compile_to_pddl(domain=self.domain)
+        assert pddl.domain is self.domain.domain
+        assert self.flow.compile_domain().key == self.domain.key
+
+        self.flow.add(MemoryItem(item_id="Email", item_state=MemoryState.KNOWN))
+        new_pddl, _ = self.flow.compile_to_pddl(domain=self.domain)
+        assert new_pddl.domain is self.domain.domain
+        assert new_pddl.problem != pddl.problem
+        assert self.flow.compile_domain().key == self.domain.key
+
+    def test_goals_and_memory(self) -> None:
+        self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name="Email Agent")),
+                MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN),
+                MemoryItem(item_id="item14311", item_type="Email ID", item_state=MemoryState.KNOWN),
+            ]
+        )
+
+    def test_history_and_mappings(self) -> None:
+        self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name="Email Agent")),
+                MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN),
+                MappingItem(source_name="item12321", target_name="from", probability=0.0),
+                Step(name="User Info"),
+            ]
+        )
+
+    def test_object_and_constraint_goals(self) -> None:
+        self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name="Credit Score", goal_type=GoalType.OBJECT_KNOWN)),
+                GoalItems(goals=GoalItem(goal_name=Constraint(constraint="$body > 10"), goal_type=GoalType.CONSTRAINT)),
+                Constraint(constraint="$body > 10", truth_value=False),
+            ]
+        )
+
+    def test_fall_back_on_domain_conflict(self) -> None:
+        self.flow.add(
+            [
+                GoalItems(goals=GoalItem(goal_name="Credit Score API")),
+                MemoryItem(item_id="x", item_type="New Type"),
+            ]
+        )
+
+        with pytest.warns(RuntimeWarning):
+            pddl, _ = self.flow.compile_to_pddl(domain=self.domain)
+
+        assert pddl.domain != self.domain.domain
+
+    def test_options_mismatch(self) -> None:
+        self.flow.slot_options.add(SlotOptions.last_resort)
+
+        with pytest.raises(ValueError):
+            self.flow.compile_to_pddl(domain=self.domain)
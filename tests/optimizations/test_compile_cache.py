@@ -0,0 +1,140 @@
+from nl2flow.compile.cache import CompileCache
+from nl2flow.compile.options import MappingOptions, SlotOptions
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.schemas import (
+    Constraint,
+    GoalItem,
+    GoalItems,
+    MemoryItem,
+    ClassicalPlanReference,
+    SignatureItem,
+    Step,
+)
+from nl2flow.debug.schemas import SolutionQuality
+from tests.testing import BaseTestAgents
+from pathlib import Path
+
+import pickle
+import re
+import subprocess
+import sys
+import time
+
+
+class TestCompileCache(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+        self.flow.compile_cache = CompileCache(max_size=2)
+
+    def test_hit_and_miss(self) -> None:
+        pddl, transforms = self.flow.compile_to_pddl()
+        cached_pddl, cached_transforms = self.flow.compile_to_pddl()
+
+        assert self.flow.compile_cache is not None
+        assert self.flow.compile_cache.stats.misses == 1
+        assert self.flow.compile_cache.stats.hits == 1
+        assert cached_pddl == pddl
+        assert list(cached_transforms) == list(transforms)
+
+        planner_response = self.flow.plan_it(self.planner)
+        assert planner_response.list_of_plans[0].plan[-1].name == "Credit Score API"
+
+    def test_key_covers_definition_and_options(self) -> None:
+        self.flow.add(ClassicalPlanReference(plan=[Step(name="Credit Score API")]))
+        self.flow.compile_to_pddl()
+        self.flow.compile_to_pddl(debug_flag=SolutionQuality.VALID)
+
+        self.flow.slot_options = {SlotOptions.last_resort, SlotOptions.relaxed}
+        self.flow.compile_to_pddl()
+
+        self.flow.mapping_options = {MappingOptions.immediate}
+        self.flow.compile_to_pddl()
+
+        self.flow.add(MemoryItem(item_id="AccountID"))
+        self.flow.compile_to_pddl()
+
+        assert self.flow.compile_cache is not None
+        assert self.flow.compile_cache.stats.misses == 5
+        assert self.flow.compile_cache.stats.hits == 0
+
+    def test_size_eviction(self) -> None:
+        for lookahead in [1, 2, 3, 1]:
+            self.flow.lookahead = lookahead
+            self.flow.compile_to_pddl()
+
+        assert self.flow.compile_cache is not None
+        assert self.flow.compile_cache.stats.evictions == 2
+        assert self.flow.compile_cache.stats.size == 2
+        assert self.flow.compile_cache.stats.hits == 0
+
+    def test_age_eviction(self) -> None:
+        self.flow.compile_cache = CompileCache(max_age=0.05)
+        self.flow.compile_to_pddl()
+        time.sleep(0.1)
+        self.flow.compile_to_pddl()
+
+        assert self.flow.compile_cache.stats.evictions == 1
+        assert self.flow.compile_cache.stats.misses == 2
+
+    def test_disk_tier(self, tmp_path: Path) -> None:
+        self.flow.compile_cache = CompileCache(cache_directory=str(tmp_path), max_disk_size=1)
+        pddl, transforms = self.flow.compile_to_pddl()
+
+        self.flow.compile_cache = CompileCache(cache_directory=str(tmp_path), max_disk_size=1)
+        cached_pddl, cached_transforms = self.flow.compile_to_pddl()
+
+        assert self.flow.compile_cache.stats.disk_hits == 1
+        assert cached_pddl == pddl
+        assert list(cached_transforms) == list(transforms)
+
+        self.flow.lookahead = 2
+        self.flow.compile_to_pddl()
+        assert len(list(tmp_path.glob("*.json"))) == 1
+
+    def test_compilation_after_hit(self) -> None:
+        self.flow.add(ClassicalPlanReference(plan=[Step(name="Credit Score API")]))
+        self.flow.compile_to_pddl(debug_flag=SolutionQuality.VALID)
+
+        self.flow.compile_to_pddl()
+        assert self.flow.get_compilation().ready_for_token is None
+
+        self.flow.compile_to_pddl(debug_flag=SolutionQuality.VALID)
+
+        assert self.flow.compile_cache is not None
+        assert self.flow.compile_cache.stats.hits == 1
+        assert self.flow.compilation.ready_for_token is None, "Compiled only when asked for"
+        assert self.flow.get_compilation().ready_for_token is not None
+
+    def test_disk_hit_from_other_process(self, tmp_path: Path) -> None:
+        checker = Operator("Checker")
+        checker.add_input(
+            SignatureItem(parameters=["AccountID"], constraints=[Constraint(constraint="$AccountID > 10")])
+        )
+        self.flow.add(checker)
+        pickled_flow = tmp_path / "flow.pickle"
+        pickled_flow.write_bytes(pickle.dumps(self.flow))
+
+        # Constraints are named after a hash of their text, which has to be the same in the other process.
+        script = (
+            "import pickle, sys; from nl2flow.compile.cache import CompileCache; "
+            "flow = pickle.loads(open(sys.argv[1], 'rb').read()); "
+            "flow.compile_cache = CompileCache(cache_directory=sys.argv[2]); flow.compile_to_pddl()"
+        )
+        subprocess.run([sys.executable, "-c", script, str(pickled_flow), str(tmp_path)], check=True)
+
+        self.flow.compile_cache = CompileCache(cache_directory=str(tmp_path))
+        cached_pddl, _ = self.flow.compile_to_pddl()
+        assert self.flow.compile_cache.stats.disk_hits == 1
+
+        assert "hash_" in cached_pddl.domain
+
+        for action_name in self.flow.get_compilation().problem.actions:
+            assert f"(:action {action_name}" in cached_pddl.domain
+
+        # The PDDL writer lists sets of atoms in an order that changes between processes.
+        self.flow.compile_cache = None
+        pddl, _ = self.flow.compile_to_pddl()
+        assert sorted(re.findall(r"[^\s()]+", pddl.domain)) == sorted(re.findall(r"[^\s()]+", cached_pddl.domain))
+        assert sorted(re.findall(r"[^\s()]+", pddl.problem)) == sorted(re.findall(r"[^\s()]+", cached_pddl.problem))
@@ -0,0 +1,57 @@
+from nl2flow.compile.compilations import ClassicPDDLProblem
+from nl2flow.compile.options import MemoryState
+from nl2flow.compile.profiling import CompileProfiler
+from nl2flow.compile.schemas import GoalItems, GoalItem, MemoryItem
+from tests.testing import BaseTestAgents
+from pathlib import Path
+
+import json
+
+
+class TestCompileProfiling(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Fix Errors")))
+
+    def test_no_profiler(self) -> None:
+        self.flow.compile_to_pddl()
+
+        assert self.flow.compilation.profiler is None
+        assert self.flow.compilation.pass_profiles == []
+
+    def test_pass_profiles(self, tmp_path: Path) -> None:
+        profiler = CompileProfiler()
+        self.flow.compile_profiler = profiler
+        self.flow.compile_to_pddl()
+
+        compilation = self.flow.compilation
+        pass_names = [profile.name for profile in compilation.pass_profiles]
+
+        assert {"compile_operators", "compile_goals", "compile_history"} <= set(pass_names)
+        assert pass_names[-1] == "write_pddl"
+
+        assert profiler.profiles == compilation.pass_profiles
+        assert sum(profile.added.actions for profile in profiler.profiles) == len(compilation.problem.actions)
+        assert all(profile.wall_time >= 0 and profile.allocated is None for profile in profiler.profiles)
+        assert set(profiler.get_summary()) == set(pass_names)
+
+        trace_file = tmp_path / "trace.json"
+        profiler.write_trace(str(trace_file))
+
+        with open(trace_file) as trace_handle:
+            trace_events = json.load(trace_handle)["traceEvents"]
+
+        assert [event["name"] for event in trace_events] == pass_names
+
+    def test_problem_profiles(self) -> None:
+        domain = self.flow.compile_domain()
+        profiler = CompileProfiler(track_allocations=True)
+
+        self.flow.compile_profiler = profiler
+        self.flow.add(MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN))
+        self.flow.compile_to_pddl(domain=domain)
+
+        assert isinstance(self.flow.compilation, ClassicPDDLProblem)
+        assert self.flow.compilation.pass_profiles[-1].name == "print_problem"
+        assert self.flow.compilation.pass_profiles[-1].compilation == ClassicPDDLProblem.__name__
+        assert all(profile.allocated is not None for profile in profiler.profiles)
@@ -0,0 +1,59 @@
+from nl2flow.compile.options import MemoryState
+from nl2flow.compile.schemas import FlowDefinition, GoalItems, GoalItem, MemoryItem, MappingItem, Step
+from tests.testing import BaseTestAgents
+from pydantic import ValidationError
+from pytest_mock import MockerFixture
+
+import pytest
+
+
+class TestDeferredValidation(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Fix Errors")))
+
+    def test_single_pass(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(FlowDefinition, "get_list_of_object_names")
+
+        self.flow.add(MemoryItem(item_id="database link", item_state=MemoryState.KNOWN))
+        assert spy.call_count == 1
+
+    def test_bulk_edit(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(FlowDefinition, "get_list_of_object_names")
+
+        with self.flow.bulk_edit():
+            # The mapping refers to an item that is only added after it.
+            self.flow.add(MappingItem(source_name="db", target_name="database link"))
+            self.flow.add(MemoryItem(item_id="db", item_state=MemoryState.KNOWN))
+            self.flow.add(Step(name="User Info"))
+
+        assert spy.call_count == 0
+        assert self.flow.flow_definition.is_pending_validation
+
+        for _ in range(2):
+            self.flow.flow_definition.validate_pending()
+            assert spy.call_count == 1
+            assert not self.flow.flow_definition.is_pending_validation
+
+        planner_response = self.get_plan()
+        assert planner_response.list_of_plans, "There should be plans."
+
+    def test_invalid_bulk_edit(self) -> None:
+        with self.flow.bulk_edit():
+            self.flow.add(MappingItem(source_name="db", target_name="database link"))
+
+        with pytest.raises(ValidationError, match="Mapping request with db unknown"):
+            self.flow.compile_to_pddl()
+
+        with pytest.raises(ValidationError, match="Mapping request with db unknown"):
+            self.flow.add(MemoryItem(item_id="database link", item_state=MemoryState.KNOWN))
+
+    def test_nested_bulk_edit(self) -> None:
+        with self.flow.bulk_edit():
+            with self.flow.bulk_edit():
+                self.flow.add(MemoryItem(item_id="Object Name"))
+
+            self.flow.add(MemoryItem(item_id="object name"))
+
+        with pytest.raises(ValidationError, match="Conflicting names for object_name"):
+            self.flow.compile_to_pddl()
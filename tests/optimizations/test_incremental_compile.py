@@ -0,0 +1,155 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.compilations import ClassicPDDL, ClassicPDDLProblem
+from nl2flow.compile.incremental import diff_pddl
+from nl2flow.compile.options import MemoryState, GoalType, NL2FlowOptions
+from nl2flow.compile.schemas import (
+    GoalItem,
+    GoalItems,
+    SignatureItem,
+    Parameter,
+    Step,
+    SlotProperty,
+    Constraint,
+    MemoryItem,
+    MappingItem,
+    PDDL,
+)
+from nl2flow.plan.schemas import PlannerResponse
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from typing import List, Tuple
+
+import pytest
+
+
+def get_plan_signatures(planner_response: PlannerResponse) -> List[Tuple[float, str]]:
+    return sorted((plan.cost, CodeLikePrint.pretty_print_plan(plan)) for plan in planner_response.list_of_plans)
+
+
+class TestIncrementalCompile(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        email_agent = Operator("Email Agent")
+        email_agent.add_input(
+            SignatureItem(
+                parameters=[
+                    Parameter(item_id="from", item_type="Email ID"),
+                    Parameter(item_id="to", item_type="Email ID"),
+                    "body",
+                ],
+                constraints=[Constraint(constraint="$body > 10")],
+            )
+        )
+
+        self.flow.add([email_agent, GoalItems(goals=GoalItem(goal_name="Email Agent"))])
+        self.flow.optimization_options = self.flow.optimization_options | {NL2FlowOptions.incremental_compile}
+        self.flow.check_incremental = True
+
+    def test_request_sections(self) -> None:
+        pddl, _ = self.flow.compile_to_pddl()
+        assert isinstance(self.flow.compilation, ClassicPDDLProblem)
+        assert not self.flow.dirty_sections
+
+        new_items = [
+            (MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN), "memory_items"),
+            (MappingItem(source_name="item12321", target_name="from", probability=0.0), "list_of_mappings"),
+            (Step(name="User Info"), "history"),
+            (GoalItems(goals=GoalItem(goal_name="Credit Score", goal_type=GoalType.OBJECT_KNOWN)), "goal_items"),
+            (Constraint(constraint="$body > 10", truth_value=False), "constraints"),
+        ]
+
+        for new_item, section in new_items:
+            self.flow.add(new_item)
+            assert self.flow.dirty_sections == {section}
+
+            new_pddl, _ = self.flow.compile_to_pddl()
+            assert new_pddl.domain is pddl.domain
+            assert new_pddl.problem != pddl.problem
+
+    def test_catalog_sections(self) -> None:
+        pddl, _ = self.flow.compile_to_pddl()
+
+        self.flow.add(SlotProperty(slot_name="from", slot_desirability=0.0))
+        assert self.flow.dirty_sections == {"slot_properties"}
+
+        new_pddl, _ = self.flow.compile_to_pddl()
+        assert new_pddl.domain is not pddl.domain
+        assert "(not_slotfillable from)" in new_pddl.problem
+
+        self.flow.add(Operator("New Agent"))
+        assert self.flow.dirty_sections == {"operators"}
+
+        new_pddl, _ = self.flow.compile_to_pddl()
+        assert "new_agent" in new_pddl.domain
+
+    def test_same_plans(self) -> None:
+        self.flow.add(MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN))
+        self.flow.compile_to_pddl()
+
+        self.flow.add(MappingItem(source_name="item12321", target_name="from", probability=0.0))
+        incremental_response = self.flow.plan_it(self.planner)
+
+        self.flow.optimization_options = self.flow.optimization_options - {NL2FlowOptions.incremental_compile}
+        full_response = self.flow.plan_it(self.planner)
+
+        assert incremental_response.list_of_plans, "There should be plans."
+        assert get_plan_signatures(incremental_response) == get_plan_signatures(full_response)
+
+    def test_fall_back_on_domain_conflict(self) -> None:
+        self.flow.add(MemoryItem(item_id="x", item_type="New Type"))
+        self.flow.compile_to_pddl()
+
+        assert isinstance(self.flow.compilation, ClassicPDDL)
+
+    def test_check_incremental(self, mocker: MockerFixture) -> None:
+        self.flow.add(MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN))
+        print_problem = ClassicPDDLProblem.print_problem
+
+        mocker.patch.object(
+            ClassicPDDLProblem,
+            "print_problem",
+            lambda compilation: print_problem(compilation).replace("(known item12321 certain)", ""),
+        )
+
+        with pytest.raises(RuntimeError, match="init - \\(known item12321 certain\\)"):
+            self.flow.compile_to_pddl()
+
+    def test_diff_action_parts(self) -> None:
+        self.flow.check_incremental = False
+        pddl, _ = self.flow.compile_to_pddl()
+
+        assert diff_pddl(pddl, pddl) == []
+
+        # The same atoms, but one of them moved from the precondition to the effect.
+        moved_atom = "(known email certain)"
+        action_start = pddl.domain.index("(:action credit_score_api")
+        action_end = pddl.domain.index("(:action", action_start + 1)
+        action = pddl.domain[action_start:action_end]
+        assert moved_atom in action.split(":effect")[0]
+
+        moved_action = action.replace(f" {moved_atom}", "", 1).replace(":effect (and", f":effect (and {moved_atom}", 1)
+        moved_pddl = pddl.model_copy(
+            update={"domain": pddl.domain[:action_start] + moved_action + pddl.domain[action_end:]}
+        )
+
+        differences = diff_pddl(moved_pddl, pddl)
+        assert "actions + credit_score_api :add" in "\n".join(differences)
+        assert "actions - credit_score_api :precondition" in "\n".join(differences)
+
+    def test_diff_unreachable_actions(self) -> None:
+        self.flow.check_incremental = False
+        pddl, _ = self.flow.compile_to_pddl()
+
+        def add_action(effect: str) -> PDDL:
+            action = f"(:action dead\n :parameters ()\n :precondition (and (never_holds))\n :effect (and {effect})\n)\n"
+            action_start = pddl.domain.index("(:action")
+            new_pddl: PDDL = pddl.model_copy(
+                update={"domain": pddl.domain[:action_start] + action + pddl.domain[action_start:]}
+            )
+            return new_pddl
+
+        # An action that can never be used only makes no difference while the other side does not have it.
+        assert diff_pddl(add_action("(done)"), pddl) == []
+        assert "actions + dead :add (other)" in diff_pddl(add_action("(other)"), add_action("(done)"))
@@ -0,0 +1,99 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.options import MemoryState, NL2FlowOptions
+from nl2flow.compile.schemas import GoalItems, GoalItem, SignatureItem, Parameter, MemoryItem, Constraint
+from nl2flow.plan.schemas import Action, ClassicalPlan
+from nl2flow.plan.utils import get_canonical_form, deduplicate_plans
+from tests.testing import BaseTestAgents
+from typing import List, Union
+
+
+def get_plan(steps: List[Union[Action, Constraint]], cost: float = 0.0) -> ClassicalPlan:
+    return ClassicalPlan(cost=cost, reference=[], plan=steps)
+
+
+class TestPlanDeduplication(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        self.ask_a = Action(name="ask", inputs=["a"])
+        self.ask_b = Action(name="ask", inputs=["b"])
+        self.agent_a = Action(name="Agent A", parameters=["a", "try_level_0", "try_level_1"], inputs=["a"])
+        self.agent_b = Action(name="Agent B", parameters=["b", "try_level_0", "try_level_1"], inputs=["b"])
+
+    def test_independent_steps(self) -> None:
+        assert get_canonical_form(get_plan([self.ask_a, self.ask_b, self.agent_a])) == get_canonical_form(
+            get_plan([self.ask_b, self.ask_a, self.agent_a])
+        )
+
+        assert get_canonical_form(get_plan([self.ask_a, self.agent_a, self.ask_b, self.agent_b])) == get_canonical_form(
+            get_plan([self.ask_b, self.agent_b, self.ask_a, self.agent_a])
+        )
+
+    def test_dependent_steps(self) -> None:
+        producer = Action(name="Agent C", outputs=["a"])
+        assert get_canonical_form(get_plan([producer, self.agent_a])) != get_canonical_form(
+            get_plan([self.agent_a, producer])
+        )
+
+        constraint = Constraint(constraint="$b > 10", truth_value=True)
+        assert get_canonical_form(get_plan([constraint, self.agent_a])) != get_canonical_form(
+            get_plan([self.agent_a, constraint])
+        )
+
+        retry = Action(name="Agent A", parameters=["b", "try_level_1", "try_level_2"], inputs=["a"])
+        assert get_canonical_form(get_plan([retry, self.agent_a])) != get_canonical_form(
+            get_plan([self.agent_a, retry])
+        )
+
+    def test_map_alternatives(self) -> None:
+        map_a = Action(name="map", inputs=["a", "c"])
+        map_b = Action(name="map", inputs=["b", "c"])
+
+        plans = [
+            get_plan([self.ask_a, map_a], cost=2.0),
+            get_plan([map_b], cost=1.0),
+            get_plan([map_a], cost=1.0),
+            get_plan([map_b], cost=1.0),
+        ]
+
+        assert len(deduplicate_plans(plans, ignore_map_sources=False)) == 3
+
+        deduplicated_plans = deduplicate_plans(plans)
+        assert [plan.multiplicity for plan in deduplicated_plans] == [1, 3]
+        assert deduplicated_plans[1].plan == [map_b]
+        assert plans[1].multiplicity == 1
+
+    def test_deduplicate_plans(self) -> None:
+        email_agent = Operator("Email Agent")
+        email_agent.add_input(
+            SignatureItem(
+                parameters=[
+                    Parameter(item_id="from", item_type="Email ID"),
+                    Parameter(item_id="to", item_type="Email ID"),
+                    "body",
+                ]
+            )
+        )
+
+        self.flow.add(
+            [
+                email_agent,
+                GoalItems(goals=[GoalItem(goal_name="Email Agent"), GoalItem(goal_name="Credit Score API")]),
+            ]
+            + [
+                MemoryItem(item_id=f"item{index}", item_type="Email ID", item_state=MemoryState.KNOWN)
+                for index in range(3)
+            ]
+        )
+
+        list_of_plans = self.flow.plan_it(self.planner).list_of_plans
+
+        self.flow.optimization_options = self.flow.optimization_options | {NL2FlowOptions.deduplicate_plans}
+        deduplicated_plans = self.flow.plan_it(self.planner).list_of_plans
+
+        assert len(deduplicated_plans) < len(list_of_plans)
+        assert sum(plan.multiplicity for plan in deduplicated_plans) == len(list_of_plans)
+
+        signatures = [get_canonical_form(plan, ignore_map_sources=True) for plan in deduplicated_plans]
+        assert len(set(signatures)) == len(signatures)
+        assert {get_canonical_form(plan, ignore_map_sources=True) for plan in list_of_plans} == set(signatures)
@@ -0,0 +1,111 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.options import MemoryState, GoalType, NL2FlowOptions
+from nl2flow.compile.pruning import prune_flow_definition
+from nl2flow.compile.schemas import (
+    GoalItem,
+    GoalItems,
+    SignatureItem,
+    Parameter,
+    Constraint,
+    MemoryItem,
+    MappingItem,
+    PartialOrder,
+)
+from nl2flow.plan.schemas import PlannerResponse
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from typing import Any, List, Tuple
+
+
+def get_plan_signatures(planner_response: PlannerResponse) -> List[Tuple[float, str]]:
+    return sorted((plan.cost, CodeLikePrint.pretty_print_plan(plan)) for plan in planner_response.list_of_plans)
+
+
+class TestRelevancePruning(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        email_agent = Operator("Email Agent")
+        email_agent.add_input(
+            SignatureItem(
+                parameters=[
+                    Parameter(item_id="from", item_type="Email ID"),
+                    Parameter(item_id="to", item_type="Email ID"),
+                    "body",
+                ],
+                constraints=[Constraint(constraint="$body > 10")],
+            )
+        )
+
+        directory_agent = Operator("Directory")
+        directory_agent.add_output(SignatureItem(parameters=[Parameter(item_id="manager", item_type="Email ID")]))
+
+        self.flow.add([email_agent, directory_agent])
+
+    def check_same_plans(self, new_items: List[Any]) -> List[str]:
+        self.flow.add(new_items)
+        full_response = self.flow.plan_it(self.planner)
+        full_report = self.flow.pruning_report
+        assert full_report is None
+
+        self.flow.optimization_options = self.flow.optimization_options | {NL2FlowOptions.relevance_pruning}
+        pruned_response = self.flow.plan_it(self.planner)
+
+        assert pruned_response.list_of_plans, "There should be plans."
+        assert get_plan_signatures(full_response) == get_plan_signatures(pruned_response)
+        assert self.flow.pruning_report is not None
+
+        pruned_operators: List[str] = self.flow.pruning_report.operators
+        return pruned_operators
+
+    def test_operator_goal(self) -> None:
+        pruned_operators = self.check_same_plans([GoalItems(goals=GoalItem(goal_name="Credit Score API"))])
+        assert set(pruned_operators) == {"User Info", "Find Errors", "Fix Errors", "Email Agent", "Directory"}
+
+    def test_producers_and_typed_mappings(self) -> None:
+        pruned_operators = self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name="Email Agent")),
+                MemoryItem(item_id="item12321", item_type="Email ID", item_state=MemoryState.KNOWN),
+                MemoryItem(item_id="account", item_state=MemoryState.KNOWN),
+                MappingItem(source_name="account", target_name="AccountID"),
+            ]
+        )
+
+        assert set(pruned_operators) == {"User Info", "Find Errors", "Fix Errors", "Credit Score API"}
+        assert self.flow.pruning_report is not None
+        assert self.flow.pruning_report.memory_items == ["account"]
+        assert self.flow.pruning_report.list_of_mappings == [
+            MappingItem(source_name="account", target_name="AccountID")
+        ]
+
+    def test_object_used_goal(self) -> None:
+        pruned_operators = self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name="list of errors", goal_type=GoalType.OBJECT_USED)),
+                MemoryItem(item_id="list of errors", item_state=MemoryState.KNOWN),
+            ]
+        )
+
+        assert "Fix Errors" not in pruned_operators
+
+    def test_constraint_goal(self) -> None:
+        pruned_operators = self.check_same_plans(
+            [
+                GoalItems(goals=GoalItem(goal_name=Constraint(constraint="$body > 10"), goal_type=GoalType.CONSTRAINT)),
+                Constraint(constraint="$body > 10", truth_value=False),
+            ]
+        )
+
+        assert "Email Agent" in pruned_operators
+
+    def test_partial_orders(self) -> None:
+        self.flow.add(PartialOrder(antecedent="Find Errors", consequent="Credit Score API"))
+        pruned_flow_definition, report = prune_flow_definition(
+            self.flow.flow_definition.model_copy(
+                update={"goal_items": [GoalItems(goals=GoalItem(goal_name="Credit Score API"))]}
+            )
+        )
+
+        assert {o.name for o in pruned_flow_definition.operators} == {"Credit Score API", "Find Errors"}
+        assert report.partial_orders == []
@@ -0,0 +1,87 @@
+from nl2flow.compile.flow import Flow
+from nl2flow.compile.compilations import CompiledDomain
+from nl2flow.compile.options import CompileOptions
+from nl2flow.compile.schemas import GoalItems, GoalItem
+from nl2flow.debug.schemas import SolutionQuality
+from nl2flow.plan.batch import plan_many, iter_plan_many
+from nl2flow.plan.schemas import PlanningBudget, PlannerResponse
+from nl2flow.plan.planners.kstar_pool import KstarPool
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from copy import deepcopy
+from typing import Any, Iterator, Optional
+
+import os
+import pytest
+
+
+class BrokenFlow(Flow):
+    def plan_it(
+        self,
+        planner: Any,
+        debug_flag: Optional[SolutionQuality] = None,
+        compilation_type: CompileOptions = CompileOptions.CLASSICAL,
+        domain: Optional[CompiledDomain] = None,
+        budget: Optional[PlanningBudget] = None,
+    ) -> PlannerResponse:
+        raise RuntimeError("Broken flow.")
+
+
+class TestPlanMany(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.goals = ["Fix Errors", "Credit Score API", "Find Errors", "User Info"]
+
+    def get_flows(self) -> Iterator[Flow]:
+        for goal in self.goals:
+            flow = deepcopy(self.flow)
+            flow.add(GoalItems(goals=GoalItem(goal_name=goal)))
+            yield flow
+
+    def test_plan_many(self) -> None:
+        flows = list(self.get_flows())
+        flows.insert(2, BrokenFlow(name="Broken Flow"))
+
+        results = plan_many(flows, self.planner, workers=2, chunk_size=2)
+        assert [result.index for result in results] == list(range(len(flows)))
+
+        assert results[2].is_error
+        assert results[2].planner_response is None
+        assert "Broken flow." in str(results[2].error)
+
+        for flow, result in zip(flows, results):
+            if not isinstance(flow, BrokenFlow):
+                expected_response = flow.plan_it(self.planner)
+
+                assert result.planner_response is not None
+                assert [CodeLikePrint.pretty_print_plan(p) for p in result.planner_response.list_of_plans] == [
+                    CodeLikePrint.pretty_print_plan(p) for p in expected_response.list_of_plans
+                ]
+
+    def test_more_flows_than_workers(self) -> None:
+        self.goals = self.goals * 3
+        flows = list(self.get_flows())
+        results = plan_many(flows, self.planner, workers=2, chunk_size=1)
+
+        assert not os.path.exists("output.sas")
+
+        for flow, result in zip(flows, results):
+            expected_response = flow.plan_it(self.planner)
+
+            assert result.planner_response is not None
+            assert [CodeLikePrint.pretty_print_plan(p) for p in result.planner_response.list_of_plans] == [
+                CodeLikePrint.pretty_print_plan(p) for p in expected_response.list_of_plans
+            ]
+
+    def test_budget_and_lazy_flows(self) -> None:
+        results = list(iter_plan_many(self.get_flows(), self.planner, workers=2, budget=PlanningBudget(num_plans=1)))
+
+        assert len(results) == len(self.goals)
+        for result in results:
+            assert result.planner_response is not None
+            assert len(result.planner_response.list_of_plans) == 1
+
+    def test_planner_not_picklable(self) -> None:
+        with KstarPool(pool_size=1) as pool:
+            with pytest.raises(TypeError):
+                plan_many(self.get_flows(), pool)
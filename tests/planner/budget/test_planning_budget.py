@@ -0,0 +1,79 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.schemas import GoalItems, GoalItem, SignatureItem
+from nl2flow.compile.options import GoalType
+from nl2flow.plan.schemas import PlanningBudget
+from nl2flow.plan.planners.kstar_pool import KstarPool
+from nl2flow.plan.planners import kstar_runner
+from nl2flow.plan.planners.caching import CachingPlanner
+from nl2flow.plan.cache import PlanCache
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from pathlib import Path
+
+import asyncio
+
+
+class TestPlanningBudget(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        for name in ["Agent A", "Agent B", "Agent C"]:
+            agent = Operator(name)
+            agent.add_output(SignatureItem(parameters=["Credit Score"]))
+            self.flow.add(agent)
+
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score", goal_type=GoalType.OBJECT_KNOWN)))
+
+    def test_number_of_plans(self) -> None:
+        planner_response = self.flow.plan_it(self.planner)
+        assert len(planner_response.list_of_plans) > 2
+
+        planner_response = self.flow.plan_it(self.planner, budget=PlanningBudget(num_plans=2))
+        assert len(planner_response.list_of_plans) == 2
+
+    def test_single_optimal_plan(self, mocker: MockerFixture) -> None:
+        spy = mocker.spy(kstar_runner, "plan_single_optimal")
+        optimal_cost = min(plan.cost for plan in self.flow.plan_it(self.planner).list_of_plans)
+        assert spy.call_count == 0
+
+        planner_response = self.flow.plan_it(self.planner, budget=PlanningBudget(num_plans=1))
+        assert spy.call_count == 1
+        assert len(planner_response.list_of_plans) == 1
+        assert planner_response.list_of_plans[0].cost == optimal_cost
+
+        planner_response = asyncio.run(self.flow.plan_it_async(self.planner, budget=PlanningBudget(num_plans=1)))
+        assert len(planner_response.list_of_plans) == 1
+        assert planner_response.list_of_plans[0].cost == optimal_cost
+
+    def test_budget_timeout(self, mocker: MockerFixture) -> None:
+        mocker.patch("nl2flow.plan.planners.kstar_pool.TIMEOUT_GRACE", 0)
+
+        with KstarPool(pool_size=1) as pool:
+            planner_response = self.flow.plan_it(pool, budget=PlanningBudget(num_plans=1, timeout=0))
+            assert planner_response.is_timeout is True
+
+            planner_response = self.flow.plan_it(pool, budget=PlanningBudget(num_plans=1))
+            assert len(planner_response.list_of_plans) == 1
+
+    def test_budget_in_cache_key(self, tmp_path: Path) -> None:
+        planner = CachingPlanner(self.planner, PlanCache(str(tmp_path / "plans.db")))
+        budget = PlanningBudget(num_plans=1)
+
+        assert len(self.flow.plan_it(planner, budget=budget).list_of_plans) == 1
+        assert len(self.flow.plan_it(planner).list_of_plans) > 1
+        assert len(self.flow.plan_it(planner, budget=budget).list_of_plans) == 1
+        assert planner.cache.stats.hits == 1
+
+    def test_cost_bound(self) -> None:
+        optimal_cost = int(min(plan.cost for plan in self.flow.plan_it(self.planner).list_of_plans))
+
+        planner_response = self.flow.plan_it(self.planner, budget=PlanningBudget(cost_bound=optimal_cost))
+        assert not planner_response.list_of_plans, "There should be no plans."
+
+        planner_response = self.flow.plan_it(self.planner, budget=PlanningBudget(cost_bound=optimal_cost + 1))
+        assert planner_response.list_of_plans, "There should be plans."
+        assert all(plan.cost == optimal_cost for plan in planner_response.list_of_plans)
+
+        with KstarPool(pool_size=1) as pool:
+            planner_response = self.flow.plan_it(pool, budget=PlanningBudget(cost_bound=optimal_cost))
+            assert not planner_response.list_of_plans, "There should be no plans."
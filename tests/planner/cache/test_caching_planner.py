@@ -0,0 +1,123 @@
+from nl2flow.plan.cache import PlanCache
+from nl2flow.plan.planners.caching import CachingPlanner
+from nl2flow.plan.planners.kstar import Kstar
+from nl2flow.plan.schemas import PlannerResponse, RawPlannerResult
+from nl2flow.compile.schemas import GoalItems, GoalItem, MemoryItem, SignatureItem, Constraint
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.options import MemoryState
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from pathlib import Path
+from typing import List
+
+import asyncio
+import os
+import pickle
+import pytest
+import subprocess
+import sys
+
+
+def get_plans(planner_response: PlannerResponse) -> List[str]:
+    assert planner_response.list_of_plans, "There should be plans."
+    return [CodeLikePrint.pretty_print_plan(plan) for plan in planner_response.list_of_plans]
+
+
+class TestCachingPlanner(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+
+    def test_hit_skips_planner(self, tmp_path: Path, mocker: MockerFixture) -> None:
+        kstar = Kstar()
+        spy = mocker.spy(kstar, "raw_plan")
+        planner = CachingPlanner(kstar, PlanCache(str(tmp_path / "plans.db")))
+
+        first_response = self.flow.plan_it(planner)
+        second_response = self.flow.plan_it(planner)
+
+        assert spy.call_count == 1
+        assert planner.cache.stats.hits == 1
+        assert planner.cache.stats.misses == 1
+        assert get_plans(first_response) == get_plans(second_response)
+
+    def test_shared_across_instances(self, tmp_path: Path) -> None:
+        self.flow.plan_it(CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db"))))
+
+        planner = CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db")))
+        self.flow.plan_it(planner)
+        assert planner.cache.stats.hits == 1
+
+    def test_shared_across_processes(self, tmp_path: Path) -> None:
+        checker = Operator("Checker")
+        checker.add_input(SignatureItem(parameters=["body"], constraints=[Constraint(constraint="$body > 10")]))
+        self.flow.add(checker)
+        pickled_flow = tmp_path / "flow.pickle"
+        pickled_flow.write_bytes(pickle.dumps(self.flow))
+
+        script = (
+            "import pickle, sys; from nl2flow.plan.cache import PlanCache; "
+            "from nl2flow.plan.planners.caching import CachingPlanner; from nl2flow.plan.planners.kstar import Kstar; "
+            "flow = pickle.loads(open(sys.argv[1], 'rb').read()); "
+            "flow.plan_it(CachingPlanner(Kstar(), PlanCache(sys.argv[2])))"
+        )
+        subprocess.run(
+            [sys.executable, "-c", script, str(pickled_flow), str(tmp_path / "plans.db")],
+            check=True,
+            env={**os.environ, "PYTHONHASHSEED": "1"},
+        )
+
+        planner = CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db")))
+        self.flow.plan_it(planner)
+        assert planner.cache.stats.hits == 1
+
+    def test_key_covers_problem_and_timeout(self, tmp_path: Path) -> None:
+        planner = CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db")))
+        self.flow.plan_it(planner)
+
+        planner.timeout = 100
+        self.flow.plan_it(planner)
+
+        self.flow.add(MemoryItem(item_id="AccountID", item_state=MemoryState.KNOWN))
+        self.flow.plan_it(planner)
+
+        assert planner.cache.stats.misses == 3
+        assert len(planner.cache) == 3
+
+    def test_lru_eviction(self, tmp_path: Path) -> None:
+        cache = PlanCache(str(tmp_path / "plans.db"), max_size=2)
+
+        for key in ["a", "b"]:
+            cache.put(key, RawPlannerResult())
+
+        assert cache.get("a") is not None
+        cache.put("c", RawPlannerResult())
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_errors_are_not_cached(self, tmp_path: Path) -> None:
+        planner = CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db")))
+        planner.store("error", RawPlannerResult(error_running_planner=True))
+        planner.store("timeout", RawPlannerResult(is_timeout=True))
+        planner.store("crash", RawPlannerResult(error_running_planner=False, planner_error="Segmentation fault"))
+
+        assert len(planner.cache) == 0
+
+        planner.store("no solution", RawPlannerResult(error_running_planner=False, is_no_solution=True))
+        assert planner.cache.get("no solution") is not None
+
+    def test_async(self, tmp_path: Path) -> None:
+        planner = CachingPlanner(Kstar(), PlanCache(str(tmp_path / "plans.db")))
+
+        first_response = asyncio.run(self.flow.plan_it_async(planner))
+        second_response = asyncio.run(self.flow.plan_it_async(planner))
+
+        assert planner.cache.stats.hits == 1
+        assert get_plans(first_response) == get_plans(second_response)
+
+    def test_needs_raw_plans(self) -> None:
+        with pytest.raises(TypeError):
+            CachingPlanner(object(), PlanCache(":memory:"))  # type: ignore
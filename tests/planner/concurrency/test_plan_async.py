@@ -0,0 +1,71 @@
+from nl2flow.plan.planners.kstar import Kstar
+from nl2flow.plan.schemas import PlannerResponse
+from nl2flow.compile.schemas import GoalItems, GoalItem
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from typing import Any, List
+
+import asyncio
+import pytest
+import sys
+
+CREATE_SUBPROCESS = asyncio.create_subprocess_exec
+
+
+def get_plans(planner_response: PlannerResponse) -> List[str]:
+    assert planner_response.list_of_plans, "There should be plans."
+    return sorted(CodeLikePrint.pretty_print_plan(plan) for plan in planner_response.list_of_plans)
+
+
+class TestPlanAsync(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+        self.processes: List[Any] = list()
+
+    def mock_planner_process(self, mocker: MockerFixture) -> None:
+        async def create_sleeping_process(*args: Any, **kwargs: Any) -> Any:
+            process = await CREATE_SUBPROCESS(sys.executable, "-c", "import time; time.sleep(60)", **kwargs)
+            self.processes.append(process)
+            return process
+
+        mocker.patch("nl2flow.plan.planners.kstar.asyncio.create_subprocess_exec", side_effect=create_sleeping_process)
+
+    def test_same_plans_as_plan_it(self) -> None:
+        planner_response = asyncio.run(self.flow.plan_it_async(self.planner))
+        assert get_plans(planner_response) == get_plans(self.flow.plan_it(self.planner))
+
+    def test_concurrent_requests(self) -> None:
+        async def plan_concurrently() -> List[PlannerResponse]:
+            return list(await asyncio.gather(*[self.flow.plan_it_async(self.planner) for _ in range(4)]))
+
+        results = [get_plans(planner_response) for planner_response in asyncio.run(plan_concurrently())]
+        assert all(result == results[0] for result in results)
+
+    def test_cancel_kills_planner(self, mocker: MockerFixture) -> None:
+        self.mock_planner_process(mocker)
+
+        async def plan_and_cancel() -> None:
+            task = asyncio.create_task(self.flow.plan_it_async(self.planner))
+
+            while not self.processes:
+                await asyncio.sleep(0.01)
+
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(plan_and_cancel())
+        assert self.processes[0].returncode is not None
+
+    def test_timeout_kills_planner(self, mocker: MockerFixture) -> None:
+        self.mock_planner_process(mocker)
+        mocker.patch("nl2flow.plan.planners.kstar.TIMEOUT_GRACE", 0.1)
+
+        planner = Kstar()
+        planner.timeout = 0
+
+        planner_response = asyncio.run(self.flow.plan_it_async(planner))
+        assert planner_response.is_timeout is True
+        assert self.processes[0].returncode is not None
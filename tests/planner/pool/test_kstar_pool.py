@@ -0,0 +1,97 @@
+from nl2flow.plan.planner import Planner
+from nl2flow.plan.planners.kstar_pool import KstarPool
+from nl2flow.compile.schemas import GoalItems, GoalItem
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from pytest_mock import MockerFixture
+
+import os
+import pytest
+import signal
+
+
+class TestKstarPool(BaseTestAgents):
+    @classmethod
+    def setup_class(cls) -> None:
+        cls.pool = KstarPool(pool_size=2, max_jobs_per_worker=3)
+
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+
+    @classmethod
+    def teardown_class(cls) -> None:
+        cls.pool.close()
+
+    def get_plans(self, planner: Planner) -> List[str]:
+        planner_response = self.flow.plan_it(planner)
+        assert planner_response.list_of_plans, "There should be plans."
+        return [CodeLikePrint.pretty_print_plan(plan) for plan in planner_response.list_of_plans]
+
+    def test_same_plans_as_kstar(self) -> None:
+        assert sorted(self.get_plans(self.pool)) == sorted(self.get_plans(self.planner))
+
+    def test_concurrent_calls(self) -> None:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: sorted(self.get_plans(self.pool)), range(4)))
+
+        assert all(result == results[0] for result in results)
+
+    def test_recycle_after_max_jobs(self) -> None:
+        with KstarPool(pool_size=1, max_jobs_per_worker=2) as pool:
+            first_workers = pool.worker_pids
+
+            self.get_plans(pool)
+            assert pool.worker_pids == first_workers
+
+            self.get_plans(pool)
+            assert pool.worker_pids != first_workers
+
+    def test_recycle_on_crash(self) -> None:
+        with KstarPool(pool_size=1) as pool:
+            worker_pid = pool.worker_pids[0]
+            assert worker_pid is not None
+
+            os.kill(worker_pid, signal.SIGKILL)
+
+            planner_response = self.flow.plan_it(pool)
+            assert planner_response.error_running_planner is True
+            assert pool.worker_pids != [worker_pid]
+
+            self.get_plans(pool)
+
+    def test_recycle_on_timeout(self, mocker: MockerFixture) -> None:
+        mocker.patch("nl2flow.plan.planners.kstar_pool.TIMEOUT_GRACE", 0)
+
+        with KstarPool(pool_size=1, timeout=0) as pool:
+            worker_pid = pool.worker_pids[0]
+
+            planner_response = self.flow.plan_it(pool)
+            assert planner_response.is_timeout is True
+            assert pool.worker_pids != [worker_pid]
+
+    def test_failed_replacement(self, mocker: MockerFixture) -> None:
+        with KstarPool(pool_size=1, max_jobs_per_worker=1) as pool:
+            start_worker = mocker.patch.object(pool, "_KstarPool__start_worker", side_effect=OSError("No worker."))
+
+            with pytest.raises(OSError):
+                self.flow.plan_it(pool)
+
+            mocker.stop(start_worker)
+
+            # The stopped worker went back to the pool, and is replaced on its next run.
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                planner_response = executor.submit(self.flow.plan_it, pool).result(timeout=60)
+                assert planner_response.error_running_planner is True
+
+                assert executor.submit(self.get_plans, pool).result(timeout=60)
+
+    def test_closed_pool(self) -> None:
+        pool = KstarPool(pool_size=1)
+        pool.close()
+
+        planner_response = self.flow.plan_it(pool)
+        assert planner_response.error_running_planner is True
+        assert pool.worker_pids == []
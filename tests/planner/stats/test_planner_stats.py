@@ -0,0 +1,61 @@
+from nl2flow.compile.schemas import GoalItems, GoalItem
+from nl2flow.plan.schemas import AggregatePlannerStats, PlannerStats, PlanningBudget
+from nl2flow.plan.planners.kstar import Kstar
+from tests.testing import BaseTestAgents
+
+
+class TestPlannerStats(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Fix Errors")))
+
+    def test_planner_stats(self) -> None:
+        planner_response = self.flow.plan_it(self.planner)
+        stats = planner_response.stats
+
+        assert stats is not None
+        assert stats.num_plans_found == len(planner_response.list_of_plans)
+        assert stats.num_operators and stats.num_facts and stats.num_variables
+        assert stats.expansions and stats.evaluations and stats.generated
+        assert stats.translator_time is not None and stats.search_time is not None
+        assert stats.translator_peak_memory and stats.search_peak_memory
+
+    def test_parse_stats(self) -> None:
+        assert Kstar.parse_stats(None) is None
+
+        stats = Kstar.parse_stats(
+            "\n".join(
+                [
+                    "Translator operators: 6",
+                    "Done! [0.020s CPU, 0.014s wall-clock]",
+                    "[t=0.003s, 10656 KB] step[1]::first_astar::Expanded=5 state(s).",
+                    "[t=0.003s, 10656 KB] Expanded 3 state(s).",
+                    "[t=0.003s, 10656 KB] Expanded until last jump: 0 state(s).",
+                    "[t=0.004s, 10656 KB] Search time: 6.01e-05s",
+                    "[t=0.005s, 10656 KB] Expanded 5 state(s).",
+                ]
+            )
+        )
+
+        assert stats == PlannerStats(num_operators=6, translator_time=0.014, search_time=6.01e-05, expansions=5)
+
+    def test_aggregate_stats(self) -> None:
+        responses = [self.flow.plan_it(self.planner, budget=PlanningBudget(num_plans=n)) for n in [1, 10]]
+        responses[0].stats = None
+
+        aggregate_stats = AggregatePlannerStats.of([response.stats for response in responses])
+        aggregate_stats.add(PlannerStats(expansions=0))
+
+        assert aggregate_stats.count == 3
+        assert aggregate_stats.counts["expansions"] == 2
+        assert aggregate_stats.counts["num_operators"] == 1
+
+        assert responses[1].stats is not None
+        assert aggregate_stats.total.expansions == responses[1].stats.expansions
+        assert aggregate_stats.maximum.num_plans_found == responses[1].stats.num_plans_found
+
+        total_expansions = aggregate_stats.total.expansions
+        assert total_expansions is not None
+        assert aggregate_stats.mean["expansions"] == total_expansions / 2
+
+        assert AggregatePlannerStats().total.expansions is None
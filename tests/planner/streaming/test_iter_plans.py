@@ -0,0 +1,93 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.schemas import GoalItems, GoalItem, SignatureItem
+from nl2flow.compile.options import GoalType
+from nl2flow.plan.schemas import PlannerResponse, PlanningBudget, ClassicalPlan
+from nl2flow.printers.codelike import CodeLikePrint
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+from typing import Any, List
+
+import pytest
+import subprocess
+
+POPEN = subprocess.Popen
+
+
+class TestIterPlans(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        for name in ["Agent A", "Agent B", "Agent C"]:
+            agent = Operator(name)
+            agent.add_output(SignatureItem(parameters=["Credit Score"]))
+            self.flow.add(agent)
+
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score", goal_type=GoalType.OBJECT_KNOWN)))
+
+    def test_same_plans_as_plan_it(self) -> None:
+        streamed_plans = list(self.flow.iter_plans(self.planner))
+        planner_response = self.flow.plan_it(self.planner)
+
+        assert len(streamed_plans) > 1
+        assert streamed_plans[0].cost == min(plan.cost for plan in planner_response.list_of_plans)
+        assert sorted(CodeLikePrint.pretty_print_plan(plan) for plan in streamed_plans) == sorted(
+            CodeLikePrint.pretty_print_plan(plan) for plan in planner_response.list_of_plans
+        )
+
+    def test_returns_all_plans(self) -> None:
+        plans = self.flow.iter_plans(self.planner)
+        streamed_plans: List[ClassicalPlan] = list()
+
+        while True:
+            try:
+                streamed_plans.append(next(plans))
+
+            except StopIteration as stop_iteration:
+                planner_response: PlannerResponse = stop_iteration.value
+                break
+
+        assert len(streamed_plans) > 1
+        assert planner_response.list_of_plans == streamed_plans
+        assert not planner_response.is_parse_error
+
+    def test_early_stop(self, mocker: MockerFixture) -> None:
+        processes = self.record_processes(mocker)
+
+        plans = self.flow.iter_plans(self.planner)
+        first_plan = next(plans)
+        plans.close()
+
+        assert first_plan.plan
+        assert len(processes) == 1, "The top-k search only starts once more plans are asked for"
+        assert all(process.returncode is not None for process in processes)
+
+    def test_shared_time_budget(self, mocker: MockerFixture) -> None:
+        processes = self.record_processes(mocker)
+        list(self.flow.iter_plans(self.planner, budget=PlanningBudget(timeout=60)))
+
+        stage_timeouts = [int(process.args[5]) for process in processes]
+        assert len(stage_timeouts) == 2
+        assert stage_timeouts[0] == 60
+        assert stage_timeouts[1] <= 60
+
+    def test_errors_are_reported(self) -> None:
+        plans = self.flow.iter_plans(self.planner, budget=PlanningBudget(timeout=0))
+
+        with pytest.raises(StopIteration) as stop_iteration:
+            next(plans)
+
+        planner_response: PlannerResponse = stop_iteration.value.value
+        assert planner_response.is_timeout
+        assert not planner_response.list_of_plans
+
+    @staticmethod
+    def record_processes(mocker: MockerFixture) -> List[Any]:
+        processes: List[Any] = list()
+
+        def record_process(*args: Any, **kwargs: Any) -> Any:
+            process = POPEN(*args, **kwargs)
+            processes.append(process)
+            return process
+
+        mocker.patch("nl2flow.plan.planners.kstar.subprocess.Popen", side_effect=record_process)
+        return processes
@@ -1,44 +1,54 @@
-import pytest
-from profiler.validators.validator_executer import (
-    execute_Val,
-    validate_pddl,
-    domain_file_name,
-    problem_file_name,
-    plan_file_name,
-)
+from profiler.validators.validator_executer import validate_pddl, validate_compiled_plan
+from nl2flow.compile.schemas import GoalItems, GoalItem
+from tests.testing import BaseTestAgents
+
+
+def read_pddl(file_name: str) -> str:
+    with open(f"./tests/profiler/data/pddl/{file_name}", "r") as f:
+        return f.read()
 
 
 class TestValidatorExecutor:
-    @pytest.mark.skip("file not found")
-    def test_execute_Val(self) -> None:
-        pddl_domain = ""
-        pddl_problem = ""
-        pddl_plan = ""
-
-        with open(f"./tests/profiler/data/pddl/{domain_file_name}", "r") as f:
-            pddl_domain = f.read()
-        with open(f"./tests/profiler/data/pddl/{problem_file_name}", "r") as f:
-            pddl_problem = f.read()
-        with open(f"./tests/profiler/data/pddl/{plan_file_name}", "r") as f:
-            pddl_plan = f.read()
-        return_code, err, out = execute_Val(pddl_domain, pddl_problem, pddl_plan)
-        assert out is not None
-        assert len(err) == 0
-        assert return_code is not None
-
-    @pytest.mark.skip("file not found")
+    def setup_method(self) -> None:
+        self.pddl_domain = read_pddl("domain.pddl")
+        self.pddl_problem = read_pddl("problem.pddl")
+        self.pddl_plan = read_pddl("plan.pddl")
+
     def test_validate_pddl(self) -> None:
-        pddl_domain = ""
-        pddl_problem = ""
-        pddl_plan = ""
-
-        with open(f"./tests/profiler/data/pddl/{domain_file_name}", "r") as f:
-            pddl_domain = f.read()
-        with open(f"./tests/profiler/data/pddl/{problem_file_name}", "r") as f:
-            pddl_problem = f.read()
-        with open(f"./tests/profiler/data/pddl/{plan_file_name}", "r") as f:
-            pddl_plan = f.read()
-        validator_output = validate_pddl(pddl_domain, pddl_problem, pddl_plan)
+        validator_output = validate_pddl(self.pddl_domain, self.pddl_problem, self.pddl_plan)
         assert validator_output.is_executable_plan
         assert validator_output.is_valid_plan
         assert validator_output.total_cost == 7
+
+    def test_invalid_plans(self) -> None:
+        validator_output = validate_pddl(self.pddl_domain, self.pddl_problem, "(a)\n(b)")
+        assert not validator_output.is_executable_plan
+        assert not validator_output.is_valid_plan
+        assert validator_output.total_cost == -1
+
+        validator_output = validate_pddl(self.pddl_domain, self.pddl_problem, "; plan\n0: (a) [1]")
+        assert validator_output.is_executable_plan
+        assert not validator_output.is_valid_plan
+
+        validator_output = validate_pddl(self.pddl_domain, self.pddl_problem, "(data-mapper occupation_id job_id)")
+        assert not validator_output.is_executable_plan
+
+        validator_output = validate_pddl(self.pddl_domain[:-10], self.pddl_problem, self.pddl_plan)
+        assert not validator_output.is_executable_plan
+
+
+class TestCompiledPlanValidator(BaseTestAgents):
+    def test_validate_compiled_plan(self) -> None:
+        self.flow.add(GoalItems(goals=GoalItem(goal_name="Credit Score API")))
+        plan = self.flow.plan_it(self.planner).list_of_plans[0]
+        pddl, _ = self.flow.compile_to_pddl()
+
+        for validator_output in [
+            validate_compiled_plan(self.flow.compilation, plan.reference),
+            validate_pddl(pddl.domain, pddl.problem, "\n".join(f"({action})" for action in plan.reference)),
+        ]:
+            assert validator_output.is_valid_plan
+            assert validator_output.total_cost == plan.cost
+
+        validator_output = validate_compiled_plan(self.flow.compilation, plan.reference[1:])
+        assert not validator_output.is_executable_plan
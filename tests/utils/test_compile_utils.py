@@ -12,6 +12,7 @@ from nl2flow.compile.basic_compilations.utils import (
     is_this_a_datum_type,
     is_this_a_datum,
     generate_new_objects,
+    ConstantIndex,
 )
 
 import pytest
@@ -65,6 +66,9 @@ class TestCompileUtils:
         assert agent_to_slot_map["a"] == ["a1", "a2", "a3", "a4", "a5", "a6"]
         assert agent_to_slot_map["b"] == ["b1", "a1", "b2"]
 
+        agent_to_slot_map["b"].append("b3")
+        assert get_agent_to_slot_map(self.flow.compilation)["b"] == ["b1", "a1", "b2"]
+
     def test_get_item_requirement_map(self) -> None:
         item_requirement_map = get_item_requirement_map(self.flow.compilation)
         assert item_requirement_map["a1"] == {"a", "b"}
@@ -91,3 +95,29 @@ class TestCompileUtils:
             "new_object_type_b_0",
             "new_object_type_b_1",
         ]
+
+    def test_constant_index(self) -> None:
+        constant_index = self.flow.compilation.constant_index
+        constants = list(self.flow.compilation.constant_map)
+
+        assert constant_index.get_type("b1") == "type_b"
+        assert constant_index.get_type("type_b") is None
+        assert constant_index.get_constants_of_type(TypeOptions.OPERATOR.value) == ["a", "b"]
+        assert constant_index.datum_constants == [c for c in constants if is_this_a_datum(self.flow.compilation, c)]
+
+        problem_index = ConstantIndex(constant_index)
+        problem_index.add("b3", "type_b")
+        problem_index.add("b1", TypeOptions.ROOT.value)
+
+        assert problem_index.get_type("b1") == "type_b"
+        assert problem_index.get_constants_of_type("type_b") == constant_index.get_constants_of_type("type_b") + ["b3"]
+        assert problem_index.datum_constants == constant_index.datum_constants + ["b3"]
+        assert constant_index.get_type("b3") is None
+
+    def test_signature_index(self) -> None:
+        signature_index = self.flow.compilation.signature_index
+
+        assert signature_index.inputs["b"] == ["b1", "a1", "b2"]
+        assert signature_index.outputs["a"] == ["ao1", "ao2"]
+        assert signature_index.consumers["a1"] == {"a", "b"}
+        assert signature_index.producers["ao2"] == {"a", "b"}
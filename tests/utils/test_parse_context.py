@@ -0,0 +1,47 @@
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.schemas import GoalItems, GoalItem, SignatureItem, Constraint
+from nl2flow.plan.planners.kstar import Kstar
+from nl2flow.plan.schemas import RawPlan
+from nl2flow.plan import utils
+from nl2flow.plan.utils import ParseContext, parse_action
+from tests.testing import BaseTestAgents
+from pytest_mock import MockerFixture
+
+
+class TestParseContext(BaseTestAgents):
+    def setup_method(self) -> None:
+        BaseTestAgents.setup_method(self)
+
+        checker = Operator("Checker")
+        checker.add_input(
+            SignatureItem(parameters=["Credit Score"], constraints=[Constraint(constraint="$Credit Score > 600")])
+        )
+        self.flow.add([checker, GoalItems(goals=GoalItem(goal_name="Checker"))])
+
+    def test_same_plans(self) -> None:
+        planner_response = self.flow.plan_it(self.planner)
+        _, transforms = self.flow.compile_to_pddl()
+
+        assert planner_response.list_of_plans, "There should be plans."
+        context = ParseContext(self.flow, transforms)
+
+        for plan in planner_response.list_of_plans:
+            for raw_action in plan.reference:
+                name, *parameters = raw_action.split()
+                action_name = context.revert(name)
+                assert parse_action(action_name, parameters, self.flow, transforms, context) == parse_action(
+                    action_name, parameters, self.flow, transforms
+                )
+
+        assert any(isinstance(step, Constraint) for plan in planner_response.list_of_plans for step in plan.plan)
+
+    def test_signatures_unpacked_once(self, mocker: MockerFixture) -> None:
+        _, transforms = self.flow.compile_to_pddl()
+        spy = mocker.spy(utils, "unpack_list_of_signature_items")
+
+        raw_plans = [RawPlan(actions=["user_info ", "find_errors database_link try_level_0 try_level_1"])] * 10
+        list_of_plans = Kstar.parse(raw_plans, flow=self.flow, transforms=transforms)
+
+        assert len(list_of_plans) == 10
+        assert list_of_plans[0].plan[1].outputs == ["list of errors"]
+        assert spy.call_count == 4
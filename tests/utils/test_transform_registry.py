@@ -0,0 +1,90 @@
+from typing import List
+from nl2flow.compile.flow import Flow
+from nl2flow.compile.operators import ClassicalOperator as Operator
+from nl2flow.compile.schemas import SignatureItem, GoalItems, GoalItem
+from nl2flow.compile.utils import Transform, TransformRegistry, string_transform, revert_string_transform
+from copy import deepcopy
+
+import pickle
+import pytest
+
+
+class TestTransformRegistry:
+    def test_forward_and_reverse_lookup(self) -> None:
+        registry = TransformRegistry()
+
+        assert string_transform("Credit Score", registry) == "credit_score"
+        assert string_transform("Credit Score", registry) == "credit_score"
+        assert len(registry) == 1
+
+        assert registry.get_target("Credit Score") == "credit_score"
+        assert registry.get_source("credit_score") == "Credit Score"
+        assert revert_string_transform("credit_score", registry) == "Credit Score"
+        assert revert_string_transform("unknown", registry) == "unknown"
+
+    def test_same_behavior_as_plain_list(self) -> None:
+        names = ["Credit Score", "credit_score", "Account ID", "account id", "email"]
+
+        plain_list: List[Transform] = []
+        registry = TransformRegistry()
+
+        assert [string_transform(n, plain_list) for n in names] == [string_transform(n, registry) for n in names]
+        assert plain_list == list(registry)
+
+        for item in ["credit_score", "account_id", "email"]:
+            assert revert_string_transform(item, plain_list) == revert_string_transform(item, registry)
+
+    def test_conflicting_mapping(self) -> None:
+        registry = TransformRegistry([Transform(source="A b", target="a_b")])
+
+        with pytest.raises(AssertionError):
+            registry.append(Transform(source="a B", target="a_b"))
+
+    def test_other_mutations(self) -> None:
+        transforms = [Transform(source=f"A {i}", target=f"a_{i}") for i in range(4)]
+        registry = TransformRegistry(transforms)
+
+        registry[0] = Transform(source="B 0", target="b_0")
+        assert registry.get_source("a_0") is None
+        assert registry.get_source("b_0") == "B 0"
+
+        del registry[1]
+        assert registry.get_target("A 1") is None
+
+        assert registry.pop() == transforms[3]
+        assert registry.get_source("a_3") is None
+
+        registry.remove(transforms[2])
+        assert registry.get_source("a_2") is None
+        assert len(registry) == 1
+
+        added = registry + transforms[2:]
+        assert isinstance(added, TransformRegistry)
+        assert added.get_source("a_3") == "A 3"
+        assert registry.get_source("a_3") is None
+
+        registry.clear()
+        assert registry.get_source("b_0") is None
+
+        with pytest.raises(AssertionError):
+            registry[:] = [transforms[0], Transform(source="a 0", target="a_0")]
+
+    def test_copy_and_pickle(self) -> None:
+        registry = TransformRegistry([Transform(source="A b", target="a_b")])
+
+        for copied in [deepcopy(registry), pickle.loads(pickle.dumps(registry))]:
+            assert isinstance(copied, TransformRegistry)
+            assert copied == registry
+            assert copied.get_source("a_b") == "A b"
+
+    def test_compilation_uses_registry(self) -> None:
+        agent = Operator("Credit Score API")
+        agent.add_input(SignatureItem(parameters=["Account ID"]))
+
+        flow = Flow(name="Transform Test")
+        flow.add([agent, GoalItems(goals=GoalItem(goal_name="Credit Score API"))])
+
+        _, transforms = flow.compile_to_pddl()
+        assert isinstance(transforms, TransformRegistry)
+        assert transforms.get_source("credit_score_api") == "Credit Score API"
+        assert transforms.get_source("account_id") == "Account ID"